@@ -0,0 +1,251 @@
+"""Deterministic synthetic documents for the benchmark suite.
+
+Every profile describes a book as a flat list of blocks (chapter and section
+headings, paragraphs, tables and footnotes). The same blocks are rendered as
+Markdown, DOCX and PDF, so each stage can be fed input of a known shape.
+"""
+
+from __future__ import annotations
+
+import random
+import textwrap
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Tuple
+
+from docx import Document
+
+WORDS = (
+    "adaptive archive binding chapter context digital document edition element "
+    "format glyph heading index layout library margin metadata narrative note "
+    "outline page paragraph publisher reader render section signature source "
+    "spine structure style table text typeset version volume"
+).split()
+
+
+@dataclass(frozen=True)
+class CorpusProfile:
+    name: str
+    chapters: int
+    sections: int
+    paragraphs: int
+    table_rows: int
+    footnotes: int
+
+
+PROFILES = {
+    profile.name: profile
+    for profile in (
+        CorpusProfile(
+            "small", chapters=3, sections=2, paragraphs=3, table_rows=3, footnotes=1
+        ),
+        CorpusProfile(
+            "medium", chapters=12, sections=4, paragraphs=6, table_rows=6, footnotes=2
+        ),
+        CorpusProfile(
+            "large", chapters=40, sections=6, paragraphs=8, table_rows=10, footnotes=3
+        ),
+    )
+}
+
+
+@dataclass
+class Block:
+    kind: str  # "h1", "h2", "p", "table" or "footnote"
+    text: str = ""
+    rows: List[List[str]] = field(default_factory=list)
+    label: int = 0
+
+
+@dataclass
+class CorpusDocument:
+    profile: CorpusProfile
+    markdown: str
+    pdf_path: Path
+    docx_path: Path
+    pdf_pages: int
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def generate_blocks(profile: CorpusProfile, seed: int = 0) -> List[Block]:
+    rng = random.Random(f"{profile.name}:{seed}")
+    blocks: List[Block] = []
+    label = 0
+    for chapter in range(1, profile.chapters + 1):
+        blocks.append(Block("h1", f"Chapter {chapter}"))
+        for section in range(1, profile.sections + 1):
+            blocks.append(Block("h2", f"Section {chapter}.{section}"))
+            notes: List[Block] = []
+            for paragraph in range(profile.paragraphs):
+                text = " ".join(_sentence(rng, rng.randint(8, 20)) for _ in range(5))
+                block = Block("p", text)
+                if paragraph < profile.footnotes:
+                    label += 1
+                    block.label = label
+                    notes.append(Block("footnote", _sentence(rng, 12), label=label))
+                blocks.append(block)
+            header = ["Item", "Count", "Notes"]
+            rows = [
+                [
+                    f"{rng.choice(WORDS)}-{row}",
+                    str(rng.randint(1, 999)),
+                    rng.choice(WORDS),
+                ]
+                for row in range(profile.table_rows)
+            ]
+            blocks.append(Block("table", rows=[header] + rows))
+            blocks.extend(notes)
+    return blocks
+
+
+def to_markdown(blocks: List[Block]) -> str:
+    parts: List[str] = []
+    for block in blocks:
+        if block.kind == "h1":
+            parts.append(f"# {block.text}")
+        elif block.kind == "h2":
+            parts.append(f"## {block.text}")
+        elif block.kind == "p":
+            marker = f"[^{block.label}]" if block.label else ""
+            parts.append(block.text + marker)
+        elif block.kind == "table":
+            header, *rows = block.rows
+            lines = ["| " + " | ".join(header) + " |", "|" + " --- |" * len(header)]
+            lines.extend("| " + " | ".join(row) + " |" for row in rows)
+            parts.append("\n".join(lines))
+        elif block.kind == "footnote":
+            parts.append(f"[^{block.label}]: {block.text}")
+    return "\n\n".join(parts) + "\n"
+
+
+def write_docx(blocks: List[Block], path: Path) -> None:
+    """Render blocks with python-docx.
+
+    python-docx cannot author real footnote parts, so references are
+    superscript numbers and the notes follow each section as paragraphs.
+    """
+    document = Document()
+    for block in blocks:
+        if block.kind in ("h1", "h2"):
+            document.add_heading(block.text, level=int(block.kind[1]))
+        elif block.kind == "p":
+            paragraph = document.add_paragraph(block.text)
+            if block.label:
+                paragraph.add_run(str(block.label)).font.superscript = True
+        elif block.kind == "table":
+            table = document.add_table(rows=len(block.rows), cols=len(block.rows[0]))
+            for row, values in zip(table.rows, block.rows):
+                for cell, value in zip(row.cells, values):
+                    cell.text = value
+        elif block.kind == "footnote":
+            document.add_paragraph(f"{block.label}. {block.text}")
+    document.save(str(path))
+
+
+_PAGE_TOP = 740.0
+_PAGE_BOTTOM = 60.0
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _layout_pdf(blocks: List[Block]) -> List[List[Tuple[float, float, float, str]]]:
+    """Lay blocks out as (font size, x, y, text) lines, one list per page."""
+    pages: List[List[Tuple[float, float, float, str]]] = [[]]
+    y = _PAGE_TOP
+
+    def emit(size: float, x: float, text: str) -> None:
+        nonlocal y
+        if y - size * 1.4 < _PAGE_BOTTOM:
+            pages.append([])
+            y = _PAGE_TOP
+        y -= size * 1.4
+        pages[-1].append((size, x, y, text))
+
+    for block in blocks:
+        if block.kind == "h1":
+            if pages[-1]:
+                pages.append([])
+                y = _PAGE_TOP
+            emit(20, 72, block.text)
+        elif block.kind == "h2":
+            emit(15, 72, block.text)
+        elif block.kind == "p":
+            text = block.text + (f" [{block.label}]" if block.label else "")
+            for line in textwrap.wrap(text, 90):
+                emit(10, 72, line)
+        elif block.kind == "table":
+            for row in block.rows:
+                for column, value in enumerate(row):
+                    # Cells share a baseline; only the first advances the cursor.
+                    if column == 0:
+                        emit(10, 72, value)
+                    else:
+                        size, _, line_y, _ = pages[-1][-1]
+                        pages[-1].append((size, 72 + 150 * column, line_y, value))
+        elif block.kind == "footnote":
+            emit(8, 72, f"{block.label}. {block.text}")
+    return pages
+
+
+def write_pdf(blocks: List[Block], path: Path) -> int:
+    """Write an uncompressed PDF with Helvetica text; returns the page count."""
+    pages = _layout_pdf(blocks)
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for lines in pages:
+        stream = "\n".join(
+            f"BT /F1 {size:g} Tf {x:g} {y:g} Td ({_pdf_escape(text)}) Tj ET"
+            for size, x, y, text in lines
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>"
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode("latin-1")
+    output += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref}\n%%EOF\n"
+    ).encode("latin-1")
+    path.write_bytes(bytes(output))
+    return len(pages)
+
+
+def build_corpus(
+    directory: Path, profile: CorpusProfile, seed: int = 0
+) -> CorpusDocument:
+    """Generate the Markdown, DOCX and PDF renditions of one profile."""
+    directory.mkdir(parents=True, exist_ok=True)
+    blocks = generate_blocks(profile, seed)
+    pdf_path = directory / f"{profile.name}.pdf"
+    docx_path = directory / f"{profile.name}.docx"
+    pages = write_pdf(blocks, pdf_path)
+    write_docx(blocks, docx_path)
+    return CorpusDocument(
+        profile=profile,
+        markdown=to_markdown(blocks),
+        pdf_path=pdf_path,
+        docx_path=docx_path,
+        pdf_pages=pages,
+    )
@@ -0,0 +1,271 @@
+"""Offline benchmarks for each conversion stage and the full pipeline.
+
+Usage::
+
+    python -m benchmarks.run --profiles small,medium --output report.json
+    python -m benchmarks.run --baseline report.json --max-regression 0.25
+
+Each benchmark is timed ``--repeat`` times (best and median wall-clock time
+are reported) and then run once more under ``tracemalloc`` for its peak
+Python allocation. Nothing leaves the machine: MinerU services, binaries and
+caches are bypassed and enhancement uses the local formatter.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ai_doc_to_epub import __version__
+from ai_doc_to_epub.epub_builder import (
+    EpubBuilder,
+    EpubMetadata,
+    _split_html_into_chapters,
+)
+from ai_doc_to_epub.llm_client import LocalFormatterLLM
+from ai_doc_to_epub.mineru_client import MinerUClient
+from ai_doc_to_epub.models import ConversionRequest
+from ai_doc_to_epub.pipeline import ConversionPipeline, PipelineConfig
+
+from .corpus import PROFILES, CorpusDocument, build_corpus
+
+METADATA = {
+    "title": "Benchmark",
+    "author": "Bench",
+    "language": "en",
+    "description": "",
+}
+
+
+@dataclass
+class BenchmarkResult:
+    benchmark: str
+    profile: str
+    input_bytes: int
+    seconds_min: float
+    seconds_median: float
+    peak_memory_bytes: int
+    units: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.benchmark, self.profile
+
+    def to_dict(self) -> Dict[str, object]:
+        data = asdict(self)
+        median = self.seconds_median or float("nan")
+        data["mb_per_second"] = round(self.input_bytes / 1_000_000 / median, 3)
+        for unit, count in self.units.items():
+            data[f"{unit}_per_second"] = round(count / median, 3)
+        return data
+
+
+def offline_mineru_client(pdf_workers: int) -> MinerUClient:
+    client = MinerUClient(pdf_workers=pdf_workers)
+    # Only the in-process extractors: no MinerU service, workers, binary or cache.
+    client.http_pool = None
+    client.worker_pool = None
+    client.binary_path = None
+    client.cache = None
+    return client
+
+
+def _cases(
+    corpus: CorpusDocument, workdir: Path, pdf_workers: int
+) -> List[Tuple[str, int, Dict[str, int], Callable[[], object]]]:
+    """Return (name, input bytes, units, callable) for every benchmark."""
+    mineru = offline_mineru_client(pdf_workers)
+    formatter = LocalFormatterLLM()
+    html = formatter.enhance(corpus.markdown, METADATA)
+    builder = EpubBuilder()
+    metadata = EpubMetadata(title="Benchmark", author="Bench")
+    pipeline = ConversionPipeline(
+        mineru_client=mineru,
+        llm_client=formatter,
+        epub_builder=builder,
+        config=PipelineConfig(output_dir=workdir, stream_enhancement=False),
+    )
+    request = ConversionRequest(title="Benchmark", author="Bench")
+    markdown_bytes = len(corpus.markdown.encode("utf-8"))
+    html_bytes = len(html.encode("utf-8"))
+    pdf_bytes = corpus.pdf_path.stat().st_size
+    docx_bytes = corpus.docx_path.stat().st_size
+    pages = {"pages": corpus.pdf_pages}
+    return [
+        ("extract_pdf", pdf_bytes, pages, lambda: mineru._extract_pdf(corpus.pdf_path)),
+        (
+            "extract_docx",
+            docx_bytes,
+            {},
+            lambda: mineru._extract_docx(corpus.docx_path),
+        ),
+        (
+            "enhance_local",
+            markdown_bytes,
+            {},
+            lambda: formatter.enhance(corpus.markdown, METADATA),
+        ),
+        ("split_chapters", html_bytes, {}, lambda: _split_html_into_chapters(html)),
+        (
+            "epub_build",
+            html_bytes,
+            {},
+            lambda: builder.build(html, metadata, workdir / "build.epub"),
+        ),
+        (
+            "pipeline_pdf",
+            pdf_bytes,
+            pages,
+            lambda: pipeline.convert(corpus.pdf_path, request),
+        ),
+        (
+            "pipeline_docx",
+            docx_bytes,
+            {},
+            lambda: pipeline.convert(corpus.docx_path, request),
+        ),
+    ]
+
+
+def measure(func: Callable[[], object], repeat: int) -> Tuple[List[float], int]:
+    func()  # warm-up: imports, parser tables, page caches
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return durations, peak
+
+
+def run(
+    profiles: List[str],
+    repeat: int,
+    pdf_workers: int,
+    only: Optional[List[str]] = None,
+) -> List[BenchmarkResult]:
+    results: List[BenchmarkResult] = []
+    with tempfile.TemporaryDirectory(prefix="atoe-bench-") as temp:
+        for name in profiles:
+            workdir = Path(temp) / name
+            corpus = build_corpus(workdir, PROFILES[name])
+            for benchmark, size, units, func in _cases(corpus, workdir, pdf_workers):
+                if only and benchmark not in only:
+                    continue
+                durations, peak = measure(func, repeat)
+                result = BenchmarkResult(
+                    benchmark=benchmark,
+                    profile=name,
+                    input_bytes=size,
+                    seconds_min=min(durations),
+                    seconds_median=statistics.median(durations),
+                    peak_memory_bytes=peak,
+                    units=units,
+                )
+                results.append(result)
+                print(
+                    f"{benchmark:<15} {name:<7} median {result.seconds_median:8.4f}s "
+                    f"peak {peak / 1_000_000:8.2f} MB",
+                    file=sys.stderr,
+                )
+    return results
+
+
+def build_report(results: List[BenchmarkResult], repeat: int, pdf_workers: int) -> Dict:
+    return {
+        "meta": {
+            "version": __version__,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+            "pdf_workers": pdf_workers,
+        },
+        "results": [result.to_dict() for result in results],
+    }
+
+
+def compare(report: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """Print a comparison table and return the benchmarks that regressed."""
+    previous = {
+        (item["benchmark"], item["profile"]): item for item in baseline["results"]
+    }
+    regressions = []
+    print(
+        f"{'benchmark':<15} {'profile':<7} {'time':>8} {'memory':>8}", file=sys.stderr
+    )
+    for item in report["results"]:
+        key = (item["benchmark"], item["profile"])
+        old = previous.get(key)
+        if old is None:
+            continue
+        time_ratio = item["seconds_median"] / max(old["seconds_median"], 1e-9)
+        memory_ratio = item["peak_memory_bytes"] / max(old["peak_memory_bytes"], 1)
+        regressed = time_ratio > 1 + max_regression or memory_ratio > 1 + max_regression
+        flag = "  REGRESSION" if regressed else ""
+        print(
+            f"{key[0]:<15} {key[1]:<7} {time_ratio:7.2f}x {memory_ratio:7.2f}x{flag}",
+            file=sys.stderr,
+        )
+        if regressed:
+            regressions.append(f"{key[0]}/{key[1]}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", default="small,medium", help="Comma-separated.")
+    parser.add_argument("--only", default="", help="Comma-separated benchmark names.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--pdf-workers", type=int, default=1)
+    parser.add_argument("--output", type=Path, help="Write the JSON report here.")
+    parser.add_argument("--baseline", type=Path, help="Compare against this report.")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.25,
+        help="Fail when time or memory grows by more than this fraction.",
+    )
+    args = parser.parse_args(argv)
+
+    profiles = [name for name in args.profiles.split(",") if name]
+    unknown = set(profiles) - set(PROFILES)
+    if unknown:
+        parser.error(f"unknown profiles: {', '.join(sorted(unknown))}")
+    only = [name for name in args.only.split(",") if name] or None
+
+    results = run(profiles, max(1, args.repeat), args.pdf_workers, only)
+    report = build_report(results, args.repeat, args.pdf_workers)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(report, baseline, args.max_regression)
+        if regressions:
+            print(f"Regressed: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
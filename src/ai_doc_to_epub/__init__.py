@@ -1,7 +1,20 @@
 """AI-assisted document to EPUB conversion toolkit."""
 
-from .pipeline import ConversionPipeline, PipelineConfig
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .pipeline import ConversionPipeline, PipelineConfig
 
 __all__ = ["ConversionPipeline", "PipelineConfig"]
 
 __version__ = "0.1.0"
+
+
+def __getattr__(name: str) -> Any:
+    # Importing the pipeline loads every conversion dependency; defer it until
+    # it is actually used so the CLI and the worker processes start quickly.
+    if name in __all__:
+        from . import pipeline
+
+        return getattr(pipeline, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
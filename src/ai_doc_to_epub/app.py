@@ -1,17 +1,54 @@
 from __future__ import annotations
 
-import tempfile
-from pathlib import Path
+import asyncio
+import secrets
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, BinaryIO, Iterator, Optional, Tuple
+from urllib.parse import quote
 
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
+from pydantic import ValidationError
 
+from .config import SETTINGS
+from .jobs import FAILED, SUCCEEDED, JobManager, QueueFullError
+from .metrics import REGISTRY
 from .mineru_client import MinerUError
-from .models import ConversionRequest
-from .pipeline import ConversionPipeline
+from .models import ConversionRequest, ConversionResult, JobStatus
+from .output_store import (
+    OutputStore,
+    RangeNotSatisfiable,
+    StoredOutput,
+    etag_matches,
+    parse_range,
+)
+from .pipeline import output_filename
+from .services import Services
+from .singleflight import conversion_key
+from .uploads import SpooledUpload, UploadRejected, receive_upload
+
+SUPPORTED_SUFFIXES = {".pdf", ".doc", ".docx"}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    services = Services.from_settings()
+    app.state.services = services
+    await services.start()
+    try:
+        yield
+    finally:
+        await services.drain(SETTINGS.shutdown_grace_seconds)
+
 
-app = FastAPI(title="AI Document to EPUB Service", version="0.1.0")
+app = FastAPI(title="AI Document to EPUB Service", version="0.1.0", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -20,54 +57,263 @@ app.add_middleware(
 )
 
 
-@app.get("/health")
-def health() -> dict[str, str]:
-    return {"status": "ok"}
+# The upload endpoints parse their own body; describe it for the API docs.
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file", "title"],
+                    "properties": {
+                        "file": {"type": "string", "format": "binary"},
+                        **ConversionRequest.model_json_schema()["properties"],
+                    },
+                }
+            }
+        },
+    }
+}
 
 
-@app.post("/convert")
-async def convert_document(
-    file: UploadFile = File(...),
-    title: str = Form(...),
-    author: str = Form("Unknown Author"),
-    language: str = Form("en"),
-    description: str | None = Form(default=None),
-    annotate: bool = Form(default=True),
-    use_local_formatter: bool = Form(default=False),
-):
-    suffix = Path(file.filename or "").suffix.lower()
-    if suffix not in {".pdf", ".doc", ".docx"}:
-        return JSONResponse(
-            status_code=400,
-            content={"detail": "Only PDF and Word documents are supported."},
+async def _receive_upload(
+    http_request: Request,
+) -> Tuple[SpooledUpload, ConversionRequest]:
+    """Spool the uploaded document from the request stream and read the form.
+
+    The body is parsed as it arrives rather than after Starlette has spooled
+    it, so ``UPLOAD_MAX_BYTES`` is enforced during receipt (and up front from
+    ``Content-Length``) and the file is written to the workspace only once.
+    """
+    try:
+        upload = await receive_upload(
+            dict(http_request.headers),
+            http_request.stream(),
+            SETTINGS.workspace_dir / "uploads",
+            SETTINGS.upload_max_bytes,
+            SUPPORTED_SUFFIXES,
+            chunk_size=SETTINGS.upload_chunk_size,
+        )
+    except UploadRejected as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail) from exc
+    try:
+        request = ConversionRequest(**upload.fields)
+    except ValidationError as exc:
+        upload.path.unlink(missing_ok=True)
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in exc.errors()]
+        ) from exc
+    return upload, request
+
+
+def _services(request: Request) -> Services:
+    return request.app.state.services
+
+
+def _accepting(services: Services = Depends(_services)) -> Services:
+    if services.draining:
+        raise HTTPException(
+            status_code=503,
+            detail="The service is shutting down.",
+            headers={"Retry-After": "30"},
         )
+    return services
+
+
+def _job_manager(request: Request) -> JobManager:
+    return _services(request).jobs
+
+
+def _output_store(request: Request) -> OutputStore:
+    return _services(request).outputs
+
+
+def _content_disposition(filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def _read_file(handle: BinaryIO, length: int) -> Iterator[bytes]:
+    with handle:
+        while length > 0:
+            chunk = handle.read(min(SETTINGS.upload_chunk_size, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def _epub_response(
+    request: Request, stored: Optional[StoredOutput], filename: str
+) -> Response:
+    """Serve a stored EPUB with a strong ETag, 304 revalidation and byte ranges.
+
+    Conditional and range headers only apply to GET and HEAD; the EPUB that
+    ``POST /convert`` produces is always sent whole.
+    """
+    if stored is None:
+        raise HTTPException(status_code=404, detail="The EPUB is no longer stored.")
+    headers = {
+        "ETag": stored.etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "no-cache",
+        "Content-Disposition": _content_disposition(filename),
+    }
+    conditional = request.method in ("GET", "HEAD")
+    if conditional and etag_matches(request.headers.get("if-none-match"), stored.etag):
+        return Response(status_code=304, headers=headers)
 
-    pipeline = ConversionPipeline()
-    request = ConversionRequest(
-        title=title,
-        author=author,
-        language=language,
-        description=description,
-        annotate=annotate,
-        use_local_formatter=use_local_formatter,
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    # A stale If-Range means the client's partial copy is of another book.
+    if conditional and (if_range is None or if_range.strip() == stored.etag):
+        try:
+            byte_range = parse_range(request.headers.get("range"), stored.size)
+        except RangeNotSatisfiable:
+            headers["Content-Range"] = f"bytes */{stored.size}"
+            return Response(status_code=416, headers=headers)
+    first, last = byte_range or (0, stored.size - 1)
+    if byte_range:
+        headers["Content-Range"] = f"bytes {first}-{last}/{stored.size}"
+    headers["Content-Length"] = str(last - first + 1)
+    status_code = 206 if byte_range else 200
+    if request.method == "HEAD":
+        return Response(
+            status_code=status_code, media_type="application/epub+zip", headers=headers
+        )
+    try:
+        # Opened before responding so a concurrent eviction cannot cut the
+        # download short.
+        handle = stored.path.open("rb")
+    except FileNotFoundError as exc:
+        raise HTTPException(
+            status_code=404, detail="The EPUB is no longer stored."
+        ) from exc
+    handle.seek(first)
+    return StreamingResponse(
+        _read_file(handle, last - first + 1),
+        status_code=status_code,
+        media_type="application/epub+zip",
+        headers=headers,
     )
 
-    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as temp_input:
-        content = await file.read()
-        temp_input.write(content)
-        temp_input_path = Path(temp_input.name)
 
+@app.get("/health")
+def health(services: Services = Depends(_services)) -> JSONResponse:
+    # Failing health checks while draining takes the process out of rotation.
+    if services.draining:
+        return JSONResponse({"status": "draining"}, status_code=503)
+    return JSONResponse({"status": "ok"})
+
+
+@app.post("/drain", status_code=202)
+def drain(
+    services: Services = Depends(_services),
+    authorization: str | None = Header(default=None),
+) -> JSONResponse:
+    """Stop taking new work ahead of a shutdown; meant for a pre-stop hook.
+
+    uvicorn closes its listeners before the lifespan shutdown runs, so the
+    503s from ``/health`` and the upload endpoints are only ever served when
+    draining starts here, while the process is still accepting connections.
+    Disabled unless ``DRAIN_TOKEN`` is set.
+    """
+    token = SETTINGS.drain_token
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(authorization or "", f"Bearer {token}"):
+        raise HTTPException(status_code=401, detail="Invalid drain token.")
+    services.draining = True
+    return JSONResponse({"status": "draining"}, status_code=202)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.post("/convert", openapi_extra=UPLOAD_OPENAPI)
+async def convert_document(
+    http_request: Request,
+    services: Services = Depends(_accepting),
+):
+    upload, request = await _receive_upload(http_request)
+
+    async def run() -> ConversionResult:
+        try:
+            return await services.conversions.convert(
+                upload.path, request, source_digest=upload.digest
+            )
+        finally:
+            upload.path.unlink(missing_ok=True)
+
+    call, shared = services.in_flight.start_async(
+        conversion_key(upload.digest, request), run
+    )
+    if shared:
+        # The running conversion already has its own copy of this file.
+        upload.path.unlink(missing_ok=True)
     try:
-        result = pipeline.convert(temp_input_path, request)
+        result = await asyncio.wrap_future(call)
     except MinerUError as exc:
         raise HTTPException(status_code=422, detail=str(exc)) from exc
     except Exception as exc:  # pragma: no cover - runtime safety net
         raise HTTPException(status_code=500, detail="Conversion failed") from exc
-    finally:
-        temp_input_path.unlink(missing_ok=True)
 
-    return FileResponse(
-        path=result.output_path,
-        media_type="application/epub+zip",
-        filename=result.output_path.name,
+    return _epub_response(
+        http_request,
+        services.outputs.get(result.output_path.stem),
+        output_filename(request.title),
+    )
+
+
+@app.post(
+    "/jobs", status_code=202, response_model=JobStatus, openapi_extra=UPLOAD_OPENAPI
+)
+async def submit_job(
+    http_request: Request,
+    services: Services = Depends(_accepting),
+) -> JobStatus:
+    upload, request = await _receive_upload(http_request)
+    try:
+        job = services.jobs.submit(upload.path, request, digest=upload.digest)
+    except QueueFullError as exc:
+        upload.path.unlink(missing_ok=True)
+        raise HTTPException(
+            status_code=503, detail=str(exc), headers={"Retry-After": "30"}
+        ) from exc
+    return job.status()
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+def job_status(job_id: str, jobs: JobManager = Depends(_job_manager)) -> JobStatus:
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job.")
+    return job.status()
+
+
+@app.api_route("/jobs/{job_id}/result", methods=["GET", "HEAD"])
+def job_result(
+    job_id: str,
+    request: Request,
+    jobs: JobManager = Depends(_job_manager),
+    outputs: OutputStore = Depends(_output_store),
+):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job.")
+    if job.state == FAILED:
+        raise HTTPException(status_code=422, detail=job.error or "Conversion failed")
+    if job.state != SUCCEEDED or job.result is None:
+        raise HTTPException(status_code=409, detail="Job has not finished yet.")
+    return _epub_response(
+        request,
+        outputs.get(job.result.output_path.stem),
+        output_filename(job.request.title),
     )
@@ -0,0 +1,399 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import BrokenExecutor, Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from html import unescape
+from pathlib import Path
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+from urllib.parse import unquote, urlparse
+
+from .config import SETTINGS
+
+_IMG_RE = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+_SRC_RE = re.compile(r"""\bsrc\s*=\s*(["'])(.*?)\1""", re.IGNORECASE | re.DOTALL)
+_RECOMPRESSIBLE = {"image/jpeg", "image/png"}
+
+ImageSink = Callable[[str, bytes, str], object]
+
+# store_media checks the media directory's budget once per this many writes.
+MEDIA_EVICT_EVERY = 64
+_media_writes = 0
+_media_lock = threading.Lock()
+
+
+def sniff_image(data: bytes) -> Optional[Tuple[str, str]]:
+    """Return ``(media type, extension)`` for EPUB-supported images, else ``None``."""
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg", "jpg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png", "png"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif", "gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp", "webp"
+    head = data[:1024].lstrip()
+    if head.startswith((b"<?xml", b"<svg")) and b"<svg" in head:
+        return "image/svg+xml", "svg"
+    return None
+
+
+def recompress_image(
+    data: bytes, media_type: str, max_dimension: int, quality: int
+) -> bytes:
+    """Downscale and re-encode a JPEG or PNG; runs in worker processes.
+
+    The original bytes are returned when Pillow is not installed, the image
+    cannot be decoded, or re-encoding would not make it smaller.
+    """
+    if media_type not in _RECOMPRESSIBLE:
+        return data
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return data
+    try:
+        with Image.open(io.BytesIO(data)) as original:
+            # EXIF is not carried over, so apply its rotation to the pixels.
+            image = ImageOps.exif_transpose(original)
+            resized = bool(max_dimension) and max(image.size) > max_dimension
+            if resized:
+                image.thumbnail((max_dimension, max_dimension))
+            output = io.BytesIO()
+            if media_type == "image/jpeg":
+                if image.mode not in ("RGB", "L"):
+                    image = image.convert("RGB")
+                image.save(
+                    output, "JPEG", quality=quality, optimize=True, progressive=True
+                )
+            else:
+                image.save(output, "PNG", optimize=True)
+    except Exception:  # Pillow raises many decoder-specific errors
+        return data
+    encoded = output.getvalue()
+    return encoded if resized or len(encoded) < len(data) else data
+
+
+def store_media(data: bytes, directory: Optional[Path] = None) -> Optional[Path]:
+    """Save an extracted image under its content hash; ``None`` if not an image.
+
+    The directory is kept within ``MEDIA_MAX_BYTES`` and
+    ``MEDIA_MAX_AGE_SECONDS`` by :func:`evict_media`, run every
+    :data:`MEDIA_EVICT_EVERY` writes.
+    """
+    global _media_writes
+    kind = sniff_image(data)
+    if kind is None:
+        return None
+    directory = directory or SETTINGS.media_dir
+    assert directory is not None
+    path = directory / f"{hashlib.sha256(data).hexdigest()}.{kind[1]}"
+    try:
+        os.utime(path)
+        return path
+    except FileNotFoundError:
+        pass
+    directory.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    temp_path.write_bytes(data)
+    os.replace(temp_path, path)
+    with _media_lock:
+        _media_writes += 1
+        due = _media_writes % MEDIA_EVICT_EVERY == 0
+    if due:
+        evict_media(directory)
+    return path
+
+
+def evict_media(
+    directory: Path,
+    max_bytes: Optional[int] = None,
+    max_age_seconds: Optional[float] = None,
+) -> int:
+    """Trim the media directory and return the number of images removed.
+
+    Images unused for ``max_age_seconds`` go first, then the least recently
+    used until the directory fits ``max_bytes``. Storing or embedding an
+    image bumps its mtime. An evicted image that a
+    cached extraction still references is left out of later books.
+    """
+    max_bytes = SETTINGS.media_max_bytes if max_bytes is None else max_bytes
+    if max_age_seconds is None:
+        max_age_seconds = SETTINGS.media_max_age_seconds
+    cutoff = time.time() - max_age_seconds
+    entries = []
+    total = 0
+    for path in directory.glob("*.*"):
+        if path.suffix == ".tmp":
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+    removed = 0
+    for mtime, size, path in sorted(entries, key=lambda entry: entry[0]):
+        if total <= max_bytes and mtime >= cutoff:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    return removed
+
+
+def image_pool(workers: int) -> ProcessPoolExecutor:
+    """A process pool for :func:`recompress_image`, started with ``spawn``.
+
+    Forking a multi-threaded server can copy locks held by other threads,
+    so workers are spawned; they start on first use.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+_image_pools: Dict[int, ProcessPoolExecutor] = {}
+_image_pools_lock = threading.Lock()
+
+
+def shared_image_pool(workers: int) -> ProcessPoolExecutor:
+    """Process-wide :func:`image_pool` of ``workers`` processes.
+
+    Started on first use and kept, so books converted one after another or
+    side by side (CLI, batch threads, the service) encode on the same
+    workers instead of each starting a pool of their own.
+    """
+    with _image_pools_lock:
+        pool = _image_pools.get(workers)
+        if pool is None:
+            pool = _image_pools[workers] = image_pool(workers)
+        return pool
+
+
+def discard_image_pool(pool: Executor) -> None:
+    """Shut ``pool`` down and forget it so the next book starts a fresh one."""
+    with _image_pools_lock:
+        for workers, existing in list(_image_pools.items()):
+            if existing is pool:
+                del _image_pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@dataclass
+class ImageOptions:
+    max_dimension: int = SETTINGS.image_max_dimension
+    quality: int = SETTINGS.image_quality
+    workers: int = field(
+        default_factory=lambda: SETTINGS.image_workers or os.cpu_count() or 1
+    )
+
+
+class ImageAssets:
+    """Images referenced by a book's chapters, packaged as EPUB resources.
+
+    :meth:`rewrite` points every ``<img>`` in a chapter at ``images/<hash>``
+    inside the EPUB and schedules the image for recompression in a process
+    pool, so encoding overlaps with writing the remaining chapters. At most
+    two encodes per worker are in flight; once a sink is set with
+    :meth:`write_to`, each image is handed to it as soon as it is encoded
+    and is not kept afterwards. Identical images are stored once.
+
+    Sources may be ``data:`` URIs or local files below ``base_dir``,
+    ``media_dir`` or one of ``roots``; other local references are dropped
+    rather than leaking arbitrary files into the book, and remote URLs are
+    left untouched. Embedding an image from ``media_dir`` marks it as
+    recently used for :func:`evict_media`.
+
+    Encodes run on ``executor`` when given, otherwise on the
+    :func:`shared_image_pool` of ``options.workers`` processes; either is
+    left running on :meth:`close`.
+    """
+
+    def __init__(
+        self,
+        base_dir: Optional[Path] = None,
+        roots: Sequence[Path] = (),
+        options: Optional[ImageOptions] = None,
+        executor: Optional[Executor] = None,
+        media_dir: Optional[Path] = None,
+    ) -> None:
+        self.base_dir = base_dir
+        self.media_dir = media_dir.resolve() if media_dir else None
+        allowed = ([base_dir] if base_dir else []) + list(roots)
+        self.roots = [root.resolve() for root in allowed]
+        if self.media_dir is not None:
+            self.roots.append(self.media_dir)
+        self.options = options or ImageOptions()
+        self.dropped = 0
+        self._by_source: Dict[str, Optional[str]] = {}
+        self._hrefs: Set[str] = set()
+        self._pending: Deque[Tuple[str, str, Future]] = deque()
+        self._finished: Deque[Tuple[str, bytes, str]] = deque()
+        self._sink: Optional[ImageSink] = None
+        self._executor = executor
+
+    def __enter__(self) -> "ImageAssets":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for _, _, future in self._pending:
+            future.cancel()
+        self._pending.clear()
+
+    def _load(self, src: str) -> Optional[bytes]:
+        if src.startswith("data:"):
+            header, _, payload = src.partition(",")
+            if not header.endswith(";base64"):
+                return None
+            try:
+                return base64.b64decode(payload)
+            except (binascii.Error, ValueError):
+                return None
+        if src.startswith("file:"):
+            path = Path(unquote(urlparse(src).path))
+        else:
+            path = Path(unquote(src))
+            if not path.is_absolute():
+                if self.base_dir is None:
+                    return None
+                path = self.base_dir / path
+        try:
+            path = path.resolve(strict=True)
+        except (OSError, RuntimeError):
+            return None
+        if not path.is_file() or not any(
+            path.is_relative_to(root) for root in self.roots
+        ):
+            return None
+        data = path.read_bytes()
+        if self.media_dir is not None and path.is_relative_to(self.media_dir):
+            os.utime(path)
+        return data
+
+    def _schedule(self, data: bytes, media_type: str) -> Union[bytes, Future]:
+        options = self.options
+        if media_type not in _RECOMPRESSIBLE:
+            return data
+        arguments = (data, media_type, options.max_dimension, options.quality)
+        if self._executor is not None:
+            return self._executor.submit(recompress_image, *arguments)
+        if options.workers <= 1:
+            return recompress_image(*arguments)
+        pool = shared_image_pool(options.workers)
+        try:
+            return pool.submit(recompress_image, *arguments)
+        except BrokenExecutor:
+            # A worker died, maybe during an earlier book; start a fresh pool.
+            discard_image_pool(pool)
+            pool = shared_image_pool(options.workers)
+            return pool.submit(recompress_image, *arguments)
+
+    def _href(self, src: str) -> Optional[str]:
+        if src not in self._by_source:
+            data = self._load(src)
+            kind = sniff_image(data) if data else None
+            href = None
+            if data and kind:
+                media_type, extension = kind
+                digest = hashlib.sha256(data).hexdigest()[:24]
+                href = f"images/{digest}.{extension}"
+                if href not in self._hrefs:
+                    self._hrefs.add(href)
+                    self._add(href, media_type, self._schedule(data, media_type))
+            self._by_source[src] = href
+        return self._by_source[src]
+
+    def _add(self, href: str, media_type: str, result: Union[bytes, Future]) -> None:
+        if not isinstance(result, Future):
+            self._emit(href, result, media_type)
+            return
+        self._pending.append((href, media_type, result))
+        while len(self._pending) > 2 * max(self.options.workers, 1):
+            href, media_type, future = self._pending.popleft()
+            self._emit(href, future.result(), media_type)
+
+    def _emit(self, href: str, data: bytes, media_type: str) -> None:
+        if self._sink is None:
+            self._finished.append((href, data, media_type))
+        else:
+            self._sink(href, data, media_type)
+
+    def _collect(self) -> None:
+        """Pass on every encode that has finished, without waiting."""
+        waiting: Deque[Tuple[str, str, Future]] = deque()
+        for href, media_type, future in self._pending:
+            if future.done():
+                self._emit(href, future.result(), media_type)
+            else:
+                waiting.append((href, media_type, future))
+        self._pending = waiting
+
+    def write_to(self, sink: ImageSink) -> None:
+        """Hand images to ``sink(href, bytes, media type)`` as they are ready."""
+        self._sink = sink
+        finished, self._finished = self._finished, deque()
+        for item in finished:
+            sink(*item)
+
+    def rewrite(self, content: str, prefix: str = "../") -> str:
+        """Return ``content`` with image sources pointing into the EPUB.
+
+        ``prefix`` is the path from the chapter document to the package root.
+        """
+
+        def replace_tag(match: re.Match) -> str:
+            tag = match.group(0)
+            source = _SRC_RE.search(tag)
+            if source is None:
+                return tag
+            src = unescape(source.group(2)).strip()
+            if src.startswith(("http://", "https://")):
+                return tag
+            href = self._href(src)
+            if href is None:
+                self.dropped += 1
+                return ""
+            start, end = source.span(2)
+            return f"{tag[:start]}{prefix}{href}{tag[end:]}"
+
+        rewritten = _IMG_RE.sub(replace_tag, content)
+        self._collect()
+        return rewritten
+
+    def items(self) -> Iterator[Tuple[str, bytes, str]]:
+        """Yield ``(href, bytes, media type)`` for images not yet handed on.
+
+        Waits for pending encodes; each image is yielded once.
+        """
+        while self._finished:
+            yield self._finished.popleft()
+        while self._pending:
+            href, media_type, future = self._pending.popleft()
+            yield href, future.result(), media_type
+
+    @property
+    def count(self) -> int:
+        return len(self._hrefs)
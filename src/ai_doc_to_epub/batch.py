@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .config import SETTINGS
+from .mineru_client import MinerUClient
+from .models import ConversionRequest
+from .pipeline import ConversionPipeline, PipelineConfig
+
+SUPPORTED_SUFFIXES = {".pdf", ".doc", ".docx"}
+
+
+@dataclass
+class BatchRecord:
+    """One line of the JSONL batch manifest."""
+
+    source: str
+    size: int
+    mtime_ns: int
+    status: str
+    output: Optional[str] = None
+    error: Optional[str] = None
+    seconds: float = 0.0
+    output_bytes: int = 0
+
+
+@dataclass
+class BatchSummary:
+    total: int = 0
+    skipped: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    input_bytes: int = 0
+    output_bytes: int = 0
+    elapsed: float = 0.0
+    failures: List[BatchRecord] = field(default_factory=list)
+
+    @property
+    def files_per_second(self) -> float:
+        return (self.succeeded + self.failed) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.input_bytes / 1_000_000 / self.elapsed if self.elapsed else 0.0
+
+
+def discover_inputs(target: str) -> List[Path]:
+    """Expand a directory (recursively) or glob pattern into supported files."""
+    root = Path(target).expanduser()
+    if root.is_dir():
+        candidates: Iterable[Path] = root.rglob("*")
+    else:
+        candidates = (Path(match) for match in glob.glob(str(root), recursive=True))
+    return sorted(
+        path.resolve()
+        for path in candidates
+        if path.is_file() and path.suffix.lower() in SUPPORTED_SUFFIXES
+    )
+
+
+def output_names(inputs: List[Path]) -> Dict[Path, str]:
+    """Name each input's EPUB after its stem, made unique across the batch.
+
+    Files sharing a stem (``a/intro.pdf`` and ``b/intro.pdf``) get a short
+    digest of their path relative to the batch root appended, so neither
+    overwrites the other and names stay stable between runs.
+    """
+    if not inputs:
+        return {}
+    root = Path(os.path.commonpath([path.parent for path in inputs]))
+    stems: Dict[str, int] = {}
+    for path in inputs:
+        stems[path.stem.lower()] = stems.get(path.stem.lower(), 0) + 1
+    names = {}
+    for path in inputs:
+        name = path.stem
+        if stems[name.lower()] > 1:
+            relative = path.relative_to(root).as_posix()
+            name = f"{name}-{hashlib.sha256(relative.encode()).hexdigest()[:8]}"
+        names[path] = name
+    return names
+
+
+class BatchManifest:
+    """Append-only JSONL record of finished conversions, used to resume runs.
+
+    A file is considered done when a successful record exists for the same
+    path, size and modification time, so edited files are converted again.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._done: Dict[str, BatchRecord] = {}
+        self._lock = threading.Lock()
+        if path.exists():
+            for line in path.read_text(encoding="utf-8").splitlines():
+                try:
+                    record = BatchRecord(**json.loads(line))
+                except (ValueError, TypeError):
+                    continue  # tolerate a line truncated by an interrupted run
+                if record.status == "ok":
+                    self._done[record.source] = record
+
+    def is_done(self, path: Path) -> bool:
+        record = self._done.get(str(path))
+        if record is None:
+            return False
+        stat = path.stat()
+        return record.size == stat.st_size and record.mtime_ns == stat.st_mtime_ns
+
+    def append(self, record: BatchRecord) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, self.path.open("a", encoding="utf-8") as handle:
+            handle.write(json.dumps(asdict(record), ensure_ascii=False) + "\n")
+        if record.status == "ok":
+            self._done[record.source] = record
+
+
+_worker_state = threading.local()
+
+
+def _init_worker(
+    output_dir: str, use_local_formatter: bool, inner_workers: Optional[int]
+) -> None:
+    """Build the single pipeline this worker reuses for every file.
+
+    ``inner_workers`` sizes the PDF extraction and image process pools;
+    ``None`` keeps their defaults.
+    """
+    from .llm_client import build_llm_client
+
+    _worker_state.pipeline = ConversionPipeline(
+        mineru_client=MinerUClient(pdf_workers=inner_workers),
+        llm_client=build_llm_client(use_local_formatter=use_local_formatter),
+        config=PipelineConfig(
+            output_dir=Path(output_dir),
+            image_workers=inner_workers or SETTINGS.image_workers,
+        ),
+    )
+
+
+def _convert_one(
+    source: str, output_name: str, request_fields: Dict[str, object]
+) -> BatchRecord:
+    path = Path(source)
+    stat = path.stat()
+    request = ConversionRequest(title=path.stem, **request_fields)
+    started = time.perf_counter()
+    try:
+        result = _worker_state.pipeline.convert(
+            path, request, output_name=output_name
+        )
+    except Exception as exc:
+        return BatchRecord(
+            source=source,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            status="failed",
+            error=str(exc) or type(exc).__name__,
+            seconds=time.perf_counter() - started,
+        )
+    return BatchRecord(
+        source=source,
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        status="ok",
+        output=str(result.output_path),
+        seconds=time.perf_counter() - started,
+        output_bytes=result.file_size,
+    )
+
+
+def run_batch(
+    inputs: List[Path],
+    output_dir: Path,
+    manifest: BatchManifest,
+    request_fields: Dict[str, object],
+    workers: int = 1,
+    use_threads: bool = False,
+    on_record: Optional[Callable[[BatchRecord, BatchSummary], None]] = None,
+) -> BatchSummary:
+    """Convert ``inputs`` on a worker pool, skipping files the manifest has done.
+
+    ``on_record`` is called after each file with its record and the running
+    summary, whose throughput figures cover the batch so far.
+
+    Process workers each build one pipeline at start-up and keep PDF
+    extraction and image encoding single-process to avoid oversubscribing
+    cores; thread workers build one pipeline per thread.
+    """
+    summary = BatchSummary(total=len(inputs))
+    pending = []
+    for path in inputs:
+        if manifest.is_done(path):
+            summary.skipped += 1
+        else:
+            pending.append(path)
+
+    workers = max(1, min(workers, len(pending) or 1))
+    use_local_formatter = bool(request_fields.get("use_local_formatter", False))
+    init_args = (str(output_dir), use_local_formatter, None if use_threads else 1)
+    executor: Executor
+    if use_threads:
+        executor = ThreadPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=init_args
+        )
+    else:
+        executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=init_args
+        )
+
+    names = output_names(inputs)
+    started = time.perf_counter()
+    with executor:
+        futures = [
+            executor.submit(_convert_one, str(path), names[path], request_fields)
+            for path in pending
+        ]
+        for future in as_completed(futures):
+            record = future.result()
+            manifest.append(record)
+            summary.input_bytes += record.size
+            if record.status == "ok":
+                summary.succeeded += 1
+                summary.output_bytes += record.output_bytes
+            else:
+                summary.failed += 1
+                summary.failures.append(record)
+            summary.elapsed = time.perf_counter() - started
+            if on_record is not None:
+                on_record(record, summary)
+    summary.elapsed = time.perf_counter() - started
+    return summary
@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, TextIO
+
+from .config import SETTINGS
+from .metrics import CACHE_EVENTS
+
+_READ_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path: Path) -> str:
+    """Return the SHA-256 hex digest of a file, read in fixed-size chunks."""
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(_READ_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class CacheStats:
+    """Per-instance counts; every change is also added to ``CACHE_EVENTS``."""
+
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+
+class ExtractionCache:
+    """On-disk, content-addressed store for extracted Markdown.
+
+    Entries are keyed by the source file digest plus the identity of the
+    backend that produced them. Writes go through a temp file and
+    ``os.replace`` so several workers can share one directory; reads bump the
+    entry's mtime, which drives least-recently-used eviction once the
+    directory grows beyond ``max_bytes``. The directory is only scanned when
+    the size tracked since the last scan passes that budget; entries other
+    processes write are counted at the next scan.
+    """
+
+    suffix = ".md"
+    kind = "extraction"
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        # Bytes on disk as of the last scan plus what this process wrote since.
+        self._bytes: Optional[int] = None
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_settings(cls) -> Optional["ExtractionCache"]:
+        if SETTINGS.mineru_cache_max_bytes <= 0:
+            return None
+        return cls(SETTINGS.mineru_cache_dir, SETTINGS.mineru_cache_max_bytes)
+
+    def _path_for(self, digest: str, backend: str) -> Path:
+        key = hashlib.sha256(f"{backend}\0{digest}".encode("utf-8")).hexdigest()
+        return self.root / key[:2] / f"{key}{self.suffix}"
+
+    def _count(self, field: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self.stats, field, getattr(self.stats, field) + amount)
+        CACHE_EVENTS.inc(amount, cache=self.kind, event=field)
+
+    def get(self, digest: str, backend: str) -> Optional[str]:
+        path = self._path_for(digest, backend)
+        try:
+            content = path.read_text(encoding="utf-8")
+            os.utime(path)
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return content
+
+    def put(self, digest: str, backend: str, markdown: str) -> None:
+        with self.writer(digest, backend) as handle:
+            handle.write(markdown)
+
+    @contextmanager
+    def writer(self, digest: str, backend: str) -> Iterator[TextIO]:
+        """Write an entry piece by piece; it only becomes visible on success."""
+        path = self._path_for(digest, backend)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                yield handle
+            size = os.stat(temp_name).st_size
+            os.replace(temp_name, path)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+        self._count("writes")
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes += size
+            due = self._bytes is None or self._bytes > self.max_bytes
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """Remove least recently used entries until the cache fits its budget."""
+        entries = []
+        total = 0
+        for path in self.root.glob(f"*/*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        removed = 0
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        with self._lock:
+            self._bytes = total
+        if removed:
+            self._count("evictions", removed)
+        return removed
+
+
+def llm_cache_key(identity: Dict[str, Any], metadata: Dict[str, str], text: str) -> str:
+    """Derive a stable cache key from client identity, metadata and input."""
+    payload = json.dumps(
+        {
+            "identity": identity,
+            "metadata": metadata,
+            "input": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """SQLite-backed store for LLM responses with TTL and size-based eviction.
+
+    Each thread gets its own connection; the database runs in WAL mode so
+    several worker processes can share one file. Storage errors are treated as
+    cache misses rather than conversion failures. Writes only run
+    :meth:`evict` when the size tracked since the last pass exceeds
+    ``max_bytes``, or every :attr:`expire_every` writes to drop expired rows.
+    """
+
+    expire_every = 256
+    kind = "llm"
+
+    def __init__(self, path: Path, max_bytes: int, ttl_seconds: float) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Bytes stored as of the last eviction plus what this process added.
+        self._bytes: Optional[int] = None
+        self._writes = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created REAL NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_created ON responses (created)"
+            )
+
+    @classmethod
+    def from_settings(cls) -> Optional["LLMResponseCache"]:
+        if SETTINGS.llm_cache_max_bytes <= 0:
+            return None
+        return cls(
+            SETTINGS.llm_cache_path,
+            SETTINGS.llm_cache_max_bytes,
+            SETTINGS.llm_cache_ttl_seconds,
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(str(self.path), timeout=30.0)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def _count(self, field: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self.stats, field, getattr(self.stats, field) + amount)
+        CACHE_EVENTS.inc(amount, cache=self.kind, event=field)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        try:
+            with self._connection() as connection:
+                row = connection.execute(
+                    "SELECT value, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] > self.ttl_seconds:
+                    connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    row = None
+                if row is not None:
+                    connection.execute(
+                        "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+                    )
+        except sqlite3.Error:
+            row = None
+        if row is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        try:
+            with self._connection() as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now, now),
+                )
+            self._count("writes")
+            with self._lock:
+                self._writes += 1
+                if self._bytes is not None:
+                    self._bytes += size
+                due = (
+                    self._bytes is None
+                    or self._bytes > self.max_bytes
+                    or self._writes % self.expire_every == 0
+                )
+            if due:
+                self.evict()
+        except sqlite3.Error:
+            return
+
+    def evict(self) -> int:
+        """Drop expired rows, then least recently used rows beyond ``max_bytes``."""
+        with self._connection() as connection:
+            removed = connection.execute(
+                "DELETE FROM responses WHERE created < ?",
+                (time.time() - self.ttl_seconds,),
+            ).rowcount
+            total = connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+            if total > self.max_bytes:
+                rows = connection.execute(
+                    "SELECT key, size FROM responses ORDER BY accessed"
+                )
+                stale = []
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    stale.append((key,))
+                    total -= size
+                connection.executemany("DELETE FROM responses WHERE key = ?", stale)
+                removed += len(stale)
+        with self._lock:
+            self._bytes = total
+        if removed:
+            self._count("evictions", removed)
+        return removed
@@ -0,0 +1,484 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from html import escape
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    from lxml.html import HtmlElement
+
+    from .html_document import HtmlSource
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+_FOOTNOTE_DEF_RE = re.compile(r"^\[\^([^\]]+)\]:\s?")
+_FOOTNOTE_REF_RE = re.compile(r"\[\^([^\]]+)\](?!:)")
+# A fence before ``<!DOCTYPE>`` makes the parser put the head in the body.
+_HEAD_TAGS = {"title", "meta", "link", "base"}
+_WRAPPER_RE = re.compile(
+    r"```(?:html)?|<!DOCTYPE[^>]*>|<\?xml[^>]*\?>|</?html[^>]*>|<head[^>]*>.*?</head>"
+    r"|</?body[^>]*>",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+@dataclass
+class MarkdownChunk:
+    """A heading-aligned slice of a Markdown document."""
+
+    index: int
+    text: str
+    title: Optional[str] = None
+    total: int = 1
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate: ~4 ASCII characters per token, 1 per CJK character."""
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+def _extract_footnote_definitions(lines: List[str]) -> Tuple[List[str], Dict[str, str]]:
+    body: List[str] = []
+    definitions: Dict[str, str] = {}
+    current: Optional[str] = None
+    in_fence = False
+    for line in lines:
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        if not in_fence:
+            match = _FOOTNOTE_DEF_RE.match(line)
+            if match:
+                current = match.group(1)
+                definitions[current] = line
+                continue
+            if current and (line.startswith(("    ", "\t")) or not line.strip()):
+                definitions[current] += "\n" + line
+                continue
+        current = None
+        body.append(line)
+    return body, {label: text.rstrip() for label, text in definitions.items()}
+
+
+def split_sections(markdown_text: str) -> List[Tuple[Optional[str], str]]:
+    """Split Markdown at ATX heading boundaries, ignoring fenced code blocks."""
+    sections: List[Tuple[Optional[str], List[str]]] = [(None, [])]
+    in_fence = False
+    for line in markdown_text.splitlines():
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING_RE.match(line)
+        if match:
+            sections.append((match.group(2), [line]))
+        else:
+            sections[-1][1].append(line)
+    return [
+        (title, "\n".join(lines).strip("\n"))
+        for title, lines in sections
+        if "\n".join(lines).strip()
+    ]
+
+
+def _split_paragraphs(text: str, max_tokens: int) -> List[str]:
+    pieces: List[str] = []
+    current: List[str] = []
+    in_fence = False
+    for line in text.splitlines():
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        current.append(line)
+        if not in_fence and not line.strip():
+            if estimate_tokens("\n".join(current)) >= max_tokens:
+                pieces.append("\n".join(current).strip("\n"))
+                current = []
+    if current and "\n".join(current).strip():
+        pieces.append("\n".join(current).strip("\n"))
+    return pieces
+
+
+def split_markdown(markdown_text: str, max_tokens: int) -> List[MarkdownChunk]:
+    """Pack heading-delimited sections into chunks of at most ``max_tokens``.
+
+    Footnote definitions travel with every chunk that references them so each
+    chunk can be rendered on its own. Sections larger than the budget are split
+    further at paragraph boundaries.
+    """
+    body_lines, definitions = _extract_footnote_definitions(markdown_text.splitlines())
+    packed: List[Tuple[Optional[str], List[str]]] = []
+    budget = max(max_tokens, 1)
+    current_title: Optional[str] = None
+    current: List[str] = []
+    current_tokens = 0
+
+    for title, section in split_sections("\n".join(body_lines)):
+        parts = (
+            _split_paragraphs(section, budget)
+            if estimate_tokens(section) > budget
+            else [section]
+        )
+        for part in parts:
+            part_tokens = estimate_tokens(part)
+            if current and current_tokens + part_tokens > budget:
+                packed.append((current_title, current))
+                current, current_tokens, current_title = [], 0, None
+            if not current:
+                current_title = title
+            current.append(part)
+            current_tokens += part_tokens
+    if current:
+        packed.append((current_title, current))
+    if not packed:
+        packed.append((None, []))
+
+    return _attach_footnotes(packed, definitions)
+
+
+def split_chapters(markdown_text: str) -> List[MarkdownChunk]:
+    """Split Markdown into one chunk per ``#`` chapter, plus any preamble.
+
+    Unlike :func:`split_markdown` there is no token budget: chunk boundaries
+    depend only on the chapter structure, so editing one chapter leaves every
+    other chunk byte-for-byte identical.
+    """
+    body_lines, definitions = _extract_footnote_definitions(markdown_text.splitlines())
+    chapters: List[Tuple[Optional[str], List[str]]] = []
+    for title, section in split_sections("\n".join(body_lines)):
+        heading = _HEADING_RE.match(section.split("\n", 1)[0])
+        if not chapters or (heading and heading.group(1) == "#"):
+            chapters.append((title, [section]))
+        else:
+            chapters[-1][1].append(section)
+    if not chapters:
+        chapters.append((None, []))
+    return _attach_footnotes(chapters, definitions)
+
+
+def iter_chapters(
+    blocks: Iterable[str], max_tokens: int = 0
+) -> Iterator[MarkdownChunk]:
+    """Streaming counterpart of :func:`split_chapters`.
+
+    ``blocks`` are consecutive pieces of one Markdown document (pages,
+    paragraphs or whole chapters); each chapter is yielded as soon as the
+    next ``#`` heading arrives. With ``max_tokens``, a chapter that grows
+    past the budget is also cut at the next block boundary outside a code
+    fence, so documents without headings (such as extracted PDF pages)
+    still arrive in bounded pieces. Footnote definitions stay where they
+    are, so they must appear in the chapter that references them. The
+    number of chapters is unknown up front and ``total`` is left at ``0``.
+    """
+    lines: List[str] = []
+    tokens = 0
+    title: Optional[str] = None
+    index = 0
+    in_fence = False
+
+    def chunk() -> Optional[MarkdownChunk]:
+        text = "\n".join(lines).strip("\n")
+        if not text.strip():
+            return None
+        return MarkdownChunk(index=index, text=text, title=title, total=0)
+
+    for block in blocks:
+        for line in block.splitlines():
+            if _FENCE_RE.match(line):
+                in_fence = not in_fence
+            match = None if in_fence else _HEADING_RE.match(line)
+            if match and match.group(1) == "#":
+                pending = chunk()
+                if pending is not None:
+                    yield pending
+                    index += 1
+                lines, tokens = [], 0
+                title = match.group(2)
+            lines.append(line)
+            tokens += estimate_tokens(line)
+        lines.append("")
+        if max_tokens > 0 and tokens >= max_tokens and not in_fence:
+            pending = chunk()
+            if pending is not None:
+                yield pending
+                index += 1
+            lines, tokens = [], 0
+            if title and not title.endswith(" (continued)"):
+                title = f"{title} (continued)"
+    pending = chunk()
+    if pending is not None:
+        yield pending
+    elif not index:
+        yield MarkdownChunk(index=0, text="", title=title, total=0)
+
+
+def _attach_footnotes(
+    packed: List[Tuple[Optional[str], List[str]]], definitions: Dict[str, str]
+) -> List[MarkdownChunk]:
+    """Append to each chunk the footnote definitions it references.
+
+    Definitions nobody references are kept with the last chunk.
+    """
+    referenced: set[str] = set()
+    chunks: List[MarkdownChunk] = []
+    for index, (title, parts) in enumerate(packed):
+        text = "\n\n".join(parts)
+        labels = list(dict.fromkeys(_FOOTNOTE_REF_RE.findall(text)))
+        notes = [definitions[label] for label in labels if label in definitions]
+        referenced.update(labels)
+        if index == len(packed) - 1:
+            notes.extend(
+                definition
+                for label, definition in definitions.items()
+                if label not in referenced
+            )
+        if notes:
+            text = text + "\n\n" + "\n\n".join(notes)
+        chunks.append(
+            MarkdownChunk(index=index, text=text, title=title, total=len(packed))
+        )
+    return chunks
+
+
+def _fragment_body(fragment: HtmlSource) -> HtmlElement:
+    """The ``<body>`` of a fragment, parsed with lxml unless it already is."""
+    from .html_document import body_of, parse_html
+
+    if not isinstance(fragment, str):
+        return body_of(fragment)
+    return body_of(parse_html(_WRAPPER_RE.sub("", fragment)))
+
+
+def _namespace_ids(root: HtmlElement, suffix: str) -> None:
+    ids = {}
+    for element in root.iterdescendants():
+        if isinstance(element.tag, str) and element.get("id"):
+            ids[element.get("id")] = f"{element.get('id')}-{suffix}"
+            element.set("id", ids[element.get("id")])
+    for anchor in root.iterdescendants("a"):
+        href = anchor.get("href") or ""
+        if href.startswith("#") and href[1:] in ids:
+            anchor.set("href", "#" + ids[href[1:]])
+
+
+def _append_contents(target: HtmlElement, source: HtmlElement) -> None:
+    """Move the text and child nodes of ``source`` to the end of ``target``."""
+    if source.text:
+        if len(target):
+            target[-1].tail = (target[-1].tail or "") + source.text
+        else:
+            target.text = (target.text or "") + source.text
+    for node in list(source):
+        target.append(node)
+
+
+def _build_toc(root: HtmlElement, toc_depth: int) -> Optional[HtmlElement]:
+    from lxml.html import Element
+
+    nav = Element("nav", id="toc")
+    stack: List[Tuple[int, HtmlElement]] = []
+    levels = [f"h{level}" for level in range(1, toc_depth + 1)]
+    for position, heading in enumerate(root.iter(*levels), start=1):
+        if not heading.get("id"):
+            heading.set("id", f"section-{position}")
+        level = int(heading.tag[1])
+        if not stack or level > stack[-1][0]:
+            parent = stack[-1][1][-1] if stack else nav
+            stack.append((level, Element("ol")))
+            parent.append(stack[-1][1])
+        else:
+            while len(stack) > 1 and level < stack[-1][0]:
+                stack.pop()
+        item = Element("li")
+        link = Element("a", href=f"#{heading.get('id')}")
+        link.text = " ".join(heading.text_content().split())
+        item.append(link)
+        stack[-1][1].append(item)
+    return nav if stack else None
+
+
+def merge_fragments(
+    fragments: Sequence[HtmlSource],
+    suffixes: Sequence[Optional[str]],
+    drop_navigation: bool = False,
+) -> HtmlElement:
+    """Move fragments into one lxml document, suffixing IDs per fragment.
+
+    Each fragment is parsed at most once and its nodes are moved, not
+    copied or serialized. A ``None`` suffix leaves a fragment's IDs alone.
+    """
+    from lxml.html import Element
+
+    document = Element("html")
+    head = Element("head")
+    head.append(Element("meta", charset="utf-8"))
+    body = Element("body")
+    document.extend([head, body])
+    for fragment, suffix in zip(fragments, suffixes):
+        fragment_body = _fragment_body(fragment)
+        if drop_navigation:
+            for nav in list(fragment_body.iterdescendants("nav")):
+                nav.drop_tree()
+        if suffix:
+            _namespace_ids(fragment_body, suffix)
+        _append_contents(body, fragment_body)
+    return document
+
+
+def namespace_fragment(fragment: HtmlSource, suffix: str) -> HtmlElement:
+    """Parse a fragment and suffix every ID (and its in-fragment links)."""
+    body = _fragment_body(fragment)
+    _namespace_ids(body, suffix)
+    return body
+
+
+class HtmlSectionAssembler:
+    """Cut a stream of HTML text into sections that each start at an ``<h1>``.
+
+    Feed arbitrary pieces of the stream (e.g. completion tokens) to an
+    incremental lxml parser; a section is returned as soon as the next
+    top-level ``<h1>`` opens, and the remainder is returned by :meth:`close`.
+    Headings nested in other elements, comments and CDATA never cut a
+    section. Document wrappers (``<html>``, ``<head>``, ``<body>`` and
+    Markdown code fences) are stripped from the output.
+    """
+
+    def __init__(self) -> None:
+        self._reset()
+
+    def _reset(self) -> None:
+        self._new_parser()
+        self._section: List[str] = []
+
+    def _new_parser(self) -> None:
+        from lxml import etree
+
+        self._parser = etree.HTMLPullParser(events=("start",))
+        self._body = None
+        self._fed = False
+
+    def feed(self, text: str) -> List[str]:
+        if not text:
+            return []
+        self._fed = True
+        self._parser.feed(text)
+        sections: List[str] = []
+        for _, element in self._parser.read_events():
+            parent = element.getparent()
+            if parent is None or parent.tag != "body":
+                continue
+            self._body = parent
+            self._flush(until=element)
+            if element.tag == "h1":
+                section = self._take()
+                if section:
+                    sections.append(section)
+        return sections
+
+    def feed_tree(self, fragment: HtmlElement) -> List[str]:
+        """Add an already parsed fragment (a document or its ``<body>``).
+
+        Text fed so far must be complete HTML; it is parsed to the end first,
+        so the fragment continues the open section like more text would.
+        """
+        from lxml import etree
+
+        from .html_document import body_of
+
+        self._settle()
+        body = body_of(fragment)
+        sections: List[str] = []
+        if body.text:
+            self._section.append(escape(body.text, quote=False))
+        for node in body:
+            if node.tag == "h1":
+                section = self._take()
+                if section:
+                    sections.append(section)
+            if node.tag not in _HEAD_TAGS:
+                self._section.append(
+                    etree.tostring(node, method="html", encoding="unicode")
+                )
+            elif node.tail:
+                self._section.append(escape(node.tail, quote=False))
+        return sections
+
+    def close(self) -> List[str]:
+        self._settle()
+        remainder = self._take()
+        self._reset()
+        return [remainder] if remainder else []
+
+    def _settle(self) -> None:
+        """Parse the text fed so far to its end, keeping the open section."""
+        if self._fed:
+            root = self._parser.close()
+            if self._body is None and root is not None:
+                self._body = root.find("body")
+            self._flush()
+        self._new_parser()
+
+    def _flush(self, until: object = None) -> None:
+        """Move finished top-level nodes before ``until`` into the section."""
+        from lxml import etree
+
+        body = self._body
+        if body is None:
+            return
+        if body.text:
+            self._section.append(escape(body.text, quote=False))
+            body.text = None
+        for node in list(body):
+            if node is until:
+                break
+            if node.tag not in _HEAD_TAGS:
+                self._section.append(
+                    etree.tostring(node, method="html", encoding="unicode")
+                )
+            elif node.tail:
+                self._section.append(escape(node.tail, quote=False))
+            body.remove(node)
+
+    def _take(self) -> str:
+        section = _WRAPPER_RE.sub("", "".join(self._section)).strip()
+        self._section = []
+        return section
+
+
+def iter_html_sections(pieces: Iterable[str]) -> Iterator[str]:
+    """Yield ``<h1>`` sections from an iterable of HTML text pieces."""
+    assembler = HtmlSectionAssembler()
+    for piece in pieces:
+        yield from assembler.feed(piece)
+    yield from assembler.close()
+
+
+def stitch_html_fragments(
+    fragments: Sequence[HtmlSource], toc_depth: int = 2
+) -> HtmlElement:
+    """Join per-chunk HTML into one lxml document with a single, global TOC.
+
+    Per-chunk ``<nav>`` elements are dropped and element IDs are suffixed with
+    the chunk index so footnote anchors from different chunks cannot collide.
+    The result is the tree the EPUB builder works on; it is not serialized.
+    """
+    from .html_document import body_of
+
+    document = merge_fragments(
+        fragments,
+        [f"c{index}" for index in range(len(fragments))],
+        drop_navigation=True,
+    )
+    body = body_of(document)
+    nav = _build_toc(body, toc_depth)
+    if nav is not None:
+        nav.tail, body.text = body.text, None
+        body.insert(0, nav)
+    return document
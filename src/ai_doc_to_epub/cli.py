@@ -1,12 +1,16 @@
 from __future__ import annotations
 
+import os
 import sys
 from pathlib import Path
+from typing import Optional
 
 import typer
 
-from .models import ConversionRequest
-from .pipeline import ConversionPipeline
+from .config import SETTINGS
+
+# Commands import the pipeline and its dependencies when they run, so
+# ``--help`` and ``runserver`` do not pay for them.
 
 app = typer.Typer(help="Convert PDF and Word documents into polished EPUB files.")
 
@@ -23,6 +27,25 @@ def convert(
         "--local-formatter",
         help="Use deterministic local HTML formatter instead of calling an LLM.",
     ),
+    timings: bool = typer.Option(
+        False, "--timings", help="Print the time spent in each pipeline stage."
+    ),
+    incremental: bool = typer.Option(
+        False,
+        "--incremental",
+        help="Re-enhance only chapters changed since the last build of this title.",
+    ),
+    stream: bool = typer.Option(
+        False,
+        "--stream",
+        help="Convert chapter by chapter to keep memory flat for huge documents.",
+    ),
+    deadline: Optional[float] = typer.Option(
+        None,
+        "--deadline",
+        min=0.1,
+        help="Seconds allowed for the conversion; late chapters are formatted locally.",
+    ),
 ) -> None:
     """Convert a document and print the resulting EPUB path."""
     if not file_path.exists():
@@ -34,6 +57,9 @@ def convert(
         typer.secho("Only PDF and Word documents are supported.", fg=typer.colors.RED)
         raise typer.Exit(code=1)
 
+    from .models import ConversionRequest
+    from .pipeline import ConversionPipeline
+
     pipeline = ConversionPipeline()
     request = ConversionRequest(
         title=title,
@@ -41,9 +67,27 @@ def convert(
         language=language,
         description=description,
         use_local_formatter=local_formatter,
+        incremental=incremental,
+        streaming=stream,
+        deadline_seconds=deadline,
     )
     result = pipeline.convert(file_path, request)
     typer.secho(f"EPUB created at: {result.output_path}", fg=typer.colors.GREEN)
+    if result.reused_sections is not None:
+        typer.echo(
+            f"Enhanced {result.enhanced_sections} chapter(s), "
+            f"reused {result.reused_sections}."
+        )
+    for section in result.degraded_sections:
+        typer.secho(
+            f"Chapter {section.index} ({section.title or 'untitled'}) formatted "
+            f"locally: {section.reason}",
+            fg=typer.colors.YELLOW,
+        )
+    if timings:
+        for stage, seconds in result.timings.items():
+            typer.echo(f"  {stage:<12} {seconds:8.3f}s")
+        typer.echo(f"  {'total':<12} {sum(result.timings.values()):8.3f}s")
 
 
 @app.command()
@@ -64,6 +108,87 @@ def runserver(
     uvicorn.run(fastapi_app, host=host, port=port, reload=reload)
 
 
+@app.command()
+def batch(
+    target: str = typer.Argument(..., help="Directory or glob pattern of documents."),
+    output_dir: Path = typer.Option(
+        SETTINGS.workspace_dir, "--output-dir", "-o", help="Where EPUBs are written."
+    ),
+    author: str = typer.Option("Unknown Author", "--author", "-a", help="Author name."),
+    language: str = typer.Option("en", "--language", "-l", help="Language code."),
+    local_formatter: bool = typer.Option(
+        False,
+        "--local-formatter",
+        help="Use deterministic local HTML formatter instead of calling an LLM.",
+    ),
+    workers: int = typer.Option(
+        os.cpu_count() or 1, "--workers", "-w", help="Concurrent conversions."
+    ),
+    threads: bool = typer.Option(
+        False, "--threads", help="Use worker threads instead of processes."
+    ),
+    incremental: bool = typer.Option(
+        False,
+        "--incremental",
+        help="Re-enhance only chapters changed since each file's last build.",
+    ),
+    manifest: Optional[Path] = typer.Option(
+        None,
+        help="JSONL manifest used to resume; defaults to <output-dir>/batch.jsonl.",
+    ),
+) -> None:
+    """Convert every document in a directory or glob, resuming interrupted runs."""
+    from .batch import (
+        BatchManifest,
+        BatchRecord,
+        BatchSummary,
+        discover_inputs,
+        run_batch,
+    )
+
+    inputs = discover_inputs(target)
+    if not inputs:
+        typer.secho(f"No PDF or Word documents match: {target}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+
+    batch_manifest = BatchManifest(manifest or output_dir / "batch.jsonl")
+    request_fields = {
+        "author": author,
+        "language": language,
+        "use_local_formatter": local_formatter,
+        "incremental": incremental,
+    }
+    with typer.progressbar(length=len(inputs), label="Converting") as bar:
+
+        def advance(record: BatchRecord, running: BatchSummary) -> None:
+            bar.label = (
+                f"Converting ({running.files_per_second:.2f} files/s, "
+                f"{running.megabytes_per_second:.2f} MB/s)"
+            )
+            bar.update(1)
+
+        summary = run_batch(
+            inputs,
+            output_dir,
+            batch_manifest,
+            request_fields,
+            workers=workers,
+            use_threads=threads,
+            on_record=advance,
+        )
+        bar.update(summary.skipped)
+
+    typer.secho(
+        f"{summary.succeeded} converted, {summary.failed} failed, "
+        f"{summary.skipped} already done in {summary.elapsed:.1f}s "
+        f"({summary.files_per_second:.2f} files/s, "
+        f"{summary.megabytes_per_second:.2f} MB/s)",
+        fg=typer.colors.RED if summary.failed else typer.colors.GREEN,
+    )
+    for record in summary.failures:
+        typer.secho(f"  {record.source}: {record.error}", fg=typer.colors.RED)
+    if summary.failed:
+        raise typer.Exit(code=1)
 
 
 def main() -> None:
@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+import json
 import os
-from dataclasses import dataclass
+import shlex
+from dataclasses import dataclass, field
 from functools import cached_property
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional
+
+
+def _as_bool(value: str) -> bool:
+    return value.strip().lower() in {"1", "true", "yes", "on"}
 
 
 @dataclass
@@ -16,10 +22,59 @@ class Settings:
     llm_model: str = "gpt-4o-mini"
     llm_temperature: float = 0.2
     llm_max_output_tokens: int = 3500
+    llm_chunk_tokens: int = 1500
+    llm_max_concurrency: int = 4
+    llm_stream: bool = False
+    llm_stream_usage: bool = True
+    llm_endpoints: List[Dict[str, Any]] = field(default_factory=list)
+    llm_routing_strategy: str = "least_loaded"
+    llm_hedge_after_seconds: float = 0.0
+    deadline_reserve_seconds: float = 1.0
+    llm_cache_path: Optional[Path] = None
+    llm_cache_max_bytes: int = 256 * 1024 * 1024
+    llm_cache_ttl_seconds: float = 30 * 24 * 3600
     mineru_api_url: Optional[str] = None
     mineru_api_key: Optional[str] = None
+    mineru_api_urls: List[str] = field(default_factory=list)
+    mineru_http_timeout: float = 300.0
+    mineru_http_max_attempts: int = 3
+    mineru_http_backoff_seconds: float = 0.5
+    mineru_health_interval_seconds: float = 30.0
     mineru_binary_path: Optional[Path] = None
+    mineru_worker_command: List[str] = field(default_factory=list)
+    mineru_workers: int = 1
+    mineru_worker_max_jobs: int = 100
+    mineru_worker_max_rss_mb: int = 0
+    mineru_worker_timeout: float = 600.0
+    mineru_lang: str = "ch"
+    pdf_extract_workers: int = 0
+    pdf_pages_per_chunk: int = 16
+    pdf_parallel_min_pages: int = 64
+    mineru_cache_dir: Optional[Path] = None
+    mineru_cache_max_bytes: int = 1024 * 1024 * 1024
+    incremental_dir: Optional[Path] = None
+    incremental_max_bytes: int = 1024 * 1024 * 1024
+    incremental_max_age_seconds: float = 90 * 24 * 3600
+    media_dir: Optional[Path] = None
+    media_max_bytes: int = 2 * 1024 * 1024 * 1024
+    media_max_age_seconds: float = 30 * 24 * 3600
+    output_store_dir: Optional[Path] = None
+    output_store_max_bytes: int = 5 * 1024 * 1024 * 1024
+    output_store_max_age_seconds: float = 7 * 24 * 3600
+    image_max_dimension: int = 1600
+    image_quality: int = 80
+    image_workers: int = 0
     default_language: str = "en"
+    stream_queue_size: int = 4
+    stream_chapter_tokens: int = 8000
+    upload_max_bytes: int = 512 * 1024 * 1024
+    upload_chunk_size: int = 1024 * 1024
+    job_workers: int = 2
+    job_queue_size: int = 16
+    job_retention_seconds: float = 3600.0
+    service_warmup: bool = True
+    shutdown_grace_seconds: float = 30.0
+    drain_token: Optional[str] = None
     workspace_dir: Path = Path(os.getenv("APP_WORKSPACE", "/tmp/ai-doc-to-epub"))
 
     def __post_init__(self) -> None:
@@ -31,14 +86,154 @@ class Settings:
         self.llm_max_output_tokens = int(
             env("LLM_MAX_OUTPUT_TOKENS", str(self.llm_max_output_tokens))
         )
+        self.llm_chunk_tokens = int(env("LLM_CHUNK_TOKENS", str(self.llm_chunk_tokens)))
+        self.llm_max_concurrency = int(
+            env("LLM_MAX_CONCURRENCY", str(self.llm_max_concurrency))
+        )
+        self.llm_stream = _as_bool(env("LLM_STREAM", str(self.llm_stream)))
+        self.llm_stream_usage = _as_bool(
+            env("LLM_STREAM_USAGE", str(self.llm_stream_usage))
+        )
+        llm_endpoints = env("LLM_ENDPOINTS")
+        if llm_endpoints:
+            self.llm_endpoints = json.loads(llm_endpoints)
+        self.llm_routing_strategy = env(
+            "LLM_ROUTING_STRATEGY", self.llm_routing_strategy
+        )
+        self.llm_hedge_after_seconds = float(
+            env("LLM_HEDGE_AFTER_SECONDS", str(self.llm_hedge_after_seconds))
+        )
+        self.deadline_reserve_seconds = float(
+            env("DEADLINE_RESERVE_SECONDS", str(self.deadline_reserve_seconds))
+        )
         self.mineru_api_url = env("MINERU_API_URL", self.mineru_api_url)
         self.mineru_api_key = env("MINERU_API_KEY", self.mineru_api_key)
+        mineru_urls = env("MINERU_API_URLS")
+        if mineru_urls:
+            self.mineru_api_urls = [
+                url.strip() for url in mineru_urls.split(",") if url.strip()
+            ]
+        self.mineru_http_timeout = float(
+            env("MINERU_HTTP_TIMEOUT", str(self.mineru_http_timeout))
+        )
+        self.mineru_http_max_attempts = int(
+            env("MINERU_HTTP_MAX_ATTEMPTS", str(self.mineru_http_max_attempts))
+        )
+        self.mineru_http_backoff_seconds = float(
+            env("MINERU_HTTP_BACKOFF_SECONDS", str(self.mineru_http_backoff_seconds))
+        )
+        self.mineru_health_interval_seconds = float(
+            env(
+                "MINERU_HEALTH_INTERVAL_SECONDS",
+                str(self.mineru_health_interval_seconds),
+            )
+        )
         mineru_binary = env("MINERU_BINARY_PATH")
         if mineru_binary:
             self.mineru_binary_path = Path(mineru_binary)
+        mineru_worker_command = env("MINERU_WORKER_COMMAND")
+        if mineru_worker_command:
+            self.mineru_worker_command = shlex.split(mineru_worker_command)
+        self.mineru_workers = int(env("MINERU_WORKERS", str(self.mineru_workers)))
+        self.mineru_worker_max_jobs = int(
+            env("MINERU_WORKER_MAX_JOBS", str(self.mineru_worker_max_jobs))
+        )
+        self.mineru_worker_max_rss_mb = int(
+            env("MINERU_WORKER_MAX_RSS_MB", str(self.mineru_worker_max_rss_mb))
+        )
+        self.mineru_worker_timeout = float(
+            env("MINERU_WORKER_TIMEOUT", str(self.mineru_worker_timeout))
+        )
+        self.mineru_lang = env("MINERU_LANG", self.mineru_lang)
+        self.upload_max_bytes = int(env("UPLOAD_MAX_BYTES", str(self.upload_max_bytes)))
+        self.upload_chunk_size = int(
+            env("UPLOAD_CHUNK_SIZE", str(self.upload_chunk_size))
+        )
+        self.job_workers = int(env("JOB_WORKERS", str(self.job_workers)))
+        self.job_queue_size = int(env("JOB_QUEUE_SIZE", str(self.job_queue_size)))
+        self.job_retention_seconds = float(
+            env("JOB_RETENTION_SECONDS", str(self.job_retention_seconds))
+        )
+        self.service_warmup = _as_bool(env("SERVICE_WARMUP", str(self.service_warmup)))
+        self.shutdown_grace_seconds = float(
+            env("SHUTDOWN_GRACE_SECONDS", str(self.shutdown_grace_seconds))
+        )
+        self.drain_token = env("DRAIN_TOKEN", self.drain_token)
         workspace = env("APP_WORKSPACE")
         if workspace:
             self.workspace_dir = Path(workspace)
+        self.pdf_extract_workers = int(
+            env("PDF_EXTRACT_WORKERS", str(self.pdf_extract_workers))
+        )
+        self.pdf_pages_per_chunk = int(
+            env("PDF_PAGES_PER_CHUNK", str(self.pdf_pages_per_chunk))
+        )
+        self.pdf_parallel_min_pages = int(
+            env("PDF_PARALLEL_MIN_PAGES", str(self.pdf_parallel_min_pages))
+        )
+        mineru_cache = env("MINERU_CACHE_DIR")
+        if mineru_cache:
+            self.mineru_cache_dir = Path(mineru_cache)
+        elif self.mineru_cache_dir is None:
+            self.mineru_cache_dir = self.workspace_dir / "cache" / "mineru"
+        self.mineru_cache_max_bytes = int(
+            env("MINERU_CACHE_MAX_BYTES", str(self.mineru_cache_max_bytes))
+        )
+        incremental = env("INCREMENTAL_DIR")
+        if incremental:
+            self.incremental_dir = Path(incremental)
+        elif self.incremental_dir is None:
+            self.incremental_dir = self.workspace_dir / "incremental"
+        self.incremental_max_bytes = int(
+            env("INCREMENTAL_MAX_BYTES", str(self.incremental_max_bytes))
+        )
+        self.incremental_max_age_seconds = float(
+            env("INCREMENTAL_MAX_AGE_SECONDS", str(self.incremental_max_age_seconds))
+        )
+        media = env("MEDIA_DIR")
+        if media:
+            self.media_dir = Path(media)
+        elif self.media_dir is None:
+            self.media_dir = self.workspace_dir / "media"
+        self.media_max_bytes = int(env("MEDIA_MAX_BYTES", str(self.media_max_bytes)))
+        self.media_max_age_seconds = float(
+            env("MEDIA_MAX_AGE_SECONDS", str(self.media_max_age_seconds))
+        )
+        output_store = env("OUTPUT_STORE_DIR")
+        if output_store:
+            self.output_store_dir = Path(output_store)
+        elif self.output_store_dir is None:
+            self.output_store_dir = self.workspace_dir / "outputs"
+        self.output_store_max_bytes = int(
+            env("OUTPUT_STORE_MAX_BYTES", str(self.output_store_max_bytes))
+        )
+        self.output_store_max_age_seconds = float(
+            env(
+                "OUTPUT_STORE_MAX_AGE_SECONDS", str(self.output_store_max_age_seconds)
+            )
+        )
+        self.image_max_dimension = int(
+            env("IMAGE_MAX_DIMENSION", str(self.image_max_dimension))
+        )
+        self.image_quality = int(env("IMAGE_QUALITY", str(self.image_quality)))
+        self.image_workers = int(env("IMAGE_WORKERS", str(self.image_workers)))
+        self.stream_queue_size = int(
+            env("STREAM_QUEUE_SIZE", str(self.stream_queue_size))
+        )
+        self.stream_chapter_tokens = int(
+            env("STREAM_CHAPTER_TOKENS", str(self.stream_chapter_tokens))
+        )
+        llm_cache = env("LLM_CACHE_PATH")
+        if llm_cache:
+            self.llm_cache_path = Path(llm_cache)
+        elif self.llm_cache_path is None:
+            self.llm_cache_path = self.workspace_dir / "cache" / "llm.sqlite3"
+        self.llm_cache_max_bytes = int(
+            env("LLM_CACHE_MAX_BYTES", str(self.llm_cache_max_bytes))
+        )
+        self.llm_cache_ttl_seconds = float(
+            env("LLM_CACHE_TTL_SECONDS", str(self.llm_cache_ttl_seconds))
+        )
 
     @cached_property
     def has_llm_credentials(self) -> bool:
@@ -46,7 +241,7 @@ class Settings:
 
     @cached_property
     def has_mineru_remote(self) -> bool:
-        return bool(self.mineru_api_url)
+        return bool(self.mineru_api_url or self.mineru_api_urls)
 
     @cached_property
     def has_mineru_local(self) -> bool:
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence
+
+from .chunking import (
+    MarkdownChunk,
+    estimate_tokens,
+    split_chapters,
+    stitch_html_fragments,
+)
+from .llm_client import BaseLLMClient, LocalFormatterLLM
+from .metrics import DEGRADED_SECTIONS
+from .models import DegradedSection
+
+if TYPE_CHECKING:
+    from .html_document import HtmlSource
+
+
+class LatencyEstimator:
+    """Exponentially weighted average of LLM seconds per input token.
+
+    The average expires ``max_age`` seconds after the last observation, so a
+    slow spell long past does not keep predicting misses forever.
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.3,
+        max_age: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.alpha = alpha
+        self.max_age = max_age
+        self._seconds_per_token: Optional[float] = None
+        self._observed_at = 0.0
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def observe(self, tokens: int, seconds: float) -> None:
+        rate = seconds / max(tokens, 1)
+        with self._lock:
+            self._observed_at = self._clock()
+            if self._seconds_per_token is None:
+                self._seconds_per_token = rate
+            else:
+                self._seconds_per_token += self.alpha * (rate - self._seconds_per_token)
+
+    def predict(self, tokens: int) -> Optional[float]:
+        """Expected call duration, or ``None`` without a recent observation."""
+        with self._lock:
+            if self._seconds_per_token is None:
+                return None
+            if self._clock() - self._observed_at > self.max_age:
+                self._seconds_per_token = None
+                return None
+            return self._seconds_per_token * max(tokens, 1)
+
+
+_ESTIMATORS: Dict[str, LatencyEstimator] = {}
+_ESTIMATORS_LOCK = threading.Lock()
+
+
+def estimator_for(identity: Dict[str, Any]) -> LatencyEstimator:
+    """Process-wide estimator per client identity, so conversions share history."""
+    key = json.dumps(identity, sort_keys=True, default=str)
+    with _ESTIMATORS_LOCK:
+        return _ESTIMATORS.setdefault(key, LatencyEstimator())
+
+
+class _PredictedMiss(Exception):
+    pass
+
+
+class DeadlineLLMClient(BaseLLMClient):
+    """Enhance chapter by chapter, degrading late ones to the local formatter.
+
+    Every ``#`` chapter is sent to ``inner`` on its own. Chapters still
+    outstanding at ``deadline_at`` (a :func:`time.monotonic` timestamp), those
+    whose predicted latency would overrun it when they start, and those whose
+    call failed are rendered by ``fallback`` instead and listed in
+    :attr:`degraded`. The first predicted miss of each conversion is still
+    sent as a probe, so the shared estimate keeps learning when the LLM
+    speeds up again. With ``hedge_after`` set, a chapter that has not
+    returned after that many seconds gets a second, concurrent request and the
+    first answer wins. Abandoned calls keep running in the background, so a
+    response cache underneath still stores their results.
+
+    Instances keep per-conversion state; create one per conversion.
+    """
+
+    def __init__(
+        self,
+        inner: BaseLLMClient,
+        deadline_at: float,
+        fallback: Optional[BaseLLMClient] = None,
+        hedge_after: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        estimator: Optional[LatencyEstimator] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.inner = inner
+        self.deadline_at = deadline_at
+        self.fallback = fallback or LocalFormatterLLM()
+        self.hedge_after = hedge_after or None
+        self.max_concurrency = max_concurrency or getattr(inner, "max_concurrency", 4)
+        self.estimator = estimator or estimator_for(inner.cache_identity())
+        self.degraded: List[DegradedSection] = []
+        self._clock = clock
+        self._probe_sent = False
+        self._probe_lock = threading.Lock()
+
+    def cache_identity(self) -> Dict[str, Any]:
+        return self.inner.cache_identity()
+
+    def _probe(self) -> bool:
+        """Claim this conversion's one call despite a predicted miss."""
+        with self._probe_lock:
+            if self._probe_sent:
+                return False
+            self._probe_sent = True
+            return True
+
+    def enhance(self, markdown_text: str, metadata: Dict[str, str]) -> HtmlSource:
+        return stitch_html_fragments(
+            self.enhance_sections(split_chapters(markdown_text), metadata)
+        )
+
+    def enhance_sections(
+        self, sections: Sequence[MarkdownChunk], metadata: Dict[str, str]
+    ) -> List[HtmlSource]:
+        results: List[Optional[HtmlSource]] = [None] * len(sections)
+        reasons: Dict[int, str] = {}
+        started: Dict[int, float] = {}
+        started_lock = threading.Lock()
+
+        def attempt(index: int, hedge: bool = False) -> HtmlSource:
+            section = sections[index]
+            tokens = estimate_tokens(section.text)
+            begin = self._clock()
+            with started_lock:
+                started.setdefault(index, begin)
+            predicted = self.estimator.predict(tokens)
+            if not hedge and predicted is not None:
+                if begin + predicted > self.deadline_at and not self._probe():
+                    raise _PredictedMiss()
+            html = self.inner.enhance_sections([section], metadata)[0]
+            self.estimator.observe(tokens, self._clock() - begin)
+            return html
+
+        workers = max(1, min(self.max_concurrency, len(sections)))
+        executor = ThreadPoolExecutor(
+            max_workers=workers * (2 if self.hedge_after else 1),
+            thread_name_prefix="deadline-llm",
+        )
+        attempts: Dict[Future, int] = {
+            executor.submit(attempt, index): index for index in range(len(sections))
+        }
+        hedged = set()
+        try:
+            while attempts:
+                now = self._clock()
+                timeout = self.deadline_at - now
+                if timeout <= 0:
+                    break
+                if self.hedge_after:
+                    with started_lock:
+                        due = [
+                            begin + self.hedge_after
+                            for index, begin in started.items()
+                            if index not in hedged and results[index] is None
+                        ]
+                    if due:
+                        timeout = min(timeout, max(min(due) - now, 0.01))
+                done, _ = wait(attempts, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future not in attempts:
+                        continue  # a sibling attempt already settled its section
+                    index = attempts.pop(future)
+                    try:
+                        results[index] = future.result()
+                    except _PredictedMiss:
+                        reasons.setdefault(index, "predicted")
+                    except Exception:
+                        if index in attempts.values():
+                            continue  # the other attempt may still succeed
+                        reasons[index] = "error"
+                    # The section is settled; stop waiting on its other attempt.
+                    for other in [f for f, i in attempts.items() if i == index]:
+                        del attempts[other]
+                        other.cancel()
+                if self.hedge_after:
+                    now = self._clock()
+                    with started_lock:
+                        late = [
+                            index
+                            for index, begin in started.items()
+                            if now - begin >= self.hedge_after
+                            and index not in hedged
+                            and index not in reasons
+                            and results[index] is None
+                        ]
+                    for index in late:
+                        hedged.add(index)
+                        attempts[executor.submit(attempt, index, True)] = index
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        fragments: List[HtmlSource] = []
+        for index, section in enumerate(sections):
+            html = results[index]
+            if html is None:
+                reason = reasons.get(index, "deadline")
+                html = self.fallback.enhance(section.text, metadata)
+                self.degraded.append(
+                    DegradedSection(
+                        index=section.index, title=section.title, reason=reason
+                    )
+                )
+                DEGRADED_SECTIONS.inc(reason=reason)
+            fragments.append(html)
+        return fragments
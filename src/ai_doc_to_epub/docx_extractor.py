@@ -0,0 +1,368 @@
+"""Streaming DOCX to Markdown conversion.
+
+``word/document.xml`` is read straight from the archive with
+:func:`lxml.etree.iterparse`. Each top-level paragraph or table is turned
+into Markdown as soon as it has been parsed and then dropped from the
+tree, so memory stays flat however long the document is. Styles, numbering,
+relationships and footnotes live in small side parts and are loaded up
+front. Footnote definitions are emitted at the end of the chapter that
+references them, so every ``#`` chapter is self-contained.
+"""
+
+from __future__ import annotations
+
+import posixpath
+import re
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from lxml import etree
+
+from .assets import store_media
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+PR = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+W_P, W_TBL, W_TC = (W + tag for tag in ("p", "tbl", "tc"))
+W_R, W_RPR, W_T = (W + tag for tag in ("r", "rPr", "t"))
+W_TAB, W_BR, W_CR, W_DRAWING = (W + tag for tag in ("tab", "br", "cr", "drawing"))
+W_TCPR, W_GRIDSPAN = W + "tcPr", W + "gridSpan"
+W_FOOTNOTE_REFERENCE = W + "footnoteReference"
+
+_HEADING_NAME_RE = re.compile(r"^heading\s*(\d)$", re.IGNORECASE)
+_ESCAPES = str.maketrans({char: "\\" + char for char in "\\`*_[]"} | {"<": "&lt;"})
+_BLOCK_MARKER_RE = re.compile(r"^(\s*)([#>+-]|\d+)(\.?)(?=\s)")
+
+
+def _escape(text: str) -> str:
+    return text.translate(_ESCAPES)
+
+
+def _escape_block_marker(match: re.Match) -> str:
+    indent, marker, dot = match.groups()
+    if marker.isdigit():
+        return f"{indent}{marker}\\{dot}" if dot else match.group(0)
+    return f"{indent}\\{marker}{dot}"
+
+
+def _val(element: Optional[etree._Element], name: str = "val") -> Optional[str]:
+    return None if element is None else element.get(f"{W}{name}")
+
+
+def _flag(properties: Optional[etree._Element], tag: str) -> bool:
+    """Whether a toggle property such as ``<w:b/>`` is switched on."""
+    if properties is None:
+        return False
+    element = properties.find(f"{W}{tag}")
+    return element is not None and _val(element) not in ("0", "false", "none")
+
+
+def _read_part(archive: zipfile.ZipFile, name: str) -> Optional[etree._Element]:
+    try:
+        with archive.open(name) as handle:
+            return etree.parse(handle).getroot()
+    except KeyError:
+        return None
+
+
+def _heading_levels(styles: Optional[etree._Element]) -> Dict[str, int]:
+    """Map paragraph style IDs to heading levels, following ``basedOn``."""
+    if styles is None:
+        return {}
+    own: Dict[str, Optional[int]] = {}
+    parents: Dict[str, str] = {}
+    for style in styles.iter(f"{W}style"):
+        if style.get(f"{W}type") != "paragraph":
+            continue
+        style_id = style.get(f"{W}styleId") or ""
+        name = (_val(style.find(f"{W}name")) or "").strip()
+        outline = _val(style.find(f"{W}pPr/{W}outlineLvl"))
+        level: Optional[int] = None
+        match = _HEADING_NAME_RE.match(name)
+        if match:
+            level = int(match.group(1))
+        elif name.lower() == "title":
+            level = 1
+        elif outline is not None and outline.isdigit() and int(outline) < 9:
+            level = int(outline) + 1
+        own[style_id] = level
+        based_on = _val(style.find(f"{W}basedOn"))
+        if based_on:
+            parents[style_id] = based_on
+
+    def resolve(style_id: str, seen: Tuple[str, ...] = ()) -> Optional[int]:
+        if own.get(style_id) is not None or style_id not in parents:
+            return own.get(style_id)
+        if style_id in seen:
+            return None
+        return resolve(parents[style_id], seen + (style_id,))
+
+    levels = {}
+    for style_id in own:
+        level = resolve(style_id)
+        if level is not None:
+            levels[style_id] = min(level, 6)
+    return levels
+
+
+def _style_numbering(styles: Optional[etree._Element]) -> Dict[str, Tuple[str, str]]:
+    """Map paragraph style IDs such as ``ListBullet`` to ``(numId, ilvl)``."""
+    if styles is None:
+        return {}
+    own: Dict[str, Tuple[str, str]] = {}
+    parents: Dict[str, str] = {}
+    for style in styles.iter(f"{W}style"):
+        style_id = style.get(f"{W}styleId") or ""
+        numbering = style.find(f"{W}pPr/{W}numPr")
+        if numbering is not None:
+            num_id = _val(numbering.find(f"{W}numId"))
+            if num_id:
+                own[style_id] = (num_id, _val(numbering.find(f"{W}ilvl")) or "0")
+        based_on = _val(style.find(f"{W}basedOn"))
+        if based_on:
+            parents[style_id] = based_on
+    resolved = dict(own)
+    for style_id in parents:
+        seen = {style_id}
+        current = style_id
+        while current not in own and current in parents:
+            current = parents[current]
+            if current in seen:
+                break
+            seen.add(current)
+        if current in own:
+            resolved[style_id] = own[current]
+    return resolved
+
+
+def _list_formats(numbering: Optional[etree._Element]) -> Dict[Tuple[str, str], str]:
+    """Map ``(numId, ilvl)`` to the level's number format (``bullet``, ``decimal``)."""
+    if numbering is None:
+        return {}
+    abstract: Dict[str, Dict[str, str]] = {}
+    for definition in numbering.iter(f"{W}abstractNum"):
+        abstract[definition.get(f"{W}abstractNumId") or ""] = {
+            level.get(f"{W}ilvl") or "0": _val(level.find(f"{W}numFmt")) or "bullet"
+            for level in definition.iter(f"{W}lvl")
+        }
+    formats: Dict[Tuple[str, str], str] = {}
+    for num in numbering.iter(f"{W}num"):
+        levels = abstract.get(_val(num.find(f"{W}abstractNumId")) or "", {})
+        for ilvl, fmt in levels.items():
+            formats[(num.get(f"{W}numId") or "", ilvl)] = fmt
+    return formats
+
+
+def _relationships(rels: Optional[etree._Element]) -> Dict[str, str]:
+    """Map relationship IDs of internal targets to archive member names."""
+    if rels is None:
+        return {}
+    targets = {}
+    for rel in rels.iter(f"{PR}Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target") or ""
+        member = (
+            target.lstrip("/")
+            if target.startswith("/")
+            else posixpath.normpath(posixpath.join("word", target))
+        )
+        targets[rel.get("Id") or ""] = member
+    return targets
+
+
+class DocxMarkdownExtractor:
+    """Convert one DOCX file to Markdown block by block.
+
+    Headings come from paragraph styles (``Heading N``, ``Title`` or an
+    outline level), lists from numbering definitions, tables become pipe
+    tables, footnote references become ``[^N]`` with their definitions
+    closing the chapter, and inline pictures are saved with
+    :func:`~.assets.store_media` and referenced as Markdown images.
+    """
+
+    def __init__(self, path: Path, media_dir: Optional[Path] = None) -> None:
+        self.path = path
+        self.media_dir = media_dir
+
+    def blocks(self) -> Iterator[str]:
+        with zipfile.ZipFile(self.path) as archive:
+            self._archive = archive
+            styles = _read_part(archive, "word/styles.xml")
+            self._headings = _heading_levels(styles)
+            self._style_lists = _style_numbering(styles)
+            self._lists = _list_formats(_read_part(archive, "word/numbering.xml"))
+            self._rels = _relationships(
+                _read_part(archive, "word/_rels/document.xml.rels")
+            )
+            self._images: Dict[str, Optional[str]] = {}
+            self._footnotes: List[str] = []
+            self._notes: Optional[Dict[str, str]] = None
+            with archive.open("word/document.xml") as handle:
+                for block in self._body_blocks(handle):
+                    if block.startswith("# "):
+                        yield from self._footnote_blocks()
+                    yield block
+            yield from self._footnote_blocks()
+
+    def markdown(self) -> str:
+        return "\n\n".join(block for block in self.blocks() if block)
+
+    def _body_blocks(self, handle) -> Iterator[str]:
+        for _, element in etree.iterparse(handle, tag=(W_P, W_TBL)):
+            parent = element.getparent()
+            # Cell contents are converted together with their table.
+            if parent is None or parent.tag == W_TC:
+                continue
+            if element.tag == W_TBL:
+                yield self._table(element)
+            else:
+                yield self._paragraph(element)
+            # Free what has been converted, including preceding siblings.
+            element.clear(keep_tail=True)
+            while element.getprevious() is not None:
+                del parent[0]
+
+    def _runs(self, paragraph: etree._Element) -> str:
+        pieces: List[Tuple[Tuple[bool, bool], str]] = []
+        for run in paragraph.iter(W_R):
+            style = (False, False)
+            for child in run:
+                tag = child.tag
+                if tag == W_T:
+                    text = _escape(child.text or "")
+                elif tag == W_RPR:
+                    style = (_flag(child, "b"), _flag(child, "i"))
+                    continue
+                elif tag == W_TAB:
+                    text = " "
+                elif tag == W_BR or tag == W_CR:
+                    text = "  \n"
+                elif tag == W_FOOTNOTE_REFERENCE:
+                    footnote_id = child.get(f"{W}id") or ""
+                    self._footnotes.append(footnote_id)
+                    text = f"[^{footnote_id}]"
+                elif tag == W_DRAWING:
+                    text = "".join(self._images_in(child))
+                else:
+                    continue
+                if not text:
+                    continue
+                if pieces and pieces[-1][0] == style:
+                    pieces[-1] = (style, pieces[-1][1] + text)
+                else:
+                    pieces.append((style, text))
+        if len(pieces) == 1 and pieces[0][0] == (False, False):
+            return pieces[0][1].strip()
+        parts = []
+        for (bold, italic), text in pieces:
+            stripped = text.strip()
+            marker = ("**" if bold else "") + ("*" if italic else "")
+            if marker and stripped and "\n" not in stripped:
+                lead = text[: len(text) - len(text.lstrip())]
+                trail = text[len(text.rstrip()) :]
+                text = f"{lead}{marker}{stripped}{marker[::-1]}{trail}"
+            parts.append(text)
+        return "".join(parts).strip()
+
+    def _images_in(self, drawing: etree._Element) -> Iterator[str]:
+        for blip in drawing.iter(f"{A}blip"):
+            relationship = blip.get(f"{R}embed") or ""
+            if relationship not in self._images:
+                uri = None
+                member = self._rels.get(relationship)
+                if member:
+                    try:
+                        path = store_media(self._archive.read(member), self.media_dir)
+                    except KeyError:
+                        path = None
+                    uri = path.as_uri() if path else None
+                self._images[relationship] = uri
+            if self._images[relationship]:
+                yield f"![]({self._images[relationship]})"
+
+    def _paragraph(self, paragraph: etree._Element) -> str:
+        text = self._runs(paragraph)
+        if not text:
+            return ""
+        properties = paragraph.find(f"{W}pPr")
+        style = _val(properties.find(f"{W}pStyle")) if properties is not None else None
+        level = self._headings.get(style or "")
+        outline = (
+            _val(properties.find(f"{W}outlineLvl")) if properties is not None else None
+        )
+        if level is None and outline is not None and outline.isdigit():
+            level = int(outline) + 1 if int(outline) < 6 else None
+        if level is not None:
+            return f"{'#' * level} {' '.join(text.split())}"
+        numbering = properties.find(f"{W}numPr") if properties is not None else None
+        if numbering is not None:
+            num_id = _val(numbering.find(f"{W}numId")) or ""
+            ilvl = _val(numbering.find(f"{W}ilvl")) or "0"
+        else:
+            num_id, ilvl = self._style_lists.get(style or "", ("0", "0"))
+        fmt = self._lists.get((num_id, ilvl), "bullet")
+        if num_id not in ("", "0") and fmt != "none":
+            marker = "-" if fmt == "bullet" else "1."
+            indent = "    " * int(ilvl) if ilvl.isdigit() else ""
+            return f"{indent}{marker} {text}"
+        # Keep plain text that happens to start like a list or heading literal.
+        return _BLOCK_MARKER_RE.sub(_escape_block_marker, text)
+
+    def _table(self, table: etree._Element) -> str:
+        rows: List[List[str]] = []
+        for row in table.iterchildren(f"{W}tr"):
+            cells: List[str] = []
+            for cell in row.iterchildren(W_TC):
+                text = "<br>".join(filter(None, map(self._runs, cell.iter(W_P))))
+                cells.append(text.replace("|", "\\|").replace("\n", " "))
+                properties = cell.find(W_TCPR)
+                span = None
+                if properties is not None:
+                    span = _val(properties.find(W_GRIDSPAN))
+                if span and span.isdigit():
+                    cells.extend([""] * (int(span) - 1))
+            if cells:
+                rows.append(cells)
+        if not rows:
+            return ""
+        width = max(len(row) for row in rows)
+        lines = []
+        for index, row in enumerate(rows):
+            row = row + [""] * (width - len(row))
+            lines.append("| " + " | ".join(row) + " |")
+            if index == 0:
+                lines.append("|" + " --- |" * width)
+        return "\n".join(lines)
+
+    def _footnote_blocks(self) -> Iterator[str]:
+        """Yield definitions for the footnotes referenced since the last call."""
+        if not self._footnotes:
+            return
+        if self._notes is None:
+            self._notes = self._load_footnotes()
+        for footnote_id in dict.fromkeys(self._footnotes):
+            if footnote_id in self._notes:
+                yield f"[^{footnote_id}]: {self._notes[footnote_id]}"
+        self._footnotes = []
+
+    def _load_footnotes(self) -> Dict[str, str]:
+        notes: Dict[str, str] = {}
+        try:
+            handle = self._archive.open("word/footnotes.xml")
+        except KeyError:
+            return notes
+        with handle:
+            for _, note in etree.iterparse(handle, tag=f"{W}footnote"):
+                text = " ".join(filter(None, map(self._runs, note.iter(W_P))))
+                if text:
+                    notes[note.get(f"{W}id") or ""] = text
+                note.clear(keep_tail=True)
+        return notes
+
+
+def extract_docx_markdown(path: Path, media_dir: Optional[Path] = None) -> str:
+    return DocxMarkdownExtractor(path, media_dir).markdown()
@@ -1,13 +1,23 @@
 from __future__ import annotations
 
 import uuid
-from dataclasses import dataclass
-from datetime import datetime
+from dataclasses import dataclass, replace
+from html import escape
 from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional
 
-from bs4 import BeautifulSoup
-from ebooklib import epub
+if TYPE_CHECKING:
+    from lxml.html import HtmlElement
+
+from .assets import ImageAssets
+from .epub_writer import EpubMetadata, StreamingEpubWriter
+from .html_document import (
+    HtmlSource,
+    body_of,
+    ensure_document,
+    is_element,
+    serialize_xhtml,
+)
 
 
 @dataclass
@@ -22,49 +32,55 @@ def _sanitize_filename(name: str) -> str:
     return f"{slug.lower() or 'chapter'}-{uuid.uuid4().hex[:8]}.xhtml"
 
 
-def _split_html_into_chapters(html: str) -> List[Chapter]:
-    soup = BeautifulSoup(html, "html.parser")
-    body = soup.body or soup
+def _split_html_into_chapters(
+    html: HtmlSource, default_title: str = "Introduction"
+) -> List[Chapter]:
+    body = body_of(ensure_document(html))
 
     chapters: List[Chapter] = []
-    current_title = "Introduction"
-    current_nodes: List[str] = []
+    current_title = default_title
+    current_nodes: List[HtmlElement] = []
+    leading_text = body.text or ""
 
-    def flush_chapter(title: str, nodes: Iterable[str]) -> None:
-        markup = "".join(nodes).strip()
+    def flush_chapter(title: str, nodes: List[HtmlElement], text: str = "") -> None:
+        markup = serialize_xhtml(nodes, leading_text=text).strip()
         if not markup:
             return
         chapters.append(
             Chapter(title=title, filename=_sanitize_filename(title), content=markup)
         )
 
-    for node in body.children:
-        if getattr(node, "name", None) and node.name.startswith("h1"):
-            flush_chapter(current_title, current_nodes)
-            current_title = node.get_text(strip=True) or "Untitled"
-            current_nodes = [str(node)]
+    for node in body:
+        if is_element(node) and node.tag == "h1":
+            flush_chapter(current_title, current_nodes, leading_text)
+            leading_text = ""
+            current_title = " ".join(node.text_content().split()) or "Untitled"
+            current_nodes = [node]
         else:
-            current_nodes.append(str(node))
+            current_nodes.append(node)
 
-    flush_chapter(current_title, current_nodes)
+    flush_chapter(current_title, current_nodes, leading_text)
 
     if not chapters:
         chapters.append(
             Chapter(
                 title="Document",
                 filename=_sanitize_filename("document"),
-                content=str(body),
+                content=serialize_xhtml([body]),
             )
         )
     return chapters
 
 
-@dataclass
-class EpubMetadata:
-    title: str
-    author: str = "Unknown"
-    language: str = "en"
-    description: str | None = None
+def chapters_from_sections(
+    sections: Iterable[HtmlSource], default_title: str = "Introduction"
+) -> Iterator[Chapter]:
+    """Turn a stream of ``<h1>`` sections into chapters as each one arrives.
+
+    Content before a section's first ``<h1>`` is titled ``default_title``.
+    """
+    for section in sections:
+        yield from _split_html_into_chapters(section, default_title)
 
 
 class EpubBuilder:
@@ -73,61 +89,59 @@ class EpubBuilder:
     def __init__(self) -> None:
         self._stylesheet = self._default_stylesheet()
 
-    def build(self, html: str, metadata: EpubMetadata, output_path: Path) -> Path:
-        chapters = _split_html_into_chapters(html)
-
-        book = epub.EpubBook()
-        book.set_identifier(str(uuid.uuid4()))
-        book.set_title(metadata.title)
-        book.set_language(metadata.language)
-        book.add_author(metadata.author)
-        book.add_metadata(
-            "DC", "date", datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
-        )
-        if metadata.description:
-            book.add_metadata("DC", "description", metadata.description)
-
-        style_item = epub.EpubItem(
-            uid="style",
-            file_name="styles/stylesheet.css",
-            media_type="text/css",
-            content=self._stylesheet.encode("utf-8"),
-        )
-        book.add_item(style_item)
-
-        epub_chapters: List[epub.EpubHtml] = []
-        toc: List[Tuple[epub.EpubHtml, List[epub.Link]]] = []
-
-        for chapter in chapters:
-            epub_chapter = epub.EpubHtml(
-                title=chapter.title,
-                file_name=f"text/{chapter.filename}",
-                lang=metadata.language,
-            )
-            epub_chapter.content = (
-                "<?xml version='1.0' encoding='utf-8'?>"
-                "<!DOCTYPE html>"
-                f"<html xmlns='http://www.w3.org/1999/xhtml'>"
-                f"<head><title>{chapter.title}</title><link rel='stylesheet' href='../styles/stylesheet.css'/></head>"
-                f"<body>{chapter.content}</body></html>"
-            )
-            book.add_item(epub_chapter)
-            epub_chapters.append(epub_chapter)
-
-        for chapter in epub_chapters:
-            toc.append(chapter)
-
-        book.toc = tuple(toc)
-
-        book.add_item(epub.EpubNcx())
-        book.add_item(epub.EpubNav())
-
-        book.spine = ["nav", *epub_chapters]
-
+    def build(self, html: HtmlSource, metadata: EpubMetadata, output_path: Path) -> Path:
+        return self.build_chapters(_split_html_into_chapters(html), metadata, output_path)
+
+    def build_chapters(
+        self,
+        chapters: Iterable[Chapter],
+        metadata: EpubMetadata,
+        output_path: Path,
+        assets: Optional[ImageAssets] = None,
+    ) -> Path:
+        """Stream chapters into an EPUB as they are produced.
+
+        Each chapter is written to the archive as soon as it is consumed, so
+        memory stays flat regardless of book length. ``output_path`` only
+        appears once the book is complete. With ``assets``, chapter images
+        are rewritten to point into the book and added as their
+        recompression finishes, alongside the following chapters.
+        """
         output_path = output_path.with_suffix(".epub")
-        book.write_epub(str(output_path))
+        with StreamingEpubWriter(output_path, metadata) as writer:
+            writer.add_item(
+                "styles/stylesheet.css",
+                self._stylesheet.encode("utf-8"),
+                "text/css",
+                uid="style",
+            )
+            if assets is not None:
+                assets.write_to(writer.add_item)
+            for chapter in chapters:
+                if assets is not None:
+                    chapter = replace(chapter, content=assets.rewrite(chapter.content))
+                writer.add_chapter(
+                    chapter.title,
+                    f"text/{chapter.filename}",
+                    self._render_chapter(chapter, metadata),
+                )
+            if assets is not None:
+                for href, content, media_type in assets.items():
+                    writer.add_item(href, content, media_type)
         return output_path
 
+    @staticmethod
+    def _render_chapter(chapter: Chapter, metadata: EpubMetadata) -> str:
+        return (
+            "<?xml version='1.0' encoding='utf-8'?>"
+            "<!DOCTYPE html>"
+            "<html xmlns='http://www.w3.org/1999/xhtml' "
+            f"lang='{escape(metadata.language)}'>"
+            f"<head><title>{escape(chapter.title)}</title>"
+            "<link rel='stylesheet' href='../styles/stylesheet.css'/></head>"
+            f"<body>{chapter.content}</body></html>"
+        )
+
     @staticmethod
     def _default_stylesheet() -> str:
         return """
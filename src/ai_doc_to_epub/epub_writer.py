@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import os
+import uuid
+import zipfile
+from dataclasses import dataclass, field
+from datetime import datetime
+from html import escape
+from pathlib import Path
+from typing import List, Optional
+
+CONTAINER_XML = (
+    "<?xml version='1.0' encoding='utf-8'?>"
+    "<container version='1.0' xmlns='urn:oasis:names:tc:opendocument:xmlns:container'>"
+    "<rootfiles><rootfile full-path='EPUB/content.opf' "
+    "media-type='application/oebps-package+xml'/></rootfiles></container>"
+)
+
+
+@dataclass
+class EpubMetadata:
+    title: str
+    author: str = "Unknown"
+    language: str = "en"
+    description: str | None = None
+
+
+@dataclass
+class _ManifestItem:
+    uid: str
+    href: str
+    media_type: str
+    title: Optional[str] = None
+    properties: Optional[str] = None
+
+
+@dataclass
+class StreamingEpubWriter:
+    """Write an EPUB 3 container incrementally, one item at a time.
+
+    The uncompressed ``mimetype`` entry and ``container.xml`` are written on
+    open, each chapter is compressed straight into the archive when added, and
+    the package document, navigation document and NCX are written on
+    :meth:`close`. Only manifest bookkeeping is kept in memory. The archive is
+    built under a temporary name next to ``output_path`` and moved into place
+    with an atomic rename.
+    """
+
+    output_path: Path
+    metadata: EpubMetadata
+    identifier: str = field(default_factory=lambda: str(uuid.uuid4()))
+
+    def __post_init__(self) -> None:
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self._temp_path = self.output_path.with_name(
+            f".{self.output_path.name}.{uuid.uuid4().hex[:8]}.part"
+        )
+        self._items: List[_ManifestItem] = []
+        self._spine: List[_ManifestItem] = []
+        self._archive = zipfile.ZipFile(self._temp_path, "w", zipfile.ZIP_DEFLATED)
+        self._archive.writestr(
+            zipfile.ZipInfo("mimetype"), "application/epub+zip", zipfile.ZIP_STORED
+        )
+        self._archive.writestr("META-INF/container.xml", CONTAINER_XML)
+
+    def __enter__(self) -> "StreamingEpubWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add_item(
+        self, href: str, content: bytes, media_type: str, uid: Optional[str] = None
+    ) -> str:
+        """Add a non-document resource (stylesheet, image, font) and return its uid."""
+        item = _ManifestItem(uid or f"item-{len(self._items)}", href, media_type)
+        # Raster images are already compressed; deflating them again only
+        # costs time.
+        compress_type = (
+            zipfile.ZIP_STORED
+            if media_type.startswith("image/") and media_type != "image/svg+xml"
+            else None
+        )
+        self._archive.writestr(f"EPUB/{href}", content, compress_type=compress_type)
+        self._items.append(item)
+        return item.uid
+
+    def add_chapter(self, title: str, href: str, xhtml: str) -> None:
+        """Write a chapter immediately and append it to the spine and TOC."""
+        item = _ManifestItem(
+            f"chapter-{len(self._spine)}", href, "application/xhtml+xml", title=title
+        )
+        self._archive.writestr(f"EPUB/{href}", xhtml.encode("utf-8"))
+        self._items.append(item)
+        self._spine.append(item)
+
+    def close(self) -> Path:
+        self._archive.writestr("EPUB/nav.xhtml", self._nav_document())
+        self._archive.writestr("EPUB/toc.ncx", self._ncx_document())
+        self._archive.writestr("EPUB/content.opf", self._package_document())
+        self._archive.close()
+        os.replace(self._temp_path, self.output_path)
+        return self.output_path
+
+    def abort(self) -> None:
+        self._archive.close()
+        self._temp_path.unlink(missing_ok=True)
+
+    def _package_document(self) -> str:
+        meta = self.metadata
+        modified = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+        description = (
+            f"<dc:description>{escape(meta.description)}</dc:description>"
+            if meta.description
+            else ""
+        )
+        manifest = "".join(
+            f"<item id='{item.uid}' href='{escape(item.href)}' "
+            f"media-type='{item.media_type}'/>"
+            for item in self._items
+        )
+        spine = "".join(f"<itemref idref='{item.uid}'/>" for item in self._spine)
+        return (
+            "<?xml version='1.0' encoding='utf-8'?>"
+            "<package xmlns='http://www.idpf.org/2007/opf' version='3.0' "
+            "unique-identifier='id'>"
+            "<metadata xmlns:dc='http://purl.org/dc/elements/1.1/'>"
+            f"<dc:identifier id='id'>urn:uuid:{self.identifier}</dc:identifier>"
+            f"<dc:title>{escape(meta.title)}</dc:title>"
+            f"<dc:language>{escape(meta.language)}</dc:language>"
+            f"<dc:creator id='creator'>{escape(meta.author)}</dc:creator>"
+            f"<dc:date>{modified}</dc:date>"
+            f"{description}"
+            f"<meta property='dcterms:modified'>{modified}</meta>"
+            "</metadata>"
+            "<manifest>"
+            "<item id='nav' href='nav.xhtml' media-type='application/xhtml+xml' "
+            "properties='nav'/>"
+            "<item id='ncx' href='toc.ncx' media-type='application/x-dtbncx+xml'/>"
+            f"{manifest}"
+            "</manifest>"
+            f"<spine toc='ncx'><itemref idref='nav'/>{spine}</spine>"
+            "</package>"
+        )
+
+    def _nav_document(self) -> str:
+        entries = "".join(
+            f"<li><a href='{escape(item.href)}'>{escape(item.title or '')}</a></li>"
+            for item in self._spine
+        )
+        title = escape(self.metadata.title)
+        return (
+            "<?xml version='1.0' encoding='utf-8'?>"
+            "<!DOCTYPE html>"
+            "<html xmlns='http://www.w3.org/1999/xhtml' "
+            "xmlns:epub='http://www.idpf.org/2007/ops' "
+            f"lang='{escape(self.metadata.language)}'>"
+            f"<head><title>{title}</title></head>"
+            f"<body><nav epub:type='toc' id='id'><h2>{title}</h2>"
+            f"<ol>{entries}</ol></nav></body></html>"
+        )
+
+    def _ncx_document(self) -> str:
+        points = "".join(
+            f"<navPoint id='{item.uid}'>"
+            f"<navLabel><text>{escape(item.title or '')}</text></navLabel>"
+            f"<content src='{escape(item.href)}'/></navPoint>"
+            for item in self._spine
+        )
+        return (
+            "<?xml version='1.0' encoding='utf-8'?>"
+            "<ncx xmlns='http://www.daisy.org/z3986/2005/ncx/' version='2005-1'>"
+            f"<head><meta name='dtb:uid' content='urn:uuid:{self.identifier}'/></head>"
+            f"<docTitle><text>{escape(self.metadata.title)}</text></docTitle>"
+            f"<navMap>{points}</navMap></ncx>"
+        )
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from html import escape
+from typing import Iterable, Union
+
+from lxml import etree
+from lxml import html as lxml_html
+from lxml.html import HtmlElement
+
+_PARSER = lxml_html.HTMLParser(encoding="utf-8")
+_EMPTY_DOCUMENT = b"<html><body></body></html>"
+
+HtmlSource = Union[str, HtmlElement]
+
+
+def parse_html(markup: str) -> HtmlElement:
+    """Parse HTML (a document or a fragment) once with lxml's C parser.
+
+    Markup is handed over as UTF-8 bytes so XML declarations with an encoding,
+    which LLMs like to emit, do not trip up the parser.
+    """
+    data = markup.encode("utf-8")
+    if not data.strip():
+        data = _EMPTY_DOCUMENT
+    try:
+        return lxml_html.document_fromstring(data, parser=_PARSER)
+    except etree.ParserError:
+        return lxml_html.document_fromstring(_EMPTY_DOCUMENT, parser=_PARSER)
+
+
+def ensure_document(source: HtmlSource) -> HtmlElement:
+    return parse_html(source) if isinstance(source, str) else source
+
+
+def body_of(document: HtmlElement) -> HtmlElement:
+    body = document.find("body")
+    return body if body is not None else document
+
+
+def strip_footnotes(document: HtmlElement) -> None:
+    """Remove footnote asides and unwrap their reference markers in place."""
+    for aside in document.xpath(
+        "//aside[contains(concat(' ', normalize-space(@class), ' '), ' footnote ')]"
+    ):
+        aside.drop_tree()
+    for sup in document.xpath("//sup[starts-with(@id, 'fnref')]"):
+        sup.drop_tag()
+
+
+def strip_navigation(document: HtmlElement) -> None:
+    """Remove in-document ``<nav>`` tables of contents in place."""
+    for nav in document.xpath("//nav"):
+        nav.drop_tree()
+
+
+def is_element(node: object) -> bool:
+    """True for real elements, false for comments and processing instructions."""
+    return isinstance(getattr(node, "tag", None), str)
+
+
+def serialize_xhtml(nodes: Iterable[HtmlElement], leading_text: str = "") -> str:
+    """Serialize nodes (with their tail text) as well-formed XHTML markup."""
+    parts = [escape(leading_text, quote=False)] if leading_text else []
+    parts.extend(
+        etree.tostring(node, encoding="unicode", method="xml", with_tail=True)
+        for node in nodes
+    )
+    return "".join(parts)
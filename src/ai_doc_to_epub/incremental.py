@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict
+from pathlib import Path
+from typing import (
+    AbstractSet,
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows; builds lock per process only
+    fcntl = None  # type: ignore[assignment]
+
+from .config import SETTINGS
+from .epub_builder import Chapter
+
+INCREMENTAL_FORMAT_VERSION = "1"
+
+# Saves between two eviction passes over the store.
+EVICT_EVERY = 32
+
+
+def section_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def document_key(title: str) -> str:
+    """Identify a document across revisions by its title or output name.
+
+    Batch runs pass the output name, which tells apart same-named files in
+    different directories.
+    """
+    return hashlib.sha256(" ".join(title.split()).encode("utf-8")).hexdigest()[:32]
+
+
+def build_fingerprint(
+    identity: Dict[str, Any], metadata: Dict[str, str], annotate: bool
+) -> str:
+    """Everything besides a section's Markdown that shapes its chapters.
+
+    A build whose fingerprint differs from the stored one reuses nothing.
+    """
+    payload = json.dumps(
+        {
+            "version": INCREMENTAL_FORMAT_VERSION,
+            "identity": identity,
+            "metadata": metadata,
+            "annotate": annotate,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _write_atomic(path: Path, content: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            handle.write(content)
+        os.replace(temp_name, path)
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+
+
+class IncrementalStore:
+    """Section manifests and rendered chapters from each document's last build.
+
+    Layout: ``<root>/<document key>/manifest.json`` lists the section digests
+    of the previous build, and ``sections/`` holds the chapters rendered from
+    each section, keyed by build fingerprint and section digest. Because
+    chapters are addressed by content, a stale or shared manifest can cost a
+    re-enhancement but never a wrong chapter. Sections dropped from the
+    latest build are deleted when it is saved.
+
+    Loads and saves of one document hold ``<root>/<document key>.lock``, so
+    concurrent builds of the same title (in any process) cannot delete each
+    other's sections. Loads bump the manifest's mtime; every
+    :data:`EVICT_EVERY` saves, :meth:`evict` drops documents unused for
+    ``max_age_seconds`` and then the least recently used ones until the
+    store fits in ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        max_bytes: Optional[int] = None,
+        max_age_seconds: Optional[float] = None,
+    ) -> None:
+        self.root = root
+        self.max_bytes = (
+            SETTINGS.incremental_max_bytes if max_bytes is None else max_bytes
+        )
+        self.max_age_seconds = (
+            SETTINGS.incremental_max_age_seconds
+            if max_age_seconds is None
+            else max_age_seconds
+        )
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._saves = 0
+
+    @classmethod
+    def from_settings(cls) -> "IncrementalStore":
+        assert SETTINGS.incremental_dir is not None
+        return cls(SETTINGS.incremental_dir)
+
+    def _document_dir(self, key: str) -> Path:
+        return self.root / key
+
+    @contextmanager
+    def _locked(self, key: str, blocking: bool = True) -> Iterator[bool]:
+        """Hold a document's lock; yields ``False`` if not blocking and busy."""
+        with self._locks_guard:
+            thread_lock = self._locks.setdefault(key, threading.Lock())
+        if not thread_lock.acquire(blocking):
+            yield False
+            return
+        try:
+            if fcntl is None:
+                yield True
+                return
+            path = self.root / f"{key}.lock"
+            self.root.mkdir(parents=True, exist_ok=True)
+            while True:
+                handle = path.open("a")
+                try:
+                    flags = fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB)
+                    try:
+                        fcntl.flock(handle, flags)
+                    except BlockingIOError:
+                        yield False
+                        return
+                    # Eviction may have removed the file while we waited.
+                    try:
+                        current = os.stat(path).st_ino
+                    except FileNotFoundError:
+                        current = None
+                    if current == os.fstat(handle.fileno()).st_ino:
+                        yield True
+                        return
+                finally:
+                    handle.close()
+        finally:
+            thread_lock.release()
+
+    @staticmethod
+    def _section_path(directory: Path, fingerprint: str, digest: str) -> Path:
+        name = hashlib.sha256(f"{fingerprint}\0{digest}".encode("utf-8")).hexdigest()
+        return directory / "sections" / f"{name}.json"
+
+    def load(self, key: str, fingerprint: str) -> Dict[str, List[Chapter]]:
+        """Return the previous build's chapters by section digest."""
+        with self._locked(key):
+            return self._load(key, fingerprint)
+
+    def _load(self, key: str, fingerprint: str) -> Dict[str, List[Chapter]]:
+        directory = self._document_dir(key)
+        try:
+            manifest = json.loads((directory / "manifest.json").read_text("utf-8"))
+            os.utime(directory / "manifest.json")
+        except (FileNotFoundError, ValueError):
+            return {}
+        if manifest.get("fingerprint") != fingerprint:
+            return {}
+        rendered: Dict[str, List[Chapter]] = {}
+        for digest in manifest.get("sections", []):
+            path = self._section_path(directory, fingerprint, digest)
+            try:
+                entries = json.loads(path.read_text("utf-8"))
+            except (FileNotFoundError, ValueError):
+                continue
+            rendered[digest] = [Chapter(**entry) for entry in entries]
+        return rendered
+
+    def save(
+        self,
+        key: str,
+        fingerprint: str,
+        digests: Sequence[str],
+        rendered: Dict[str, List[Chapter]],
+        transient: AbstractSet[str] = frozenset(),
+    ) -> None:
+        """Record a build; ``transient`` sections are listed but not stored.
+
+        Unstored sections are simply re-enhanced by the next build.
+        """
+        with self._locked(key):
+            self._save(key, fingerprint, digests, rendered, transient)
+        with self._locks_guard:
+            self._saves += 1
+            due = self._saves % EVICT_EVERY == 0
+        if due:
+            self.evict(keep=key)
+
+    def _save(
+        self,
+        key: str,
+        fingerprint: str,
+        digests: Sequence[str],
+        rendered: Dict[str, List[Chapter]],
+        transient: AbstractSet[str],
+    ) -> None:
+        directory = self._document_dir(key)
+        keep = set()
+        for digest in dict.fromkeys(digests):
+            if digest in transient:
+                continue
+            path = self._section_path(directory, fingerprint, digest)
+            keep.add(path.name)
+            if not path.exists():
+                payload = [asdict(chapter) for chapter in rendered[digest]]
+                _write_atomic(path, json.dumps(payload, ensure_ascii=False))
+        _write_atomic(
+            directory / "manifest.json",
+            json.dumps({"fingerprint": fingerprint, "sections": list(digests)}),
+        )
+        for path in (directory / "sections").glob("*.json"):
+            if path.name not in keep:
+                path.unlink(missing_ok=True)
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Drop expired documents, then least recently used ones over budget.
+
+        Documents that are being loaded or saved are left for the next pass.
+        """
+        cutoff = time.time() - self.max_age_seconds
+        entries: List[Tuple[float, int, str]] = []
+        total = 0
+        try:
+            directories = [path for path in self.root.iterdir() if path.is_dir()]
+        except FileNotFoundError:
+            return 0
+        for directory in directories:
+            try:
+                used = (directory / "manifest.json").stat().st_mtime
+            except FileNotFoundError:
+                used = 0.0
+            size = 0
+            for path in directory.glob("sections/*.json"):
+                try:
+                    size += path.stat().st_size
+                except FileNotFoundError:
+                    continue
+            entries.append((used, size, directory.name))
+            total += size
+        removed = 0
+        for used, size, key in sorted(entries):
+            if key == keep or (used >= cutoff and total <= self.max_bytes):
+                continue
+            if self._remove(key):
+                total -= size
+                removed += 1
+        return removed
+
+    def _remove(self, key: str) -> bool:
+        with self._locked(key, blocking=False) as acquired:
+            if not acquired:
+                return False
+            shutil.rmtree(self._document_dir(key), ignore_errors=True)
+            (self.root / f"{key}.lock").unlink(missing_ok=True)
+            return True
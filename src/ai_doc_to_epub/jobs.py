@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .metrics import COALESCED_CONVERSIONS
+from .models import ConversionRequest, ConversionResult, JobStatus
+from .pipeline import ConversionPipeline
+from .singleflight import conversion_key
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the job queue cannot accept more work."""
+
+
+@dataclass
+class Job:
+    input_path: Path
+    request: ConversionRequest
+    digest: Optional[str] = None
+    key: Optional[str] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    state: str = QUEUED
+    stage: Optional[str] = None
+    error: Optional[str] = None
+    result: Optional[ConversionResult] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (SUCCEEDED, FAILED)
+
+    def status(self) -> JobStatus:
+        return JobStatus(
+            id=self.id,
+            state=self.state,
+            stage=self.stage,
+            error=self.error,
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+        )
+
+
+class JobManager:
+    """Run conversions on a fixed pool of worker threads fed by a bounded queue.
+
+    Each worker converts with the pipeline ``pipeline_factory`` returns; the
+    web service hands every worker the same thread-safe pipeline. If the
+    factory raises, the jobs that worker dequeues fail with that error, and
+    the next job tries to build the pipeline again. ``submit``
+    never blocks: when the queue is full it raises :class:`QueueFullError` so
+    callers can push back on clients.
+    Submitting a file and request identical to a queued or running job
+    returns that job instead of converting again.
+    """
+
+    SHUTDOWN_ERROR = "The service shut down before this job started."
+
+    def __init__(
+        self,
+        pipeline_factory: Callable[[], ConversionPipeline] = ConversionPipeline,
+        workers: int = 2,
+        queue_size: int = 16,
+        retention_seconds: float = 3600.0,
+    ) -> None:
+        self.pipeline_factory = pipeline_factory
+        self.workers = max(1, workers)
+        self.retention = timedelta(seconds=retention_seconds)
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=queue_size)
+        self._jobs: Dict[str, Job] = {}
+        self._in_flight: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._stopping = threading.Event()
+
+    def start(self) -> None:
+        for index in range(self.workers - len(self._threads)):
+            thread = threading.Thread(
+                target=self._run_worker, name=f"conversion-worker-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def shutdown(self, wait: bool = True, timeout: Optional[float] = None) -> None:
+        """Stop the workers once the jobs already running have finished.
+
+        Queued jobs that have not started fail, and later submissions are
+        rejected. With ``wait``, block until the workers exit or ``timeout``
+        seconds pass.
+        """
+        self._stopping.set()
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                self._abandon(job)
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:  # workers also check the stop event
+                break
+        if wait:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            for thread in self._threads:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                thread.join(None if remaining is None else max(remaining, 0.0))
+        self._threads.clear()
+
+    def submit(
+        self,
+        input_path: Path,
+        request: ConversionRequest,
+        digest: Optional[str] = None,
+    ) -> Job:
+        if self._stopping.is_set():
+            raise QueueFullError("The service is shutting down.")
+        self._prune()
+        key = conversion_key(digest, request) if digest else None
+        with self._lock:
+            running = self._in_flight.get(key) if key else None
+            if running is not None:
+                COALESCED_CONVERSIONS.inc(endpoint="jobs")
+                input_path.unlink(missing_ok=True)
+                return running
+            job = Job(input_path=input_path, request=request, digest=digest, key=key)
+            self._jobs[job.id] = job
+            if key:
+                self._in_flight[key] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full as exc:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+                self._forget(job)
+            raise QueueFullError("Conversion queue is full; retry later.") from exc
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _prune(self) -> None:
+        cutoff = datetime.utcnow() - self.retention
+        with self._lock:
+            expired = [
+                job_id
+                for job_id, job in self._jobs.items()
+                if job.finished_at and job.finished_at < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def _forget(self, job: Job) -> None:
+        if job.key and self._in_flight.get(job.key) is job:
+            del self._in_flight[job.key]
+
+    def _abandon(self, job: Job) -> None:
+        job.input_path.unlink(missing_ok=True)
+        with self._lock:
+            self._forget(job)
+        job.error = self.SHUTDOWN_ERROR
+        job.finished_at = datetime.utcnow()
+        job.state = FAILED
+
+    def _run_worker(self) -> None:
+        pipeline: Optional[ConversionPipeline] = None
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            if self._stopping.is_set():
+                self._abandon(job)
+                return
+            job.state = RUNNING
+            job.started_at = datetime.utcnow()
+
+            def report(stage: str, job: Job = job) -> None:
+                job.stage = stage
+
+            state = FAILED
+            try:
+                if pipeline is None:
+                    pipeline = self.pipeline_factory()
+                job.result = pipeline.convert(
+                    job.input_path,
+                    job.request,
+                    progress=report,
+                    source_digest=job.digest,
+                )
+                state = SUCCEEDED
+            except Exception as exc:
+                job.error = str(exc) or type(exc).__name__
+            finally:
+                job.input_path.unlink(missing_ok=True)
+                with self._lock:
+                    self._forget(job)
+                job.finished_at = datetime.utcnow()
+                job.state = state
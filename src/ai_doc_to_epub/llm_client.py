@@ -1,26 +1,220 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Dict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
 
-from markdown import Markdown
+from .cache import LLMResponseCache, llm_cache_key
+from .chunking import (
+    HtmlSectionAssembler,
+    MarkdownChunk,
+    iter_html_sections,
+    merge_fragments,
+    namespace_fragment,
+    split_markdown,
+    stitch_html_fragments,
+)
+from .config import SETTINGS
+from .metrics import record_token_usage
 
-try:  # pragma: no cover - openai is optional during testing
-    from openai import OpenAI
-except Exception:  # pragma: no cover - fallback when openai isn't installed
-    OpenAI = None  # type: ignore
+if TYPE_CHECKING:
+    from .html_document import HtmlSource
 
-from .config import SETTINGS
+T = TypeVar("T")
 
 
 class BaseLLMClient(ABC):
     """Base interface for LLM-powered markdown enhancement."""
 
     @abstractmethod
-    def enhance(self, markdown_text: str, metadata: Dict[str, str]) -> str:
+    def enhance(self, markdown_text: str, metadata: Dict[str, str]) -> HtmlSource:
         """Return HTML that is ready for EPUB creation."""
 
+    def stream_sections(
+        self, markdown_text: str, metadata: Dict[str, str]
+    ) -> Iterator[HtmlSource]:
+        """Yield the enhanced HTML one ``<h1>`` section at a time, in order.
+
+        A parsed document is yielded whole; the pipeline splits it at its
+        ``<h1>`` elements without parsing it again.
+        """
+        html = self.enhance(markdown_text, metadata)
+        if isinstance(html, str):
+            yield from iter_html_sections([html])
+        else:
+            yield html
+
+    def enhance_sections(
+        self, sections: Sequence[MarkdownChunk], metadata: Dict[str, str]
+    ) -> List[HtmlSource]:
+        """Enhance chapters independently, returning one HTML fragment each.
+
+        Used by incremental conversion to re-render only changed chapters.
+        """
+        return [self.enhance(section.text, metadata) for section in sections]
+
+    def cache_identity(self) -> Dict[str, Any]:
+        """Everything besides the input that determines the output HTML."""
+        return {"client": type(self).__name__}
+
+
+class ChunkedLLMClient(BaseLLMClient):
+    """Enhance Markdown chunk by chunk with bounded concurrency.
+
+    Subclasses provide ``enhance_chunk`` and expose ``chunk_tokens`` and
+    ``max_concurrency``; a ``chunk_tokens`` of 0 disables splitting.
+    """
+
+    chunk_tokens: int = 0
+    max_concurrency: int = 1
+
+    @abstractmethod
+    def enhance_chunk(self, chunk: MarkdownChunk, metadata: Dict[str, str]) -> str:
+        """Return HTML for a single chunk; a lone chunk is the whole document."""
+
+    def split(self, markdown_text: str) -> List[MarkdownChunk]:
+        if self.chunk_tokens <= 0:
+            return [MarkdownChunk(index=0, text=markdown_text)]
+        return split_markdown(markdown_text, self.chunk_tokens)
+
+    def map_chunks(
+        self, chunks: Sequence[MarkdownChunk], func: Callable[[MarkdownChunk], T]
+    ) -> List[T]:
+        """Apply ``func`` to every chunk concurrently, preserving chunk order."""
+        workers = max(1, min(self.max_concurrency, len(chunks)))
+        if workers == 1:
+            return [func(chunk) for chunk in chunks]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, chunks))
+
+    def stitch(self, fragments: Sequence[HtmlSource]) -> HtmlSource:
+        if len(fragments) == 1:
+            return fragments[0]
+        return stitch_html_fragments(fragments)
+
+    def enhance(self, markdown_text: str, metadata: Dict[str, str]) -> HtmlSource:
+        chunks = self.split(markdown_text)
+        fragments = self.map_chunks(
+            chunks, lambda chunk: self.enhance_chunk(chunk, metadata)
+        )
+        return self.stitch(fragments)
+
+    def stream_chunk(self, chunk: MarkdownChunk, metadata: Dict[str, str]) -> Iterator[str]:
+        """Yield one chunk's HTML incrementally; by default in a single piece."""
+        yield self.enhance_chunk(chunk, metadata)
+
+    def stream_sections(
+        self, markdown_text: str, metadata: Dict[str, str]
+    ) -> Iterator[HtmlSource]:
+        return stream_chunk_sections(
+            self,
+            self.split(markdown_text),
+            first=lambda chunk: self.stream_chunk(chunk, metadata),
+            rest=lambda chunk: self.enhance_chunk(chunk, metadata),
+        )
+
+    def enhance_sections(
+        self, sections: Sequence[MarkdownChunk], metadata: Dict[str, str]
+    ) -> List[HtmlSource]:
+        return enhance_chunked_sections(
+            self, sections, lambda chunk: self.enhance_chunk(chunk, metadata)
+        )
+
+
+def enhance_chunked_sections(
+    client: ChunkedLLMClient,
+    sections: Sequence[MarkdownChunk],
+    produce: Callable[[MarkdownChunk], str],
+) -> List[HtmlSource]:
+    """Enhance sections as parts of a larger book, concurrently and in order.
+
+    Every section is rendered with the excerpt prompt (no per-part table of
+    contents); sections over the chunk budget are split further and their
+    parts joined with namespaced IDs.
+    """
+    jobs = plan_chunked_sections(client, sections)
+    fragments = client.map_chunks([chunk for _, chunk in jobs], produce)
+    return join_chunked_sections(sections, jobs, fragments)
+
+
+def plan_chunked_sections(
+    client: ChunkedLLMClient, sections: Sequence[MarkdownChunk]
+) -> List[Tuple[int, MarkdownChunk]]:
+    """The chunks to render for ``sections``, each with its section's position."""
+    jobs: List[Tuple[int, MarkdownChunk]] = []
+    for position, section in enumerate(sections):
+        for part in client.split(section.text):
+            chunk = MarkdownChunk(
+                index=section.index,
+                text=part.text,
+                title=part.title or section.title,
+                # 0 means the length of a streamed book is not known yet.
+                total=max(section.total, 2) if section.total else 0,
+            )
+            jobs.append((position, chunk))
+    return jobs
+
+
+def join_chunked_sections(
+    sections: Sequence[MarkdownChunk],
+    jobs: Sequence[Tuple[int, MarkdownChunk]],
+    fragments: Sequence[str],
+) -> List[HtmlSource]:
+    """Reassemble the fragments of planned chunks into one HTML per section.
+
+    A section rendered in several parts becomes one lxml document.
+    """
+    parts: List[List[str]] = [[] for _ in sections]
+    for (position, _), fragment in zip(jobs, fragments):
+        parts[position].append(fragment)
+    joined: List[HtmlSource] = []
+    for section_parts in parts:
+        if len(section_parts) <= 1:
+            joined.append(section_parts[0] if section_parts else "")
+            continue
+        suffixes = [f"p{done}" if done else None for done in range(len(section_parts))]
+        joined.append(merge_fragments(section_parts, suffixes))
+    return joined
+
+
+def stream_chunk_sections(
+    client: ChunkedLLMClient,
+    chunks: Sequence[MarkdownChunk],
+    first: Callable[[MarkdownChunk], Iterator[str]],
+    rest: Callable[[MarkdownChunk], str],
+) -> Iterator[str]:
+    """Stream the first chunk while the others are converted in the background.
+
+    Sections are yielded in document order as soon as they close, so the time
+    to the first chapter is bounded by the first chunk's streaming latency.
+    IDs in later chunks are suffixed to keep footnote anchors unique.
+    """
+    assembler = HtmlSectionAssembler()
+    workers = max(1, min(client.max_concurrency, len(chunks) - 1))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        remaining = executor.map(rest, chunks[1:])
+        for piece in first(chunks[0]):
+            yield from assembler.feed(piece)
+        for chunk, fragment in zip(chunks[1:], remaining):
+            yield from assembler.feed_tree(
+                namespace_fragment(fragment, f"c{chunk.index}")
+            )
+    yield from assembler.close()
+
 
 @dataclass
 class LocalFormatterLLM(BaseLLMClient):
@@ -29,6 +223,8 @@ class LocalFormatterLLM(BaseLLMClient):
     heading_depth: int = 2
 
     def enhance(self, markdown_text: str, metadata: Dict[str, str]) -> str:
+        from markdown import Markdown
+
         md = Markdown(
             extensions=["extra", "toc", "footnotes", "tables"],
             extension_configs={"toc": {"toc_depth": self.heading_depth}},
@@ -42,66 +238,463 @@ class LocalFormatterLLM(BaseLLMClient):
         )
         return html
 
+    def cache_identity(self) -> Dict[str, Any]:
+        return {"client": type(self).__name__, "heading_depth": self.heading_depth}
+
+
+SYSTEM_PROMPT = (
+    "You are an expert publishing assistant. Convert the provided Markdown "
+    "document into clean, semantic HTML5 suitable for an EPUB chapter. "
+    "Preserve headings hierarchy, tables, and inline formatting. "
+    "Ensure footnotes become <aside> elements linked via anchors. "
+    "Inject an ordered table of contents as a <nav> element at the top."
+)
+
+CHUNK_SYSTEM_PROMPT = (
+    "You are an expert publishing assistant. Convert the provided Markdown "
+    "excerpt, which is one part of a longer book, into clean, semantic HTML5. "
+    "Preserve headings hierarchy, tables, and inline formatting. "
+    "Render each footnote as <aside class='footnote' id='fn-LABEL'> and each "
+    "reference as <sup id='fnref-LABEL'><a href='#fn-LABEL'>LABEL</a></sup>, "
+    "keeping the Markdown footnote label. Do not add a table of contents."
+)
+
+PROMPT_TEMPLATE_VERSION = hashlib.sha256(
+    (SYSTEM_PROMPT + CHUNK_SYSTEM_PROMPT).encode("utf-8")
+).hexdigest()[:12]
+
 
 @dataclass
-class OpenAICompatibleLLM(BaseLLMClient):
-    """Wrapper around OpenAI compatible chat completion APIs."""
+class OpenAICompatibleLLM(ChunkedLLMClient):
+    """Wrapper around OpenAI compatible chat completion APIs.
+
+    Documents larger than ``chunk_tokens`` are split at heading boundaries and
+    up to ``max_concurrency`` chunks are converted in parallel.
+    """
 
     api_key: str
     base_url: str
     model: str
     temperature: float = 0.1
     max_output_tokens: int = 2048
+    chunk_tokens: int = 0
+    max_concurrency: int = 4
+    max_retries: int = 2
+    # Ask for token usage at the end of a stream; not every compatible
+    # server accepts ``stream_options``.
+    stream_usage: bool = True
 
     def __post_init__(self) -> None:
-        if OpenAI is None:  # pragma: no cover - executed only if openai is unavailable
+        # Imported here: the SDK takes longer to import than the CLI to start.
+        try:
+            from openai import OpenAI
+        except ImportError as exc:  # pragma: no cover - openai is a dependency
             raise RuntimeError(
                 "openai package is not installed; cannot use OpenAICompatibleLLM"
-            )
-        self._client = OpenAI(api_key=self.api_key, base_url=self.base_url)
-
-    def enhance(self, markdown_text: str, metadata: Dict[str, str]) -> str:
-        system_prompt = (
-            "You are an expert publishing assistant. Convert the provided Markdown "
-            "document into clean, semantic HTML5 suitable for an EPUB chapter. "
-            "Preserve headings hierarchy, tables, and inline formatting. "
-            "Ensure footnotes become <aside> elements linked via anchors. "
-            "Inject an ordered table of contents as a <nav> element at the top."
-        )
-        user_prompt = (
-            "Metadata: {metadata}\n\nMarkdown source:\n\n{markdown}\n\n"
-            "Return ONLY valid HTML within <html> tags."
-        ).format(metadata=metadata, markdown=markdown_text)
+            ) from exc
+        self._client = OpenAI(
+            api_key=self.api_key, base_url=self.base_url, max_retries=self.max_retries
+        )
 
-        response = self._client.chat.completions.create(
-            model=self.model,
-            temperature=self.temperature,
-            max_tokens=self.max_output_tokens,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
+    @classmethod
+    def from_settings(cls) -> "OpenAICompatibleLLM":
+        return cls(
+            api_key=SETTINGS.llm_api_key or "",
+            base_url=SETTINGS.llm_base_url,
+            model=SETTINGS.llm_model,
+            temperature=SETTINGS.llm_temperature,
+            max_output_tokens=SETTINGS.llm_max_output_tokens,
+            chunk_tokens=SETTINGS.llm_chunk_tokens,
+            max_concurrency=SETTINGS.llm_max_concurrency,
+            stream_usage=SETTINGS.llm_stream_usage,
         )
+
+    def cache_identity(self) -> Dict[str, Any]:
+        return {
+            "client": type(self).__name__,
+            "model": self.model,
+            "base_url": self.base_url.rstrip("/"),
+            "temperature": self.temperature,
+            "max_output_tokens": self.max_output_tokens,
+            "prompt_version": PROMPT_TEMPLATE_VERSION,
+        }
+
+    def messages(
+        self, chunk: MarkdownChunk, metadata: Dict[str, str]
+    ) -> List[Dict[str, str]]:
+        if chunk.total == 1:
+            system_prompt = SYSTEM_PROMPT
+            user_prompt = (
+                "Metadata: {metadata}\n\nMarkdown source:\n\n{markdown}\n\n"
+                "Return ONLY valid HTML within <html> tags."
+            ).format(metadata=metadata, markdown=chunk.text)
+        else:
+            system_prompt = CHUNK_SYSTEM_PROMPT
+            part = f"Part {chunk.index + 1}"
+            if chunk.total:
+                part += f" of {chunk.total}"
+            user_prompt = (
+                "Metadata: {metadata}\n\n{part}. Markdown source:"
+                "\n\n{markdown}\n\nReturn ONLY the HTML body content."
+            ).format(metadata=metadata, part=part, markdown=chunk.text)
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    def completion_args(
+        self, chunk: MarkdownChunk, metadata: Dict[str, str]
+    ) -> Dict[str, Any]:
+        """Arguments of the chat completion request for ``chunk``."""
+        return {
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_output_tokens,
+            "messages": self.messages(chunk, metadata),
+        }
+
+    def read_completion(self, response: Any) -> Tuple[str, Any]:
+        """Record a completion's token usage; return its HTML and ``usage``."""
+        usage = getattr(response, "usage", None)
+        record_token_usage(self.model, usage)
         choice = response.choices[0]
         html = choice.message.content if choice.message else None
         if not html:
             raise RuntimeError("LLM returned an empty response")
+        return html, usage
+
+    def complete_chunk(
+        self, chunk: MarkdownChunk, metadata: Dict[str, str]
+    ) -> Tuple[str, Any]:
+        """Return a chunk's HTML together with the completion ``usage``."""
+        response = self._client.chat.completions.create(
+            **self.completion_args(chunk, metadata)
+        )
+        return self.read_completion(response)
+
+    def enhance_chunk(self, chunk: MarkdownChunk, metadata: Dict[str, str]) -> str:
+        return self.complete_chunk(chunk, metadata)[0]
+
+    def stream_chunk(self, chunk: MarkdownChunk, metadata: Dict[str, str]) -> Iterator[str]:
+        stream = self._open_stream(chunk, metadata)
+        received = False
+        for event in stream:
+            record_token_usage(self.model, getattr(event, "usage", None))
+            delta = event.choices[0].delta if event.choices else None
+            if delta is not None and delta.content:
+                received = True
+                yield delta.content
+        if not received:
+            raise RuntimeError("LLM returned an empty response")
+
+    def _open_stream(self, chunk: MarkdownChunk, metadata: Dict[str, str]) -> Any:
+        """Start a streamed completion, asking for usage where it is accepted.
+
+        A server that rejects ``stream_options`` with a 400 is asked again
+        without it, and this client stops sending it.
+        """
+        from openai import BadRequestError
+
+        options: Dict[str, Any] = {}
+        if self.stream_usage:
+            # The final event then carries token usage with no choices.
+            options["stream_options"] = {"include_usage": True}
+        try:
+            return self._client.chat.completions.create(
+                **self.completion_args(chunk, metadata), stream=True, **options
+            )
+        except BadRequestError:
+            if not options:
+                raise
+            self.stream_usage = False
+            return self._open_stream(chunk, metadata)
+
+
+def response_cache_key(
+    identity: Dict[str, Any], text: str, metadata: Dict[str, str], scope: str
+) -> str:
+    """Response-cache key for ``text`` rendered by a client with ``identity``."""
+    return llm_cache_key({**identity, "scope": scope}, metadata, text)
+
+
+def chunk_scope(chunk: MarkdownChunk) -> str:
+    # Chunk position is left out of the key so inserting a section does
+    # not invalidate every chunk that follows it.
+    return "document" if chunk.total == 1 else "chunk"
+
+
+@dataclass
+class CachedLLMClient(BaseLLMClient):
+    """Serve repeated enhancements of identical input from a response cache.
+
+    When the wrapped client works in chunks, each chunk is cached on its own,
+    so a re-run only pays for the chunks whose Markdown actually changed.
+    """
+
+    inner: BaseLLMClient
+    cache: LLMResponseCache
+
+    def cache_identity(self) -> Dict[str, Any]:
+        return self.inner.cache_identity()
+
+    def _key(self, text: str, metadata: Dict[str, str], scope: str) -> str:
+        return response_cache_key(self.cache_identity(), text, metadata, scope)
+
+    def _cached(
+        self,
+        text: str,
+        metadata: Dict[str, str],
+        scope: str,
+        produce: Callable[[], str],
+    ) -> str:
+        key = self._key(text, metadata, scope)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        html = produce()
+        self.cache.put(key, html)
+        return html
+
+    def _cached_chunk(self, chunk: MarkdownChunk, metadata: Dict[str, str]) -> str:
+        inner = self.inner
+        assert isinstance(inner, ChunkedLLMClient)
+        return self._cached(
+            chunk.text,
+            metadata,
+            chunk_scope(chunk),
+            lambda: inner.enhance_chunk(chunk, metadata),
+        )
+
+    def _streamed_chunk(
+        self, chunk: MarkdownChunk, metadata: Dict[str, str]
+    ) -> Iterator[str]:
+        inner = self.inner
+        assert isinstance(inner, ChunkedLLMClient)
+        key = self._key(chunk.text, metadata, chunk_scope(chunk))
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        pieces: List[str] = []
+        for piece in inner.stream_chunk(chunk, metadata):
+            pieces.append(piece)
+            yield piece
+        self.cache.put(key, "".join(pieces))
+
+    def enhance(self, markdown_text: str, metadata: Dict[str, str]) -> HtmlSource:
+        inner = self.inner
+        if not isinstance(inner, ChunkedLLMClient):
+            return self._cached(
+                markdown_text,
+                metadata,
+                "document",
+                lambda: inner.enhance(markdown_text, metadata),
+            )
+        chunks = inner.split(markdown_text)
+        return inner.stitch(
+            inner.map_chunks(chunks, lambda chunk: self._cached_chunk(chunk, metadata))
+        )
+
+    def stream_sections(
+        self, markdown_text: str, metadata: Dict[str, str]
+    ) -> Iterator[HtmlSource]:
+        inner = self.inner
+        if not isinstance(inner, ChunkedLLMClient):
+            return super().stream_sections(markdown_text, metadata)
+        return stream_chunk_sections(
+            inner,
+            inner.split(markdown_text),
+            first=lambda chunk: self._streamed_chunk(chunk, metadata),
+            rest=lambda chunk: self._cached_chunk(chunk, metadata),
+        )
+
+    def enhance_sections(
+        self, sections: Sequence[MarkdownChunk], metadata: Dict[str, str]
+    ) -> List[HtmlSource]:
+        inner = self.inner
+        if not isinstance(inner, ChunkedLLMClient):
+            return super().enhance_sections(sections, metadata)
+        return enhance_chunked_sections(
+            inner, sections, lambda chunk: self._cached_chunk(chunk, metadata)
+        )
+
+
+class AsyncLLMClient(ABC):
+    """Asyncio counterpart of :class:`BaseLLMClient`, used by the web service."""
+
+    @abstractmethod
+    async def enhance(self, markdown_text: str, metadata: Dict[str, str]) -> HtmlSource:
+        """Return HTML that is ready for EPUB creation."""
+
+    async def enhance_sections(
+        self, sections: Sequence[MarkdownChunk], metadata: Dict[str, str]
+    ) -> List[HtmlSource]:
+        return list(
+            await asyncio.gather(
+                *(self.enhance(section.text, metadata) for section in sections)
+            )
+        )
+
+    def cache_identity(self) -> Dict[str, Any]:
+        return {"client": type(self).__name__}
+
+    async def warm(self) -> None:
+        """Open connections ahead of the first request."""
+
+    async def aclose(self) -> None:
+        """Release pooled connections."""
+
+
+@dataclass
+class ThreadedLLMClient(AsyncLLMClient):
+    """Run a synchronous client in worker threads.
+
+    For the local formatter, whose work is CPU-bound, and for clients with
+    no asyncio transport such as the endpoint router.
+    """
+
+    inner: BaseLLMClient
+
+    async def enhance(self, markdown_text: str, metadata: Dict[str, str]) -> HtmlSource:
+        return await asyncio.to_thread(self.inner.enhance, markdown_text, metadata)
+
+    async def enhance_sections(
+        self, sections: Sequence[MarkdownChunk], metadata: Dict[str, str]
+    ) -> List[HtmlSource]:
+        return await asyncio.to_thread(self.inner.enhance_sections, sections, metadata)
+
+    def cache_identity(self) -> Dict[str, Any]:
+        return self.inner.cache_identity()
+
+    @property
+    def is_local(self) -> bool:
+        return isinstance(self.inner, LocalFormatterLLM)
+
+
+class AsyncOpenAICompatibleLLM(AsyncLLMClient):
+    """:class:`OpenAICompatibleLLM` on ``AsyncOpenAI``.
+
+    Prompts, chunking and cache keys come from ``config``, so the two clients
+    share cached responses. Each call keeps up to ``max_concurrency`` chunk
+    completions in flight without holding a thread for any of them.
+    """
+
+    def __init__(
+        self, config: OpenAICompatibleLLM, cache: Optional[LLMResponseCache] = None
+    ) -> None:
+        from openai import AsyncOpenAI
+
+        self.config = config
+        self.cache = cache
+        self._client = AsyncOpenAI(
+            api_key=config.api_key,
+            base_url=config.base_url,
+            max_retries=config.max_retries,
+        )
+
+    def cache_identity(self) -> Dict[str, Any]:
+        return self.config.cache_identity()
+
+    async def warm(self) -> None:
+        # Any cheap authenticated request sets up the TLS connection.
+        await self._client.models.list()
+
+    async def aclose(self) -> None:
+        await self._client.close()
+
+    async def _complete(self, chunk: MarkdownChunk, metadata: Dict[str, str]) -> str:
+        response = await self._client.chat.completions.create(
+            **self.config.completion_args(chunk, metadata)
+        )
+        return self.config.read_completion(response)[0]
+
+    async def enhance_chunk(
+        self, chunk: MarkdownChunk, metadata: Dict[str, str]
+    ) -> str:
+        if self.cache is None:
+            return await self._complete(chunk, metadata)
+        key = response_cache_key(
+            self.cache_identity(), chunk.text, metadata, chunk_scope(chunk)
+        )
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            return cached
+        html = await self._complete(chunk, metadata)
+        await asyncio.to_thread(self.cache.put, key, html)
         return html
 
+    async def _map_chunks(
+        self, chunks: Sequence[MarkdownChunk], metadata: Dict[str, str]
+    ) -> List[str]:
+        slots = asyncio.Semaphore(max(1, self.config.max_concurrency))
+
+        async def run(chunk: MarkdownChunk) -> str:
+            async with slots:
+                return await self.enhance_chunk(chunk, metadata)
+
+        tasks = [asyncio.ensure_future(run(chunk)) for chunk in chunks]
+        try:
+            return list(await asyncio.gather(*tasks))
+        finally:
+            # After the first failure the other chunks are no longer needed.
+            for task in tasks:
+                task.cancel()
+
+    async def enhance(self, markdown_text: str, metadata: Dict[str, str]) -> HtmlSource:
+        fragments = await self._map_chunks(self.config.split(markdown_text), metadata)
+        if len(fragments) == 1:
+            return fragments[0]
+        return await asyncio.to_thread(self.config.stitch, fragments)
 
-def build_llm_client(use_local_formatter: bool = False) -> BaseLLMClient:
+    async def enhance_sections(
+        self, sections: Sequence[MarkdownChunk], metadata: Dict[str, str]
+    ) -> List[HtmlSource]:
+        jobs = plan_chunked_sections(self.config, sections)
+        fragments = await self._map_chunks([chunk for _, chunk in jobs], metadata)
+        return join_chunked_sections(sections, jobs, fragments)
+
+
+def build_llm_client(
+    use_local_formatter: bool = False,
+    cache: Optional[LLMResponseCache] = None,
+) -> BaseLLMClient:
     if use_local_formatter:
         return LocalFormatterLLM()
-    if SETTINGS.has_llm_credentials:
+    client: BaseLLMClient
+    if SETTINGS.llm_endpoints:
+        from .llm_router import RoutingLLMClient
+
+        client = RoutingLLMClient.from_settings()
+    elif SETTINGS.has_llm_credentials:
         try:
-            return OpenAICompatibleLLM(
-                api_key=SETTINGS.llm_api_key or "",  # type: ignore[arg-type]
-                base_url=SETTINGS.llm_base_url,
-                model=SETTINGS.llm_model,
-                temperature=SETTINGS.llm_temperature,
-                max_output_tokens=SETTINGS.llm_max_output_tokens,
-            )
+            client = OpenAICompatibleLLM.from_settings()
         except Exception:
             # fall back to local formatter when remote init fails
             return LocalFormatterLLM()
-    return LocalFormatterLLM()
+    else:
+        return LocalFormatterLLM()
+    cache = cache or LLMResponseCache.from_settings()
+    if cache is not None:
+        client = CachedLLMClient(inner=client, cache=cache)
+    return client
+
+
+def build_async_llm_client(
+    use_local_formatter: bool = False,
+    cache: Optional[LLMResponseCache] = None,
+) -> AsyncLLMClient:
+    """The asyncio client matching what :func:`build_llm_client` would build."""
+    if (
+        use_local_formatter
+        or SETTINGS.llm_endpoints
+        or not SETTINGS.has_llm_credentials
+    ):
+        return ThreadedLLMClient(build_llm_client(use_local_formatter, cache))
+    try:
+        config = OpenAICompatibleLLM.from_settings()
+        return AsyncOpenAICompatibleLLM(
+            config, cache=cache or LLMResponseCache.from_settings()
+        )
+    except Exception:
+        # fall back to local formatter when remote init fails
+        return ThreadedLLMClient(LocalFormatterLLM())
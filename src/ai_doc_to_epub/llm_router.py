@@ -0,0 +1,448 @@
+from __future__ import annotations
+
+import math
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import httpx
+
+from .chunking import MarkdownChunk, estimate_tokens
+from .config import SETTINGS
+from .llm_client import PROMPT_TEMPLATE_VERSION, ChunkedLLMClient, OpenAICompatibleLLM
+from .metrics import (
+    LLM_ENDPOINT_BUDGET_USED,
+    LLM_ENDPOINT_COOLDOWN,
+    LLM_ENDPOINT_IN_FLIGHT,
+    LLM_ENDPOINT_REQUESTS,
+    REGISTRY,
+)
+
+try:  # pragma: no cover - openai is optional during testing
+    from openai import APIConnectionError
+except Exception:  # pragma: no cover - fallback when openai isn't installed
+    APIConnectionError = ConnectionError  # type: ignore
+
+RETRYABLE_STATUS_CODES = {408, 409, 500, 502, 503, 504}
+# System prompt and message framing, on top of the Markdown itself.
+PROMPT_OVERHEAD_TOKENS = 200
+
+
+@dataclass
+class EndpointConfig:
+    """One OpenAI-compatible deployment and its quota; 0 means unlimited."""
+
+    name: str
+    base_url: str
+    model: str
+    api_key: str = ""
+    weight: float = 1.0
+    requests_per_minute: int = 0
+    tokens_per_minute: int = 0
+    max_concurrency: int = 4
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "EndpointConfig":
+        """Build from an ``LLM_ENDPOINTS`` entry.
+
+        ``api_key_env`` names an environment variable holding the key, so
+        secrets need not be inlined; ``rpm`` and ``tpm`` are accepted as
+        shorthands for the per-minute limits.
+        """
+        api_key = data.get("api_key") or os.getenv(data.get("api_key_env", ""), "")
+        return cls(
+            name=data.get("name") or data["base_url"],
+            base_url=data["base_url"],
+            model=data.get("model", SETTINGS.llm_model),
+            api_key=api_key,
+            weight=float(data.get("weight", 1.0)),
+            requests_per_minute=int(
+                data.get("rpm", data.get("requests_per_minute", 0))
+            ),
+            tokens_per_minute=int(data.get("tpm", data.get("tokens_per_minute", 0))),
+            max_concurrency=int(data.get("max_concurrency", 4)),
+        )
+
+
+class TokenBucket:
+    """Continuously refilling budget of ``capacity`` units per ``period`` seconds.
+
+    A capacity of 0 disables the limit. Requests larger than the whole
+    capacity are admitted once the bucket is full, leaving it in debt.
+    """
+
+    def __init__(
+        self,
+        capacity: float,
+        period: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.capacity = capacity
+        self.rate = capacity / period if capacity else 0.0
+        self._clock = clock
+        self._available = capacity
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._available = min(
+            self.capacity, self._available + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` can be taken (0 when it can be right now)."""
+        if not self.capacity:
+            return 0.0
+        self._refill()
+        missing = min(amount, self.capacity) - self._available
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float) -> None:
+        if self.capacity:
+            self._refill()
+            self._available -= amount
+
+    def give(self, amount: float) -> None:
+        """Return (or, if negative, charge) units after the real cost is known."""
+        if self.capacity:
+            self._refill()
+            self._available = min(self.capacity, self._available + amount)
+
+    def utilization(self) -> float:
+        if not self.capacity:
+            return 0.0
+        self._refill()
+        return max(0.0, 1.0 - self._available / self.capacity)
+
+
+class RoutedEndpoint:
+    """Runtime state of one endpoint: its client, buckets and counters."""
+
+    def __init__(
+        self,
+        config: EndpointConfig,
+        client: Any,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.config = config
+        self.client = client
+        self.requests = TokenBucket(config.requests_per_minute, clock=clock)
+        self.tokens = TokenBucket(config.tokens_per_minute, clock=clock)
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.throttle_streak = 0
+        self.completed = 0
+        self.throttled = 0
+        self.failed = 0
+        self.tokens_used = 0
+
+    @property
+    def name(self) -> str:
+        return self.config.name
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        if self.in_flight >= self.config.max_concurrency:
+            return math.inf  # wait for a release instead of a timer
+        return max(
+            self.cooldown_until - now,
+            self.requests.wait_time(1),
+            self.tokens.wait_time(tokens),
+        )
+
+    def load(self) -> float:
+        return self.in_flight / max(self.config.weight, 1e-9)
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    """Read ``retry-after-ms`` or ``retry-after`` (seconds or HTTP date)."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+
+
+def _total_tokens(usage: Any) -> Optional[int]:
+    if usage is None:
+        return None
+    total = getattr(usage, "total_tokens", None)
+    if total is None:
+        total = (getattr(usage, "prompt_tokens", 0) or 0) + (
+            getattr(usage, "completion_tokens", 0) or 0
+        )
+    return int(total)
+
+
+class NoEndpointAvailableError(RuntimeError):
+    """Raised when no endpoint frees up within ``max_wait_seconds``."""
+
+
+class RoutingLLMClient(ChunkedLLMClient):
+    """Spread chunk requests over several OpenAI-compatible endpoints.
+
+    Each endpoint has its own request and token buckets and concurrency cap;
+    a request waits until some endpoint can admit it and then goes to the
+    least loaded one relative to its weight (``least_loaded``) or to a
+    weight-proportional random pick (``weighted``). A 429 cools the endpoint
+    down for its ``Retry-After`` and the request is rerouted; transient
+    errors cool it down briefly. ``max_concurrency`` is the sum of the
+    endpoints' caps, so aggregate throughput is the sum of their quotas.
+    """
+
+    def __init__(
+        self,
+        endpoints: Sequence[RoutedEndpoint],
+        strategy: str = "least_loaded",
+        chunk_tokens: int = 0,
+        max_output_tokens: int = 0,
+        max_attempts: Optional[int] = None,
+        max_wait_seconds: float = 300.0,
+        throttle_cooldown: float = 1.0,
+        error_cooldown: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if not endpoints:
+            raise ValueError("RoutingLLMClient needs at least one endpoint")
+        if strategy not in ("least_loaded", "weighted"):
+            raise ValueError(f"Unknown routing strategy: {strategy}")
+        self.endpoints = list(endpoints)
+        self.strategy = strategy
+        self.chunk_tokens = chunk_tokens
+        self.max_output_tokens = max_output_tokens
+        self.max_concurrency = sum(item.config.max_concurrency for item in endpoints)
+        self.max_attempts = max_attempts or max(3, 2 * len(self.endpoints))
+        self.max_wait_seconds = max_wait_seconds
+        self.throttle_cooldown = throttle_cooldown
+        self.error_cooldown = error_cooldown
+        self._clock = clock
+        self._condition = threading.Condition()
+        REGISTRY.collector(self.publish_utilization)
+
+    @classmethod
+    def from_settings(cls) -> "RoutingLLMClient":
+        endpoints = []
+        for entry in SETTINGS.llm_endpoints:
+            config = EndpointConfig.from_dict(entry)
+            client = OpenAICompatibleLLM(
+                api_key=config.api_key,
+                base_url=config.base_url,
+                model=config.model,
+                temperature=SETTINGS.llm_temperature,
+                max_output_tokens=SETTINGS.llm_max_output_tokens,
+                # The router handles retries so a 429 can move to another key.
+                max_retries=0,
+            )
+            endpoints.append(RoutedEndpoint(config, client))
+        return cls(
+            endpoints,
+            strategy=SETTINGS.llm_routing_strategy,
+            chunk_tokens=SETTINGS.llm_chunk_tokens,
+            max_output_tokens=SETTINGS.llm_max_output_tokens,
+        )
+
+    def cache_identity(self) -> Dict[str, Any]:
+        # Any endpoint may serve a chunk, so the identity covers all of them.
+        endpoints = {
+            (
+                item.config.model,
+                item.config.base_url.rstrip("/"),
+                str(getattr(item.client, "temperature", "")),
+                str(getattr(item.client, "max_output_tokens", "")),
+            )
+            for item in self.endpoints
+        }
+        return {
+            "client": type(self).__name__,
+            "endpoints": sorted(endpoints),
+            "prompt_version": PROMPT_TEMPLATE_VERSION,
+        }
+
+    # ------------------------------------------------------------------
+    # Dispatch
+    # ------------------------------------------------------------------
+    def _reservation(self, chunk: MarkdownChunk) -> int:
+        return (
+            estimate_tokens(chunk.text)
+            + PROMPT_OVERHEAD_TOKENS
+            + self.max_output_tokens
+        )
+
+    def _choose(self, ready: List[RoutedEndpoint]) -> RoutedEndpoint:
+        if self.strategy == "weighted":
+            return random.choices(
+                ready, weights=[item.config.weight for item in ready]
+            )[0]
+        return min(ready, key=lambda item: (item.load(), -item.config.weight))
+
+    def _acquire(self, tokens: int) -> RoutedEndpoint:
+        deadline = self._clock() + self.max_wait_seconds
+        with self._condition:
+            while True:
+                now = self._clock()
+                waits = [item.wait_time(tokens, now) for item in self.endpoints]
+                ready = [item for item, wait in zip(self.endpoints, waits) if wait <= 0]
+                if ready:
+                    endpoint = self._choose(ready)
+                    endpoint.in_flight += 1
+                    endpoint.requests.take(1)
+                    endpoint.tokens.take(tokens)
+                    LLM_ENDPOINT_IN_FLIGHT.inc(endpoint=endpoint.name)
+                    return endpoint
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise NoEndpointAvailableError(
+                        f"No LLM endpoint could take a request within "
+                        f"{self.max_wait_seconds:.0f}s"
+                    )
+                self._condition.wait(timeout=min(min(waits), remaining))
+
+    def _release(
+        self,
+        endpoint: RoutedEndpoint,
+        reserved: int,
+        outcome: str,
+        used: Optional[int] = None,
+        cooldown: float = 0.0,
+    ) -> None:
+        with self._condition:
+            endpoint.in_flight -= 1
+            if used is not None:
+                endpoint.tokens.give(reserved - used)
+                endpoint.tokens_used += used
+            if outcome == "ok":
+                endpoint.completed += 1
+                endpoint.throttle_streak = 0
+            elif outcome == "throttled":
+                endpoint.throttled += 1
+                endpoint.throttle_streak += 1
+            else:
+                endpoint.failed += 1
+            if cooldown:
+                endpoint.cooldown_until = max(
+                    endpoint.cooldown_until, self._clock() + cooldown
+                )
+            self._condition.notify_all()
+        LLM_ENDPOINT_IN_FLIGHT.dec(endpoint=endpoint.name)
+        LLM_ENDPOINT_REQUESTS.inc(endpoint=endpoint.name, outcome=outcome)
+
+    def _release_failure(
+        self, endpoint: RoutedEndpoint, reserved: int, exc: BaseException
+    ) -> bool:
+        """Release after an error; returns whether the request may be rerouted."""
+        status = getattr(exc, "status_code", None)
+        if status == 429:
+            backoff = self.throttle_cooldown * 2 ** min(endpoint.throttle_streak, 6)
+            cooldown = _retry_after(exc) or backoff
+            self._release(endpoint, reserved, "throttled", cooldown=cooldown)
+            return True
+        retryable = status in RETRYABLE_STATUS_CODES or (
+            status is None
+            and isinstance(exc, (APIConnectionError, httpx.TransportError, OSError))
+        )
+        self._release(
+            endpoint,
+            reserved,
+            "error",
+            cooldown=self.error_cooldown if retryable else 0.0,
+        )
+        return retryable
+
+    def enhance_chunk(self, chunk: MarkdownChunk, metadata: Dict[str, str]) -> str:
+        reserved = self._reservation(chunk)
+        errors: List[str] = []
+        for _ in range(self.max_attempts):
+            endpoint = self._acquire(reserved)
+            try:
+                html, usage = endpoint.client.complete_chunk(chunk, metadata)
+            except Exception as exc:
+                if not self._release_failure(endpoint, reserved, exc):
+                    raise
+                errors.append(f"{endpoint.name}: {exc}")
+                continue
+            self._release(endpoint, reserved, "ok", used=_total_tokens(usage))
+            return html
+        raise RuntimeError("All LLM endpoint attempts failed: " + " | ".join(errors))
+
+    def stream_chunk(
+        self, chunk: MarkdownChunk, metadata: Dict[str, str]
+    ) -> Iterator[str]:
+        """Stream from one endpoint; reroute only if it fails before any output.
+
+        Streamed usage is not reported back, so the token reservation stands.
+        """
+        reserved = self._reservation(chunk)
+        errors: List[str] = []
+        for _ in range(self.max_attempts):
+            endpoint = self._acquire(reserved)
+            received = False
+            try:
+                for piece in endpoint.client.stream_chunk(chunk, metadata):
+                    received = True
+                    yield piece
+            except GeneratorExit:
+                self._release(endpoint, reserved, "ok")
+                raise
+            except Exception as exc:
+                if not self._release_failure(endpoint, reserved, exc) or received:
+                    raise
+                errors.append(f"{endpoint.name}: {exc}")
+                continue
+            self._release(endpoint, reserved, "ok")
+            return
+        raise RuntimeError("All LLM endpoint attempts failed: " + " | ".join(errors))
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    def utilization(self) -> Dict[str, Dict[str, float]]:
+        """Per-endpoint load, remaining quota and outcome counters."""
+        with self._condition:
+            now = self._clock()
+            return {
+                item.name: {
+                    "in_flight": item.in_flight,
+                    "max_concurrency": item.config.max_concurrency,
+                    "concurrency_utilization": item.in_flight
+                    / max(item.config.max_concurrency, 1),
+                    "request_budget_used": item.requests.utilization(),
+                    "token_budget_used": item.tokens.utilization(),
+                    "cooldown_seconds": max(0.0, item.cooldown_until - now),
+                    "completed": item.completed,
+                    "throttled": item.throttled,
+                    "failed": item.failed,
+                    "tokens": item.tokens_used,
+                }
+                for item in self.endpoints
+            }
+
+    def publish_utilization(self) -> None:
+        """Set the endpoint budget and cooldown gauges; runs on each scrape."""
+        for name, usage in self.utilization().items():
+            LLM_ENDPOINT_BUDGET_USED.set(
+                usage["request_budget_used"], endpoint=name, budget="requests"
+            )
+            LLM_ENDPOINT_BUDGET_USED.set(
+                usage["token_budget_used"], endpoint=name, budget="tokens"
+            )
+            LLM_ENDPOINT_COOLDOWN.set(usage["cooldown_seconds"], endpoint=name)
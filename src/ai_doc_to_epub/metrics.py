@@ -0,0 +1,350 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+T = TypeVar("T")
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:  # pragma: no cover - abstract
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing value, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    """Value that can go up and down, such as requests in flight."""
+
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram in the Prometheus exposition format."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: bucket counts (non-cumulative), sum, count.
+        self._values: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(
+                key, ([0] * (len(self.buckets) + 1), 0.0, 0)
+            )
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(
+                (key, (list(counts), total, count))
+                for key, (counts, total, count) in self._values.items()
+            )
+        lines: List[str] = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                labels = _format_labels(self.labelnames, key, extra=le)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide collection of metrics rendered for ``GET /metrics``.
+
+    Values live in process memory, so each uvicorn worker exposes its own
+    series and the scraper aggregates them.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[weakref.WeakMethod] = []
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def collector(self, method: Callable[[], None]) -> None:
+        """Call the bound ``method`` before each render to refresh gauges.
+
+        For state that changes with time rather than on events, such as
+        cooldowns. Only a weak reference is kept, so registering does not keep
+        the owner alive.
+        """
+        self._collectors.append(weakref.WeakMethod(method))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        for reference in list(self._collectors):
+            method = reference()
+            if method is None:
+                self._collectors.remove(reference)
+            else:
+                method()
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "atoe_stage_duration_seconds",
+    "Time spent in each conversion stage, per conversion.",
+    ("stage",),
+)
+CONVERSIONS = REGISTRY.counter(
+    "atoe_conversions_total", "Finished conversions by outcome.", ("status",)
+)
+DOCUMENT_BYTES = REGISTRY.counter(
+    "atoe_document_bytes_total",
+    "Bytes of source documents read and EPUBs written.",
+    ("direction",),
+)
+LLM_TOKENS = REGISTRY.counter(
+    "atoe_llm_tokens_total",
+    "Tokens reported in LLM completion usage.",
+    ("model", "kind"),
+)
+BACKEND_SELECTIONS = REGISTRY.counter(
+    "atoe_backend_selections_total",
+    "Backend that served each extraction or enhancement.",
+    ("component", "backend"),
+)
+LLM_ENDPOINT_REQUESTS = REGISTRY.counter(
+    "atoe_llm_endpoint_requests_total",
+    "Requests dispatched to each routed LLM endpoint, by outcome.",
+    ("endpoint", "outcome"),
+)
+LLM_ENDPOINT_IN_FLIGHT = REGISTRY.gauge(
+    "atoe_llm_endpoint_in_flight",
+    "Requests currently running against each routed LLM endpoint.",
+    ("endpoint",),
+)
+LLM_ENDPOINT_BUDGET_USED = REGISTRY.gauge(
+    "atoe_llm_endpoint_budget_used_ratio",
+    "Share of each routed LLM endpoint's per-minute request or token budget in use.",
+    ("endpoint", "budget"),
+)
+LLM_ENDPOINT_COOLDOWN = REGISTRY.gauge(
+    "atoe_llm_endpoint_cooldown_seconds",
+    "Seconds until a throttled or failing routed LLM endpoint is used again.",
+    ("endpoint",),
+)
+CACHE_EVENTS = REGISTRY.counter(
+    "atoe_cache_events_total",
+    "Extraction and LLM response cache hits, misses, writes and evictions.",
+    ("cache", "event"),
+)
+INCREMENTAL_SECTIONS = REGISTRY.counter(
+    "atoe_incremental_sections_total",
+    "Chapters re-enhanced or reused by incremental conversions.",
+    ("outcome",),
+)
+DEGRADED_SECTIONS = REGISTRY.counter(
+    "atoe_degraded_sections_total",
+    "Chapters rendered by the local formatter to meet a conversion deadline.",
+    ("reason",),
+)
+COALESCED_CONVERSIONS = REGISTRY.counter(
+    "atoe_coalesced_conversions_total",
+    "Requests served by an identical conversion that was already running.",
+    ("endpoint",),
+)
+
+
+def record_token_usage(model: str, usage: object) -> None:
+    """Count prompt and completion tokens from an OpenAI-style ``usage`` object."""
+    if usage is None:
+        return
+    for kind in ("prompt", "completion"):
+        tokens = getattr(usage, f"{kind}_tokens", None)
+        if tokens:
+            LLM_TOKENS.inc(tokens, model=model, kind=kind)
+
+
+class StageTimer:
+    """Accumulate exclusive wall-clock time per pipeline stage.
+
+    Stages may nest (for example a lazily consumed generator pulled from
+    inside the writing stage); time spent in an inner stage is not charged to
+    the outer one, so the per-stage figures add up to the total.
+    """
+
+    def __init__(self) -> None:
+        self.timings: Dict[str, float] = {}
+        self._stack: List[Tuple[str, float]] = []
+
+    def _charge(self, now: float) -> None:
+        if self._stack:
+            name, since = self._stack[-1]
+            self.timings[name] = self.timings.get(name, 0.0) + now - since
+            self._stack[-1] = (name, now)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        self._charge(time.perf_counter())
+        self._stack.append((name, time.perf_counter()))
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self._charge(now)
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1] = (self._stack[-1][0], now)
+
+    def iterate(self, items: Iterable[T], name: str) -> Iterator[T]:
+        """Yield from ``items``, charging the time spent producing them to ``name``."""
+        iterator = iter(items)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def observe(self) -> None:
+        """Publish the accumulated stage durations to the stage histogram."""
+        for name, seconds in self.timings.items():
+            STAGE_SECONDS.observe(seconds, stage=name)
@@ -1,25 +1,446 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import multiprocessing
+import os
+import random
 import shutil
 import subprocess
 import tempfile
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import BrokenExecutor, Future, ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
-
-import httpx
-from docx import Document
-from pdfminer.high_level import extract_text
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
+from .cache import ExtractionCache, file_digest
+from .chunking import split_chapters
 from .config import SETTINGS
+from .metrics import BACKEND_SELECTIONS
+from .mineru_worker import MinerUWorkerError, MinerUWorkerPool, shared_worker_pool
+
+if TYPE_CHECKING:
+    import httpx
+
+# httpx, pdfminer and the DOCX extractor are imported where they are used: most
+# processes need at most one of them, and the CLI should start without any.
+
+# Bump whenever the fallback extractors change their Markdown output so
+# cached results produced by older versions are not reused.
+FALLBACK_EXTRACTOR_VERSION = "5"
 
 
 class MinerUError(RuntimeError):
     """Errors raised during MinerU conversion."""
 
 
+# ----------------------------------------------------------------------
+# Pooled, load-balanced HTTP client
+# ----------------------------------------------------------------------
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+@dataclass
+class MinerUEndpoint:
+    url: str
+    outstanding: int = 0
+    failures: int = 0
+    ejected_until: float = 0.0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+
+class _ReplicaSet:
+    """Replica selection and ejection shared by the sync and async HTTP pools.
+
+    Each conversion goes to the available replica with the fewest
+    outstanding requests. Connection errors and retryable status codes eject
+    the replica for ``eject_seconds`` and the conversion is retried, with
+    exponential backoff, on another replica. Ejected replicas are tried again
+    once their ejection expires or after a successful health check.
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        max_attempts: int,
+        backoff_seconds: float,
+        eject_seconds: float,
+        health_path: str,
+    ) -> None:
+        if not urls:
+            raise ValueError(f"{type(self).__name__} needs at least one endpoint")
+        self.endpoints = [MinerUEndpoint(url.rstrip("/")) for url in urls]
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_seconds = backoff_seconds
+        self.eject_seconds = eject_seconds
+        self.health_path = health_path
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _client_options(
+        urls: Sequence[str], api_key: Optional[str], timeout: float
+    ) -> Dict[str, Any]:
+        import httpx
+
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        return {
+            "timeout": timeout,
+            "headers": headers,
+            "limits": httpx.Limits(
+                max_connections=None, max_keepalive_connections=4 * len(urls)
+            ),
+        }
+
+    def _backoff(self, attempt: int) -> float:
+        """Seconds to wait before ``attempt``; 0 for the first one."""
+        if not attempt:
+            return 0.0
+        delay = self.backoff_seconds * (2 ** (attempt - 1))
+        return delay * random.uniform(0.5, 1.5)
+
+    def _acquire(self, tried: Set[str]) -> MinerUEndpoint:
+        with self._lock:
+            candidates = [
+                endpoint
+                for endpoint in self.endpoints
+                if endpoint.available and endpoint.url not in tried
+            ]
+            if not candidates:
+                # Everything is ejected or already tried: fall back to the
+                # replica that is due back soonest rather than giving up.
+                candidates = [
+                    min(
+                        self.endpoints,
+                        key=lambda item: (item.url in tried, item.ejected_until),
+                    )
+                ]
+            endpoint = min(
+                candidates,
+                key=lambda endpoint: (endpoint.outstanding, endpoint.failures),
+            )
+            endpoint.outstanding += 1
+            return endpoint
+
+    def _release(self, endpoint: MinerUEndpoint, healthy: bool) -> None:
+        with self._lock:
+            endpoint.outstanding -= 1
+            if healthy:
+                endpoint.failures = 0
+                endpoint.ejected_until = 0.0
+            else:
+                endpoint.failures += 1
+                endpoint.ejected_until = time.monotonic() + self.eject_seconds
+
+    def _probed(self, endpoint: MinerUEndpoint, healthy: bool) -> None:
+        with self._lock:
+            if healthy:
+                endpoint.failures = 0
+                endpoint.ejected_until = 0.0
+            else:
+                endpoint.ejected_until = time.monotonic() + self.eject_seconds
+
+    def _result(
+        self, endpoint: MinerUEndpoint, response: httpx.Response, errors: List[str]
+    ) -> Optional[str]:
+        """Markdown from a replica's response, or ``None`` to try another one.
+
+        A successful status with a body that is not the expected JSON (say an
+        HTML error page from a proxy) counts as a failed attempt on that
+        replica, like a retryable status.
+        """
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            errors.append(f"{endpoint.url}: HTTP {response.status_code}")
+            return None
+        if response.status_code >= 400:
+            raise MinerUError(
+                f"MinerU HTTP conversion failed ({response.status_code}): "
+                f"{response.text}"
+            )
+        try:
+            return self._parse(response)
+        except MinerUError as exc:
+            errors.append(f"{endpoint.url}: {exc}")
+            return None
+
+    @staticmethod
+    def _parse(response: httpx.Response) -> str:
+        try:
+            data = response.json()
+        except ValueError as exc:
+            raise MinerUError("MinerU HTTP response was not JSON.") from exc
+        if isinstance(data, dict):
+            for field in ("markdown", "content"):
+                if isinstance(data.get(field), str):
+                    return data[field]
+        raise MinerUError(
+            "MinerU HTTP response did not contain a 'markdown' or 'content' field."
+        )
+
+    @staticmethod
+    def _exhausted(errors: List[str]) -> MinerUError:
+        return MinerUError(
+            "MinerU HTTP conversion failed on all replicas: " + "; ".join(errors)
+        )
+
+
+class MinerUHttpPool(_ReplicaSet):
+    """Long-lived HTTP client balancing conversions across MinerU replicas.
+
+    One pooled ``httpx.Client`` is shared by all requests so connections are
+    reused; replicas are chosen, ejected and retried as in ``_ReplicaSet``.
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        api_key: Optional[str] = None,
+        timeout: float = 300.0,
+        max_attempts: int = 3,
+        backoff_seconds: float = 0.5,
+        eject_seconds: float = 30.0,
+        health_path: str = "/health",
+        transport: Optional[httpx.BaseTransport] = None,
+    ) -> None:
+        import httpx
+
+        super().__init__(
+            urls, max_attempts, backoff_seconds, eject_seconds, health_path
+        )
+        self._client = httpx.Client(
+            **self._client_options(urls, api_key, timeout), transport=transport
+        )
+
+    def close(self) -> None:
+        self._client.close()
+
+    def convert(self, input_path: Path) -> str:
+        import httpx
+
+        errors: List[str] = []
+        tried: Set[str] = set()
+        for attempt in range(self.max_attempts):
+            time.sleep(self._backoff(attempt))
+            endpoint = self._acquire(tried)
+            tried.add(endpoint.url)
+            healthy = False
+            try:
+                with input_path.open("rb") as file_handle:
+                    response = self._client.post(
+                        f"{endpoint.url}/convert",
+                        files={"file": (input_path.name, file_handle)},
+                    )
+            except httpx.TransportError as exc:
+                errors.append(f"{endpoint.url}: {exc!r}")
+                continue
+            else:
+                # A 4xx is the request's fault and leaves the replica healthy.
+                healthy = response.status_code not in RETRYABLE_STATUS_CODES
+                markdown = self._result(endpoint, response, errors)
+                healthy = healthy and markdown is not None
+            finally:
+                self._release(endpoint, healthy)
+            if markdown is not None:
+                return markdown
+        raise self._exhausted(errors)
+
+    def check_health(self) -> Dict[str, bool]:
+        """Probe every replica, re-admitting healthy ones and ejecting the rest."""
+        import httpx
+
+        results: Dict[str, bool] = {}
+        for endpoint in self.endpoints:
+            try:
+                response = self._client.get(
+                    f"{endpoint.url}{self.health_path}", timeout=5.0
+                )
+                healthy = response.status_code < 500
+            except httpx.TransportError:
+                healthy = False
+            self._probed(endpoint, healthy)
+            results[endpoint.url] = healthy
+        return results
+
+
+class AsyncMinerUHttpPool(_ReplicaSet):
+    """:class:`MinerUHttpPool` on an ``httpx.AsyncClient``.
+
+    Conversions wait on the network without holding a thread, so one event
+    loop can keep many of them in flight.
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        api_key: Optional[str] = None,
+        timeout: float = 300.0,
+        max_attempts: int = 3,
+        backoff_seconds: float = 0.5,
+        eject_seconds: float = 30.0,
+        health_path: str = "/health",
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        import httpx
+
+        super().__init__(
+            urls, max_attempts, backoff_seconds, eject_seconds, health_path
+        )
+        self._client = httpx.AsyncClient(
+            **self._client_options(urls, api_key, timeout), transport=transport
+        )
+
+    @classmethod
+    def from_settings(cls, urls: Sequence[str]) -> "AsyncMinerUHttpPool":
+        return cls(
+            urls,
+            api_key=SETTINGS.mineru_api_key,
+            timeout=SETTINGS.mineru_http_timeout,
+            max_attempts=SETTINGS.mineru_http_max_attempts,
+            backoff_seconds=SETTINGS.mineru_http_backoff_seconds,
+        )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def convert(self, input_path: Path) -> str:
+        import httpx
+
+        errors: List[str] = []
+        tried: Set[str] = set()
+        for attempt in range(self.max_attempts):
+            await asyncio.sleep(self._backoff(attempt))
+            endpoint = self._acquire(tried)
+            tried.add(endpoint.url)
+            healthy = False
+            try:
+                with input_path.open("rb") as file_handle:
+                    response = await self._client.post(
+                        f"{endpoint.url}/convert",
+                        files={"file": (input_path.name, file_handle)},
+                    )
+            except httpx.TransportError as exc:
+                errors.append(f"{endpoint.url}: {exc!r}")
+                continue
+            else:
+                # A 4xx is the request's fault and leaves the replica healthy.
+                healthy = response.status_code not in RETRYABLE_STATUS_CODES
+                markdown = self._result(endpoint, response, errors)
+                healthy = healthy and markdown is not None
+            finally:
+                self._release(endpoint, healthy)
+            if markdown is not None:
+                return markdown
+        raise self._exhausted(errors)
+
+    async def check_health(self) -> Dict[str, bool]:
+        """Probe every replica concurrently; see :meth:`MinerUHttpPool.check_health`."""
+        import httpx
+
+        async def probe(endpoint: MinerUEndpoint) -> bool:
+            try:
+                response = await self._client.get(
+                    f"{endpoint.url}{self.health_path}", timeout=5.0
+                )
+                healthy = response.status_code < 500
+            except httpx.TransportError:
+                healthy = False
+            self._probed(endpoint, healthy)
+            return healthy
+
+        results = await asyncio.gather(*(probe(item) for item in self.endpoints))
+        return {item.url: healthy for item, healthy in zip(self.endpoints, results)}
+
+
+def _markdown_blocks(markdown: str) -> Iterator[str]:
+    """Yield a whole document chapter by chapter, each cut at blank lines."""
+    for chapter in split_chapters(markdown):
+        for block in chapter.text.split("\n\n"):
+            if block.strip():
+                yield block
+
+
+def _pdf_page_count(input_path: Path) -> int:
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdftypes import resolve1
+
+    with input_path.open("rb") as handle:
+        document = PDFDocument(PDFParser(handle))
+        try:
+            return int(resolve1(document.catalog["Pages"])["Count"])
+        except Exception:  # pragma: no cover - malformed page trees
+            return sum(1 for _ in PDFPage.create_pages(document))
+
+
+_pdf_pools: Dict[int, ProcessPoolExecutor] = {}
+_pdf_pools_lock = threading.Lock()
+
+
+def shared_pdf_pool(workers: int) -> ProcessPoolExecutor:
+    """Process-wide pool of ``workers`` processes for fallback PDF extraction.
+
+    Started on first use and kept, so documents do not pay for starting
+    workers. Workers are spawned rather than forked: the service is
+    multi-threaded, and forking it can copy locks held by other threads.
+    """
+    with _pdf_pools_lock:
+        pool = _pdf_pools.get(workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _pdf_pools[workers] = pool
+        return pool
+
+
+def _discard_pdf_pool(pool: ProcessPoolExecutor) -> None:
+    """Forget a broken pool so the next document starts a fresh one."""
+    with _pdf_pools_lock:
+        for workers, existing in list(_pdf_pools.items()):
+            if existing is pool:
+                del _pdf_pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _extract_pdf_pages(input_path: str, start: int, stop: int) -> List[str]:
+    """Extract the text of pages ``start``..``stop - 1``; runs in worker processes."""
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer
+
+    pages = []
+    for layout in extract_pages(input_path, page_numbers=range(start, stop)):
+        pages.append(
+            "".join(
+                element.get_text()
+                for element in layout
+                if isinstance(element, LTTextContainer)
+            )
+        )
+    return pages
+
+
 class MinerUClient:
-    """Client wrapper capable of talking to MinerU over HTTP or CLI.
+    """Client wrapper capable of talking to MinerU over HTTP, warm workers or CLI.
 
     Falls back to lightweight in-process extractors when MinerU is unavailable.
     """
@@ -29,9 +450,31 @@ class MinerUClient:
         api_url: Optional[str] = None,
         api_key: Optional[str] = None,
         binary_path: Optional[Path] = None,
+        cache: Optional[ExtractionCache] = None,
+        pdf_workers: Optional[int] = None,
+        pdf_pages_per_chunk: Optional[int] = None,
+        pdf_parallel_min_pages: Optional[int] = None,
+        api_urls: Optional[Sequence[str]] = None,
+        http_pool: Optional[MinerUHttpPool] = None,
+        worker_pool: Optional[MinerUWorkerPool] = None,
     ) -> None:
-        self.api_url = api_url or SETTINGS.mineru_api_url
+        urls = list(api_urls or SETTINGS.mineru_api_urls)
+        primary = api_url or SETTINGS.mineru_api_url
+        if primary and primary not in urls:
+            urls.insert(0, primary)
+        self.api_urls = urls
+        self.api_url = urls[0] if urls else None
         self.api_key = api_key or SETTINGS.mineru_api_key
+        if http_pool is None and urls:
+            http_pool = MinerUHttpPool(
+                urls,
+                api_key=self.api_key,
+                timeout=SETTINGS.mineru_http_timeout,
+                max_attempts=SETTINGS.mineru_http_max_attempts,
+                backoff_seconds=SETTINGS.mineru_http_backoff_seconds,
+            )
+        self.http_pool = http_pool
+        self.worker_pool = worker_pool or shared_worker_pool()
         resolved_binary = binary_path or SETTINGS.mineru_binary_path
         if isinstance(resolved_binary, str):
             resolved_binary = Path(resolved_binary)
@@ -39,45 +482,165 @@ class MinerUClient:
             detected = shutil.which("mineru")
             resolved_binary = Path(detected) if detected else None
         self.binary_path = resolved_binary
+        self.cache = cache if cache is not None else ExtractionCache.from_settings()
+        if pdf_workers is None:
+            pdf_workers = SETTINGS.pdf_extract_workers or os.cpu_count() or 1
+        # An explicit 0 or 1 extracts in this process.
+        self.pdf_workers = max(1, pdf_workers)
+        self.pdf_pages_per_chunk = max(
+            1, pdf_pages_per_chunk or SETTINGS.pdf_pages_per_chunk
+        )
+        self.pdf_parallel_min_pages = (
+            SETTINGS.pdf_parallel_min_pages
+            if pdf_parallel_min_pages is None
+            else pdf_parallel_min_pages
+        )
+
+    def close(self) -> None:
+        if self.http_pool is not None:
+            self.http_pool.close()
+
+    def convert_to_markdown(
+        self, input_path: Path, digest: Optional[str] = None
+    ) -> str:
+        """Return Markdown for ``input_path``.
+
+        ``digest`` is the SHA-256 of the file when the caller already knows it;
+        otherwise it is computed on demand for the extraction cache.
+        """
+        input_path = input_path.expanduser().resolve()
+        if not input_path.exists():
+            raise FileNotFoundError(f"Document does not exist: {input_path}")
+
+        backends = self._backends()
+        if self.cache and not digest:
+            digest = file_digest(input_path)
+
+        # HTTP replicas, then warm local workers, then the local CLI, then the
+        # in-process extractors: each backend is tried only if the previous
+        # one failed. A backend's cached output is looked up just before it
+        # would run, so a fallback's results are reused while the preferred
+        # backend is down but do not shadow it once it is back.
+        errors: List[str] = []
+        for identity, convert in backends:
+            cached = self._cached(digest, identity)
+            if cached is not None:
+                return cached
+            try:
+                markdown = convert(input_path)
+            except MinerUError as exc:
+                errors.append(str(exc))
+                continue
+            BACKEND_SELECTIONS.inc(
+                component="extraction", backend=identity.split(":", 1)[0]
+            )
+            if self.cache and digest:
+                self.cache.put(digest, identity, markdown)
+            return markdown
+        raise MinerUError(" | ".join(errors))
+
+    def iter_markdown(
+        self, input_path: Path, digest: Optional[str] = None
+    ) -> Iterator[str]:
+        """Yield Markdown for ``input_path`` in document order, piece by piece.
 
-    def convert_to_markdown(self, input_path: Path) -> str:
+        The in-process extractors are streamed page by page or block by
+        block and teed into the extraction cache as they go, so memory does
+        not grow with the document. MinerU backends and cache hits deliver
+        a whole document, which is handed on one paragraph at a time so that
+        chapters without headings can still be cut to size downstream.
+        """
         input_path = input_path.expanduser().resolve()
         if not input_path.exists():
             raise FileNotFoundError(f"Document does not exist: {input_path}")
 
-        if self.api_url:
-            return self._convert_via_http(input_path)
+        backends = self._backends()
+        if self.cache and not digest:
+            digest = file_digest(input_path)
+
+        errors: List[str] = []
+        *whole_document, (identity, _) = backends
+        for whole_identity, convert in whole_document:
+            cached = self._cached(digest, whole_identity)
+            if cached is not None:
+                yield from _markdown_blocks(cached)
+                return
+            try:
+                markdown = convert(input_path)
+            except MinerUError as exc:
+                errors.append(str(exc))
+                continue
+            BACKEND_SELECTIONS.inc(
+                component="extraction", backend=whole_identity.split(":", 1)[0]
+            )
+            if self.cache and digest:
+                self.cache.put(digest, whole_identity, markdown)
+            yield from _markdown_blocks(markdown)
+            return
+
+        cached = self._cached(digest, identity)
+        if cached is not None:
+            yield from _markdown_blocks(cached)
+            return
+        try:
+            blocks = self._fallback_blocks(input_path)
+        except MinerUError as exc:
+            errors.append(str(exc))
+            raise MinerUError(" | ".join(errors)) from exc
+        BACKEND_SELECTIONS.inc(component="extraction", backend="fallback")
+        if not (self.cache and digest):
+            yield from blocks
+            return
+        with self.cache.writer(digest, identity) as handle:
+            for position, block in enumerate(blocks):
+                handle.write(f"\n\n{block}" if position else block)
+                yield block
+
+    def _cached(self, digest: Optional[str], identity: str) -> Optional[str]:
+        if not (self.cache and digest):
+            return None
+        cached = self.cache.get(digest, identity)
+        if cached is not None:
+            BACKEND_SELECTIONS.inc(component="extraction", backend="cache")
+        return cached
+
+    def _backends(self) -> List[Tuple[str, Callable[[Path], str]]]:
+        backends: List[Tuple[str, Callable[[Path], str]]] = []
+        if self.http_pool is not None:
+            urls = ",".join(sorted(item.url for item in self.http_pool.endpoints))
+            backends.append((f"http:{urls}", self._convert_via_http))
+        if self.worker_pool is not None:
+            identity = f"worker:{self.worker_pool.identity()}"
+            backends.append((identity, self._convert_via_worker))
         if self._has_binary():
-            return self._convert_via_cli(input_path)
-        return self._fallback_extract(input_path)
+            assert self.binary_path is not None
+            mtime = self.binary_path.stat().st_mtime_ns
+            backends.append((f"cli:{self.binary_path}:{mtime}", self._convert_via_cli))
+        backends.append(
+            (f"fallback:{FALLBACK_EXTRACTOR_VERSION}", self._fallback_extract)
+        )
+        return backends
+
+    def backend_identity(self) -> str:
+        """Describe the preferred backend for a conversion, for cache keys."""
+        return self._backends()[0][0]
 
     # ------------------------------------------------------------------
     # Remote HTTP integration
     # ------------------------------------------------------------------
     def _convert_via_http(self, input_path: Path) -> str:
-        headers = {}
-        if self.api_key:
-            headers["Authorization"] = f"Bearer {self.api_key}"
-
-        with httpx.Client(timeout=300.0) as client:
-            with input_path.open("rb") as file_handle:
-                files = {"file": (input_path.name, file_handle)}
-                response = client.post(
-                    f"{self.api_url.rstrip('/')}/convert", files=files, headers=headers
-                )
-        if response.status_code >= 400:
-            raise MinerUError(
-                f"MinerU HTTP conversion failed ({response.status_code}): {response.text}"
-            )
+        assert self.http_pool is not None
+        return self.http_pool.convert(input_path)
 
-        data = response.json()
-        if "markdown" in data:
-            return data["markdown"]
-        if "content" in data:
-            return data["content"]
-        raise MinerUError(
-            "MinerU HTTP response did not contain a 'markdown' or 'content' field."
-        )
+    # ------------------------------------------------------------------
+    # Warm worker pool integration
+    # ------------------------------------------------------------------
+    def _convert_via_worker(self, input_path: Path) -> str:
+        assert self.worker_pool is not None
+        try:
+            return self.worker_pool.convert(input_path)
+        except MinerUWorkerError as exc:
+            raise MinerUError(f"MinerU worker conversion failed: {exc}") from exc
 
     # ------------------------------------------------------------------
     # Local CLI integration
@@ -86,50 +649,65 @@ class MinerUClient:
         return bool(self.binary_path and self.binary_path.exists())
 
     def _convert_via_cli(self, input_path: Path) -> str:
-        assert self.binary_path is not None
         with tempfile.TemporaryDirectory() as tmpdir:
             output_path = Path(tmpdir) / "output.json"
-            command = [
-                str(self.binary_path),
-                "convert",
-                str(input_path),
-                "--output",
-                str(output_path),
-                "--format",
-                "markdown",
-            ]
             process = subprocess.run(
-                command,
+                self.cli_command(input_path, output_path),
                 check=False,
                 capture_output=True,
                 text=True,
             )
-            if process.returncode != 0:
-                raise MinerUError(
-                    "MinerU CLI failed with code {code}: {stderr}".format(
-                        code=process.returncode, stderr=process.stderr.strip()
-                    )
-                )
-            if not output_path.exists():
-                raise MinerUError(
-                    "MinerU CLI conversion succeeded but no output file was produced."
+            return self.read_cli_output(output_path, process.returncode, process.stderr)
+
+    def cli_command(self, input_path: Path, output_path: Path) -> List[str]:
+        assert self.binary_path is not None
+        return [
+            str(self.binary_path),
+            "convert",
+            str(input_path),
+            "--output",
+            str(output_path),
+            "--format",
+            "markdown",
+        ]
+
+    @staticmethod
+    def read_cli_output(output_path: Path, returncode: int, stderr: str) -> str:
+        """Markdown written by a finished CLI run, or a :class:`MinerUError`."""
+        if returncode != 0:
+            raise MinerUError(
+                "MinerU CLI failed with code {code}: {stderr}".format(
+                    code=returncode, stderr=stderr.strip()
                 )
-            content = json.loads(output_path.read_text(encoding="utf-8"))
-            if isinstance(content, dict) and "markdown" in content:
-                return content["markdown"]
-            if isinstance(content, str):
-                return content
-            raise MinerUError("Unexpected MinerU CLI output structure")
+            )
+        if not output_path.exists():
+            raise MinerUError(
+                "MinerU CLI conversion succeeded but no output file was produced."
+            )
+        content = json.loads(output_path.read_text(encoding="utf-8"))
+        if isinstance(content, dict) and "markdown" in content:
+            return content["markdown"]
+        if isinstance(content, str):
+            return content
+        raise MinerUError("Unexpected MinerU CLI output structure")
 
     # ------------------------------------------------------------------
     # Lightweight fallback extractors
     # ------------------------------------------------------------------
     def _fallback_extract(self, input_path: Path) -> str:
+        return "\n\n".join(self._fallback_blocks(input_path))
+
+    def _fallback_blocks(self, input_path: Path) -> Iterator[str]:
+        """Yield the fallback extraction as non-empty Markdown blocks, in order.
+
+        Formats are checked before the first block is produced, so a
+        generator that starts yielding has picked a working extractor.
+        """
         suffix = input_path.suffix.lower()
         if suffix == ".pdf":
-            return self._extract_pdf(input_path)
+            return self._iter_pdf(input_path)
         if suffix == ".docx":
-            return self._extract_docx(input_path)
+            return self._iter_docx(input_path)
         if suffix == ".doc":
             raise MinerUError(
                 "Legacy .doc files require MinerU integration; install MinerU to enable support."
@@ -138,21 +716,204 @@ class MinerUClient:
             f"Unsupported input format '{suffix}'. Provide a PDF or Word document."
         )
 
+    def _extract_pdf(self, input_path: Path) -> str:
+        return "\n\n".join(self._iter_pdf(input_path))
+
+    @classmethod
+    def _extract_docx(cls, input_path: Path) -> str:
+        return "\n\n".join(cls._iter_docx(input_path))
+
+    def _iter_pdf(self, input_path: Path) -> Iterator[str]:
+        """Extract text page range by page range, in parallel for long PDFs.
+
+        Pages are yielded in order, each prefixed by a ``<!-- page N -->``
+        marker that survives into the HTML as a comment. PDFs shorter than
+        ``pdf_parallel_min_pages`` are extracted in this process; longer
+        ones go to the shared pool, with only a few ranges per worker
+        extracted ahead of the consumer.
+        """
+        try:
+            page_count = _pdf_page_count(input_path)
+        except Exception as exc:  # pragma: no cover - pdfminer raises many subclasses
+            raise MinerUError(f"Fallback PDF extraction failed: {exc}") from exc
+        step = self.pdf_pages_per_chunk
+        ranges = [
+            (str(input_path), start, min(start + step, page_count))
+            for start in range(0, page_count, step)
+        ]
+        workers = min(self.pdf_workers, len(ranges))
+        if page_count < self.pdf_parallel_min_pages:
+            workers = 1
+        number = 0
+        for batch in self._pdf_batches(ranges, workers):
+            for text in batch:
+                number += 1
+                text = text.strip()
+                if text:
+                    yield f"<!-- page {number} -->\n\n{text}"
+
     @staticmethod
-    def _extract_pdf(input_path: Path) -> str:
+    def _pdf_batches(
+        ranges: List[Tuple[str, int, int]], workers: int
+    ) -> Iterator[List[str]]:
+        pending: Deque[Future] = deque()
         try:
-            text = extract_text(str(input_path))
+            if workers <= 1:
+                for page_range in ranges:
+                    yield _extract_pdf_pages(*page_range)
+                return
+            executor = shared_pdf_pool(workers)
+            try:
+                for page_range in ranges:
+                    pending.append(executor.submit(_extract_pdf_pages, *page_range))
+                    if len(pending) > 2 * workers:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            except BrokenExecutor:
+                _discard_pdf_pool(executor)
+                raise
         except Exception as exc:  # pragma: no cover - pdfminer raises many subclasses
             raise MinerUError(f"Fallback PDF extraction failed: {exc}") from exc
-        return text.strip()
+        finally:
+            # Ranges a stopped consumer no longer needs must not hold the pool.
+            for future in pending:
+                future.cancel()
 
     @staticmethod
-    def _extract_docx(input_path: Path) -> str:
+    def _iter_docx(input_path: Path) -> Iterator[str]:
+        from lxml import etree
+
+        from .docx_extractor import DocxMarkdownExtractor
+
         try:
-            document = Document(str(input_path))
-        except Exception as exc:  # pragma: no cover - python-docx errors depend on file
-            raise MinerUError(f"Fallback DOCX extraction failed: {exc}") from exc
-        parts = []
-        for paragraph in document.paragraphs:
-            parts.append(paragraph.text.strip())
-        return "\n\n".join(part for part in parts if part)
+            for block in DocxMarkdownExtractor(input_path).blocks():
+                if block:
+                    yield block
+        except (zipfile.BadZipFile, KeyError, etree.XMLSyntaxError) as exc:
+            raise MinerUError(f"Fallback DOCX extraction failed: {exc!r}") from exc
+
+
+class AsyncMinerUClient:
+    """Asyncio front end to a :class:`MinerUClient` and its backends.
+
+    MinerU replicas are called on an ``httpx.AsyncClient`` and the CLI runs
+    as an asyncio subprocess, so waiting on them holds no thread. Warm
+    workers, the in-process extractors and cache I/O run in worker threads.
+    Backends are tried in the same order and cached under the same keys as
+    the wrapped client's.
+    """
+
+    def __init__(
+        self,
+        client: Optional[MinerUClient] = None,
+        http_pool: Optional[AsyncMinerUHttpPool] = None,
+    ) -> None:
+        self.client = client or MinerUClient()
+        if http_pool is None and self.client.api_urls:
+            http_pool = AsyncMinerUHttpPool(
+                self.client.api_urls,
+                api_key=self.client.api_key,
+                timeout=SETTINGS.mineru_http_timeout,
+                max_attempts=SETTINGS.mineru_http_max_attempts,
+                backoff_seconds=SETTINGS.mineru_http_backoff_seconds,
+            )
+        self.http_pool = http_pool
+
+    async def aclose(self) -> None:
+        """Close the async pool and the wrapped client's connection pool."""
+        if self.http_pool is not None:
+            await self.http_pool.aclose()
+        self.client.close()
+
+    async def check_health(self) -> Dict[str, bool]:
+        """Probe the replicas of both the async and the wrapped client's pool."""
+        results: Dict[str, bool] = {}
+        if self.client.http_pool is not None:
+            results.update(await asyncio.to_thread(self.client.http_pool.check_health))
+        if self.http_pool is not None:
+            results.update(await self.http_pool.check_health())
+        return results
+
+    async def warm(self) -> None:
+        """Connect to every replica and start warm workers ahead of use."""
+        steps = []
+        if self.http_pool is not None:
+            steps.append(self.http_pool.check_health())
+        if self.client.http_pool is not None:
+            steps.append(asyncio.to_thread(self.client.http_pool.check_health))
+        if self.client.worker_pool is not None:
+            steps.append(asyncio.to_thread(self.client.worker_pool.warm))
+        await asyncio.gather(*steps)
+
+    def _backends(self) -> List[Tuple[str, Callable[[Path], Awaitable[str]]]]:
+        backends: List[Tuple[str, Callable[[Path], Awaitable[str]]]] = []
+        for identity, convert in self.client._backends():
+            kind = identity.split(":", 1)[0]
+            if kind == "http" and self.http_pool is not None:
+                backends.append((identity, self.http_pool.convert))
+            elif kind == "cli":
+                backends.append((identity, self._convert_via_cli))
+            else:
+                backends.append((identity, self._in_thread(convert)))
+        return backends
+
+    @staticmethod
+    def _in_thread(
+        convert: Callable[[Path], str]
+    ) -> Callable[[Path], Awaitable[str]]:
+        async def run(input_path: Path) -> str:
+            return await asyncio.to_thread(convert, input_path)
+
+        return run
+
+    async def convert_to_markdown(
+        self, input_path: Path, digest: Optional[str] = None
+    ) -> str:
+        """Return Markdown for ``input_path`` like the synchronous client does."""
+        input_path = input_path.expanduser().resolve()
+        if not input_path.exists():
+            raise FileNotFoundError(f"Document does not exist: {input_path}")
+
+        backends = self._backends()
+        cache = self.client.cache
+        if cache and not digest:
+            digest = await asyncio.to_thread(file_digest, input_path)
+
+        errors: List[str] = []
+        for identity, convert in backends:
+            cached = await asyncio.to_thread(self.client._cached, digest, identity)
+            if cached is not None:
+                return cached
+            try:
+                markdown = await convert(input_path)
+            except MinerUError as exc:
+                errors.append(str(exc))
+                continue
+            BACKEND_SELECTIONS.inc(
+                component="extraction", backend=identity.split(":", 1)[0]
+            )
+            if cache and digest:
+                await asyncio.to_thread(cache.put, digest, identity, markdown)
+            return markdown
+        raise MinerUError(" | ".join(errors))
+
+    async def _convert_via_cli(self, input_path: Path) -> str:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output_path = Path(tmpdir) / "output.json"
+            process = await asyncio.create_subprocess_exec(
+                *self.client.cli_command(input_path, output_path),
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                _, stderr = await process.communicate()
+            except asyncio.CancelledError:
+                process.kill()
+                await process.wait()
+                raise
+            return self.client.read_cli_output(
+                output_path,
+                process.returncode or 0,
+                stderr.decode("utf-8", errors="replace"),
+            )
@@ -0,0 +1,390 @@
+"""Long-lived MinerU worker processes.
+
+Starting MinerU means importing its stack and loading layout and OCR models,
+which can take far longer than parsing a document. A worker started with
+``python -m ai_doc_to_epub.mineru_worker`` loads the converter once and then
+serves jobs over stdin/stdout, one JSON object per line:
+
+* the worker announces ``{"event": "ready", "pid": ...}`` once loaded;
+* ``{"id": 1, "op": "convert", "path": "/abs/file.pdf"}`` is answered with
+  ``{"id": 1, "ok": true, "markdown": "...", "rss": ...}`` or
+  ``{"id": 1, "ok": false, "error": "..."}``;
+* ``{"id": 2, "op": "ping"}`` is answered with ``{"id": 2, "ok": true, ...}``;
+* ``{"op": "shutdown"}`` exits.
+
+``rss`` is the worker's resident memory in bytes. :class:`MinerUWorkerPool`
+runs a fixed number of these processes for :class:`~.mineru_client.MinerUClient`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import atexit
+import importlib
+import itertools
+import json
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .config import SETTINGS
+
+DEFAULT_CONVERTER = "ai_doc_to_epub.mineru_worker:mineru_convert"
+
+
+class MinerUWorkerError(RuntimeError):
+    """A worker failed to start, crashed, timed out or rejected a job."""
+
+
+# ----------------------------------------------------------------------
+# Worker process side
+# ----------------------------------------------------------------------
+def mineru_convert(input_path: str, lang: Optional[str] = None) -> str:
+    """Convert one document with MinerU's Python API (MinerU 2.x).
+
+    ``lang`` is MinerU's OCR language code, ``MINERU_LANG`` by default.
+    """
+    from mineru.cli.common import do_parse, read_fn
+
+    path = Path(input_path)
+    with tempfile.TemporaryDirectory() as output_dir:
+        do_parse(
+            output_dir, [path.stem], [read_fn(path)], [lang or SETTINGS.mineru_lang]
+        )
+        outputs = sorted(Path(output_dir).rglob(f"{path.stem}.md"))
+        if not outputs:
+            raise RuntimeError("MinerU produced no Markdown output")
+        return outputs[0].read_text(encoding="utf-8")
+
+
+def _resident_bytes() -> int:
+    try:
+        with open("/proc/self/statm", encoding="ascii") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        import resource
+
+        # Peak rather than current usage, which still catches growth.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _load_converter(spec: str) -> Callable[[str], str]:
+    module_name, _, attribute = spec.partition(":")
+    converter = getattr(importlib.import_module(module_name), attribute)
+    if not callable(converter):
+        raise TypeError(f"{spec} is not callable")
+    return converter
+
+
+def serve(converter: Callable[[str], str], stdin, stdout) -> None:
+    def reply(message: Dict[str, Any]) -> None:
+        stdout.write(json.dumps(message) + "\n")
+        stdout.flush()
+
+    reply({"event": "ready", "pid": os.getpid()})
+    for line in stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        op = request.get("op")
+        if op == "shutdown":
+            return
+        response: Dict[str, Any] = {"id": request.get("id"), "ok": True}
+        if op == "convert":
+            try:
+                response["markdown"] = converter(request["path"])
+            except Exception as exc:  # reported to the pool, worker stays up
+                response = {"id": request.get("id"), "ok": False, "error": repr(exc)}
+        elif op != "ping":
+            response = {"id": request.get("id"), "ok": False, "error": f"bad op {op}"}
+        response["rss"] = _resident_bytes()
+        reply(response)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve MinerU conversions")
+    parser.add_argument(
+        "--converter",
+        default=DEFAULT_CONVERTER,
+        help="module:callable taking a file path and returning Markdown",
+    )
+    args = parser.parse_args(argv)
+    # Converters and the libraries they load may print; keep the protocol
+    # channel for JSON only by pointing file descriptor 1 at stderr.
+    protocol = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    converter = _load_converter(args.converter)
+    serve(converter, sys.stdin, protocol)
+
+
+# ----------------------------------------------------------------------
+# Pool side
+# ----------------------------------------------------------------------
+class MinerUWorker:
+    """Handle on one worker process; used by one job at a time."""
+
+    def __init__(self, command: Sequence[str], startup_timeout: float) -> None:
+        self.command = list(command)
+        self.jobs = 0
+        self.rss = 0
+        self.last_used = time.monotonic()
+        self._ids = itertools.count(1)
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self.process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=None,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        threading.Thread(target=self._pump, daemon=True).start()
+        ready = self._read(startup_timeout)
+        if ready.get("event") != "ready":
+            self.kill()
+            raise MinerUWorkerError(f"Unexpected worker greeting: {ready}")
+
+    def _pump(self) -> None:
+        assert self.process.stdout is not None
+        for line in self.process.stdout:
+            self._lines.put(line)
+        self._lines.put(None)
+
+    def _read(self, timeout: float) -> Dict[str, Any]:
+        try:
+            line = self._lines.get(timeout=timeout)
+        except queue.Empty:
+            self.kill()
+            raise MinerUWorkerError(f"MinerU worker timed out after {timeout:g}s")
+        if line is None:
+            code = self.process.wait()
+            raise MinerUWorkerError(f"MinerU worker exited with code {code}")
+        try:
+            message = json.loads(line)
+        except ValueError:
+            message = None
+        if not isinstance(message, dict):
+            # Something other than the protocol reached stdout; the stream
+            # can no longer be trusted to line up with requests.
+            self.kill()
+            raise MinerUWorkerError(
+                f"MinerU worker sent a malformed reply: {line[:80]!r}"
+            )
+        return message
+
+    def request(self, payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        assert self.process.stdin is not None
+        request_id = next(self._ids)
+        try:
+            self.process.stdin.write(json.dumps({"id": request_id, **payload}) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as exc:
+            self.kill()
+            raise MinerUWorkerError(f"MinerU worker is gone: {exc}") from exc
+        response = self._read(timeout)
+        if response.get("id") != request_id:
+            self.kill()
+            raise MinerUWorkerError("MinerU worker answered out of order")
+        self.rss = int(response.get("rss") or 0)
+        self.last_used = time.monotonic()
+        return response
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def close(self, timeout: float = 5.0) -> None:
+        if self.alive:
+            try:
+                assert self.process.stdin is not None
+                self.process.stdin.write(json.dumps({"op": "shutdown"}) + "\n")
+                self.process.stdin.close()
+                self.process.wait(timeout=timeout)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+        self.kill()
+
+    def kill(self) -> None:
+        if self.alive:
+            self.process.kill()
+            self.process.wait()
+
+
+class MinerUWorkerPool:
+    """Fixed-size pool of warm MinerU worker processes.
+
+    At most ``size`` documents are converted at once; further callers wait
+    for a free worker. Workers start on first use (or on :meth:`warm`) and
+    are replaced after ``max_jobs`` conversions, when their resident memory
+    exceeds ``max_rss_bytes``, when a job times out, or when they crash.
+    A worker idle for longer than ``health_interval`` seconds is pinged
+    before it is given a job.
+    """
+
+    def __init__(
+        self,
+        command: Sequence[str],
+        size: int = 1,
+        max_jobs: int = 100,
+        max_rss_bytes: int = 0,
+        job_timeout: float = 600.0,
+        startup_timeout: float = 300.0,
+        health_interval: float = 30.0,
+    ) -> None:
+        if not command:
+            raise ValueError("MinerUWorkerPool needs a worker command")
+        self.command = list(command)
+        self.size = max(1, size)
+        self.max_jobs = max_jobs
+        self.max_rss_bytes = max_rss_bytes
+        self.job_timeout = job_timeout
+        self.startup_timeout = startup_timeout
+        self.health_interval = health_interval
+        self.recycled = 0
+        self._idle: List[MinerUWorker] = []
+        self._busy = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    @classmethod
+    def from_settings(cls) -> "MinerUWorkerPool":
+        return cls(
+            SETTINGS.mineru_worker_command,
+            size=SETTINGS.mineru_workers,
+            max_jobs=SETTINGS.mineru_worker_max_jobs,
+            max_rss_bytes=SETTINGS.mineru_worker_max_rss_mb * 1024 * 1024,
+            job_timeout=SETTINGS.mineru_worker_timeout,
+        )
+
+    def identity(self) -> str:
+        return " ".join(self.command)
+
+    def _checkout(self) -> Optional[MinerUWorker]:
+        """Reserve a slot; returns an idle worker, or ``None`` to start one."""
+        with self._condition:
+            while not self._idle and self._busy >= self.size:
+                if self._closed:
+                    raise MinerUWorkerError("MinerU worker pool is closed")
+                self._condition.wait()
+            if self._closed:
+                raise MinerUWorkerError("MinerU worker pool is closed")
+            self._busy += 1
+            return self._idle.pop() if self._idle else None
+
+    def _checkin(self, worker: Optional[MinerUWorker]) -> None:
+        retire = worker is not None and (
+            not worker.alive
+            or (self.max_jobs and worker.jobs >= self.max_jobs)
+            or (self.max_rss_bytes and worker.rss > self.max_rss_bytes)
+        )
+        with self._condition:
+            self._busy -= 1
+            if worker is not None and not retire and not self._closed:
+                self._idle.append(worker)
+                worker = None
+            self._condition.notify()
+        if worker is not None:
+            self.recycled += 1
+            worker.close()
+
+    def _healthy(self, worker: MinerUWorker) -> bool:
+        if not worker.alive:
+            return False
+        if time.monotonic() - worker.last_used < self.health_interval:
+            return True
+        try:
+            return bool(worker.request({"op": "ping"}, timeout=10.0).get("ok"))
+        except MinerUWorkerError:
+            return False
+
+    def _start(self) -> MinerUWorker:
+        return MinerUWorker(self.command, self.startup_timeout)
+
+    def convert(self, input_path: Path) -> str:
+        worker = self._checkout()
+        try:
+            if worker is not None and not self._healthy(worker):
+                worker.kill()
+                self.recycled += 1
+                worker = None
+            if worker is None:
+                worker = self._start()
+            response = worker.request(
+                {"op": "convert", "path": str(input_path)}, self.job_timeout
+            )
+            worker.jobs += 1
+        finally:
+            self._checkin(worker)
+        if not response.get("ok"):
+            raise MinerUWorkerError(response.get("error") or "conversion failed")
+        return response["markdown"]
+
+    def warm(self) -> None:
+        """Start every worker now instead of on first use."""
+        workers: List[MinerUWorker] = []
+        try:
+            for _ in range(self.size):
+                worker = self._checkout()
+                try:
+                    workers.append(worker or self._start())
+                except BaseException:
+                    self._checkin(None)
+                    raise
+        finally:
+            for worker in workers:
+                self._checkin(worker)
+
+    def check_health(self) -> List[bool]:
+        """Ping idle workers, dropping any that do not answer."""
+        with self._condition:
+            workers, self._idle = self._idle, []
+            self._busy += len(workers)
+        results = []
+        for worker in workers:
+            worker.last_used = 0.0
+            healthy = self._healthy(worker)
+            results.append(healthy)
+            if not healthy:
+                worker.kill()
+            self._checkin(worker)
+        return results
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            workers, self._idle = self._idle, []
+            self._condition.notify_all()
+        for worker in workers:
+            worker.close()
+
+
+_shared_pool: Optional[MinerUWorkerPool] = None
+_shared_lock = threading.Lock()
+
+
+def shared_worker_pool() -> Optional[MinerUWorkerPool]:
+    """Process-wide pool from ``MINERU_WORKER_COMMAND``, or ``None`` if unset.
+
+    Every :class:`~.mineru_client.MinerUClient` in the process shares it, so
+    the worker count is a process-wide concurrency limit.
+    """
+    global _shared_pool
+    if not SETTINGS.mineru_worker_command:
+        return None
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = MinerUWorkerPool.from_settings()
+            atexit.register(_shared_pool.close)
+        return _shared_pool
+
+
+if __name__ == "__main__":
+    main()
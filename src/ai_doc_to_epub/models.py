@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -24,6 +24,34 @@ class ConversionRequest(BaseModel):
             "Disable remote LLM usage and rely on deterministic local formatting."
         ),
     )
+    incremental: bool = Field(
+        default=False,
+        description=(
+            "Re-enhance only chapters whose Markdown changed since the previous "
+            "build of the same title, reusing the rest."
+        ),
+    )
+    streaming: bool = Field(
+        default=False,
+        description=(
+            "Extract, enhance and write chapter by chapter so memory does not "
+            "grow with document length. Ignored for incremental builds."
+        ),
+    )
+    deadline_seconds: Optional[float] = Field(
+        default=None,
+        gt=0,
+        description=(
+            "Latency budget for the whole conversion; chapters the LLM cannot "
+            "finish in time are rendered by the local formatter instead."
+        ),
+    )
+
+
+class DegradedSection(BaseModel):
+    index: int = Field(..., description="Position of the chapter in the document")
+    title: Optional[str] = None
+    reason: str = Field(..., description="deadline, predicted or error")
 
 
 class ConversionResult(BaseModel):
@@ -33,6 +61,31 @@ class ConversionResult(BaseModel):
     output_path: Path
     created_at: datetime
     file_size: int
+    timings: Dict[str, float] = Field(
+        default_factory=dict, description="Seconds spent in each pipeline stage"
+    )
+    enhanced_sections: Optional[int] = Field(
+        default=None, description="Chapters sent for enhancement (incremental mode)"
+    )
+    reused_sections: Optional[int] = Field(
+        default=None, description="Chapters reused from the previous build"
+    )
+    degraded_sections: List[DegradedSection] = Field(
+        default_factory=list,
+        description="Chapters rendered by the local formatter to meet the deadline",
+    )
 
     class Config:
         arbitrary_types_allowed = True
+
+
+class JobStatus(BaseModel):
+    id: str
+    state: str = Field(..., description="queued, running, succeeded or failed")
+    stage: Optional[str] = Field(
+        default=None, description="Pipeline stage currently being executed"
+    )
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,202 @@
+"""Content-addressed storage and byte-range helpers for finished EPUBs."""
+
+from __future__ import annotations
+
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .cache import file_digest
+from .config import SETTINGS
+
+_RANGE_RE = re.compile(r"^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$", re.IGNORECASE)
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# How often :meth:`OutputStore.put` sweeps for expired books and staging dirs.
+SWEEP_INTERVAL_SECONDS = 15 * 60
+
+
+class RangeNotSatisfiable(ValueError):
+    """Raised for a well-formed byte range that lies outside the file."""
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Return the inclusive ``(first, last)`` byte positions a Range header asks for.
+
+    ``None`` means the whole file should be sent: no header, a header this
+    parser does not understand, or several ranges (which servers may ignore).
+    """
+    if not header or "," in header:
+        return None
+    match = _RANGE_RE.match(header)
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # "bytes=-N" asks for the final N bytes.
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    return start, end
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Whether an ``If-None-Match``/``If-Range`` value names ``etag``."""
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+@dataclass
+class StoredOutput:
+    digest: str
+    path: Path
+    size: int
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.digest}"'
+
+
+class OutputStore:
+    """Finished EPUBs stored under the SHA-256 of their content.
+
+    Conversions write into a private staging directory (see
+    :meth:`staging_path`), so books that share a title never overwrite each
+    other, and :meth:`put` moves the result to ``<root>/<aa>/<digest>.epub``.
+    The digest gives each book a stable ETag and download URL; it does not
+    deduplicate conversions, because every EPUB embeds a fresh identifier,
+    build time and chapter file names. Repeated uploads are shared while in
+    flight (see :class:`~ai_doc_to_epub.singleflight.SingleFlight`) and
+    otherwise stored once per conversion.
+    Reads bump an entry's mtime; :meth:`evict` removes entries unused for
+    ``max_age_seconds`` and then the least recently used ones until the
+    store fits in ``max_bytes``. :meth:`put` runs it when the size tracked
+    since the last scan passes the budget, and otherwise at most every
+    :data:`SWEEP_INTERVAL_SECONDS`.
+    """
+
+    suffix = ".epub"
+
+    def __init__(self, root: Path, max_bytes: int, max_age_seconds: float) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.staging_root = root / "staging"
+        self.staging_root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Bytes stored as of the last scan plus what this process added since.
+        self._bytes: Optional[int] = None
+        self._next_sweep = 0.0
+
+    @classmethod
+    def from_settings(cls) -> "OutputStore":
+        assert SETTINGS.output_store_dir is not None
+        return cls(
+            SETTINGS.output_store_dir,
+            SETTINGS.output_store_max_bytes,
+            SETTINGS.output_store_max_age_seconds,
+        )
+
+    def _path_for(self, digest: str) -> Path:
+        return self.root / digest[:2] / f"{digest}{self.suffix}"
+
+    def staging_path(self, filename: str) -> Path:
+        """Return a fresh path under which one conversion may write its book."""
+        directory = self.staging_root / uuid.uuid4().hex
+        directory.mkdir(parents=True)
+        return directory / filename
+
+    def discard(self, path: Path) -> None:
+        """Remove the staging directory of a book that will not be stored."""
+        if path.parent.parent == self.staging_root:
+            shutil.rmtree(path.parent, ignore_errors=True)
+
+    def put(self, path: Path) -> StoredOutput:
+        """Move a finished book into the store and return its entry."""
+        digest = file_digest(path)
+        target = self._path_for(digest)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target.exists():
+            path.unlink()
+            os.utime(target)
+            added = 0
+        else:
+            os.replace(path, target)
+            added = target.stat().st_size
+        self.discard(path)
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes += added
+            due = (
+                self._bytes is None
+                or self._bytes > self.max_bytes
+                or time.monotonic() >= self._next_sweep
+            )
+        if due:
+            self.evict(keep=target)
+        return StoredOutput(digest=digest, path=target, size=target.stat().st_size)
+
+    def get(self, digest: str) -> Optional[StoredOutput]:
+        if not _DIGEST_RE.match(digest):
+            return None
+        path = self._path_for(digest)
+        try:
+            os.utime(path)
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return None
+        return StoredOutput(digest=digest, path=path, size=size)
+
+    def evict(self, keep: Optional[Path] = None) -> int:
+        """Drop expired entries, then least recently used ones over budget."""
+        cutoff = time.time() - self.max_age_seconds
+        entries: List[Tuple[float, int, Path]] = []
+        total = 0
+        removed = 0
+        for path in self.root.glob(f"*/*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if path != keep and stat.st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                removed += 1
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        # Staging directories left behind by crashed conversions.
+        for directory in self.staging_root.iterdir():
+            try:
+                if directory.stat().st_mtime < cutoff:
+                    shutil.rmtree(directory, ignore_errors=True)
+            except FileNotFoundError:
+                continue
+        with self._lock:
+            self._bytes = total
+            self._next_sweep = time.monotonic() + SWEEP_INTERVAL_SECONDS
+        return removed
@@ -1,27 +1,110 @@
 from __future__ import annotations
 
-import tempfile
-from dataclasses import dataclass
+import asyncio
+import time
+from concurrent.futures import Executor
+from dataclasses import dataclass, replace
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 
-from bs4 import BeautifulSoup
+if TYPE_CHECKING:
+    from lxml.html import HtmlElement
 
+from .assets import ImageAssets, ImageOptions
 from .config import SETTINGS
-from .epub_builder import EpubBuilder, EpubMetadata
-from .llm_client import BaseLLMClient, build_llm_client
-from .mineru_client import MinerUClient
+from .chunking import MarkdownChunk, iter_chapters, split_chapters
+from .deadline import DeadlineLLMClient
+from .epub_builder import (
+    Chapter,
+    EpubBuilder,
+    EpubMetadata,
+    _sanitize_filename,
+    chapters_from_sections,
+)
+from .html_document import (
+    HtmlSource,
+    ensure_document,
+    strip_footnotes,
+    strip_navigation,
+)
+from .incremental import (
+    IncrementalStore,
+    build_fingerprint,
+    document_key,
+    section_digest,
+)
+from .llm_client import (
+    AsyncLLMClient,
+    BaseLLMClient,
+    LocalFormatterLLM,
+    ThreadedLLMClient,
+    build_async_llm_client,
+    build_llm_client,
+)
+from .metrics import (
+    BACKEND_SELECTIONS,
+    CONVERSIONS,
+    DOCUMENT_BYTES,
+    INCREMENTAL_SECTIONS,
+    StageTimer,
+)
+from .mineru_client import AsyncMinerUClient, MinerUClient
 from .models import ConversionRequest, ConversionResult
+from .output_store import OutputStore
+from .streaming import ordered_map, prefetch
+
+
+def output_filename(title: str) -> str:
+    """File name for a book titled ``title``, also used for downloads."""
+    safe_title = "-".join(part for part in title.split() if part)
+    return f"{safe_title or 'book'}.epub"
+
+
+def _llm_metadata(request: ConversionRequest) -> Dict[str, str]:
+    return {
+        "title": request.title,
+        "author": request.author,
+        "language": request.language,
+        "description": request.description or "",
+    }
+
+
+def _epub_metadata(request: ConversionRequest) -> EpubMetadata:
+    return EpubMetadata(
+        title=request.title,
+        author=request.author,
+        language=request.language or SETTINGS.default_language,
+        description=request.description,
+    )
 
 
 @dataclass
 class PipelineConfig:
     output_dir: Path = SETTINGS.workspace_dir
+    stream_enhancement: bool = SETTINGS.llm_stream
+    image_workers: int = SETTINGS.image_workers
+    # Image encoding pool; without one books share the process-wide pool.
+    image_executor: Optional[Executor] = None
+    stream_queue_size: int = SETTINGS.stream_queue_size
+    stream_chapter_tokens: int = SETTINGS.stream_chapter_tokens
 
 
 class ConversionPipeline:
-    """Coordinates document conversion into high-quality EPUB files."""
+    """Coordinates document conversion into high-quality EPUB files.
+
+    Books are written to ``<title>.epub`` in ``config.output_dir``, or, with
+    an ``output_store``, stored under their content hash.
+    """
 
     def __init__(
         self,
@@ -29,50 +112,162 @@ class ConversionPipeline:
         llm_client: Optional[BaseLLMClient] = None,
         epub_builder: Optional[EpubBuilder] = None,
         config: Optional[PipelineConfig] = None,
+        incremental_store: Optional[IncrementalStore] = None,
+        output_store: Optional[OutputStore] = None,
     ) -> None:
         self.mineru_client = mineru_client or MinerUClient()
         self.llm_client = llm_client or build_llm_client()
         self.epub_builder = epub_builder or EpubBuilder()
         self.config = config or PipelineConfig()
+        self.incremental_store = incremental_store or IncrementalStore.from_settings()
+        self.output_store = output_store
+        self.local_formatter = LocalFormatterLLM()
         self.config.output_dir.mkdir(parents=True, exist_ok=True)
 
-    def convert(self, file_path: Path, request: ConversionRequest) -> ConversionResult:
+    def close(self) -> None:
+        """Release the MinerU connection pool."""
+        self.mineru_client.close()
+
+    def convert(
+        self,
+        file_path: Path,
+        request: ConversionRequest,
+        progress: Optional[Callable[[str], None]] = None,
+        source_digest: Optional[str] = None,
+        output_name: Optional[str] = None,
+    ) -> ConversionResult:
+        """Convert ``file_path`` into an EPUB.
+
+        ``progress`` is called with the name of each stage as it starts:
+        ``extracting``, ``enhancing``, ``building`` and, with an output
+        store, ``storing``.
+        ``source_digest`` is the file's SHA-256 when already known, which
+        spares the extraction cache from hashing the file again. Per-stage
+        wall-clock seconds are returned in ``ConversionResult.timings`` and
+        published to the metrics registry. The book is named after
+        ``output_name`` when given, otherwise after the title; incremental
+        builds are matched by the same name.
+        """
+        report = progress or (lambda stage: None)
         file_path = file_path.expanduser().resolve()
         if not file_path.exists():
             raise FileNotFoundError(file_path)
 
-        markdown_text = self.mineru_client.convert_to_markdown(file_path)
+        timer = StageTimer()
+        # The builder writes next to the final path and renames into place,
+        # so the finished book is never copied.
+        destination = self._output_path(request, output_name)
+        result: Optional[ConversionResult] = None
+        try:
+            result = self._convert(
+                file_path,
+                request,
+                report,
+                source_digest,
+                timer,
+                destination,
+                output_name,
+            )
+        except Exception:
+            CONVERSIONS.inc(status="failed")
+            raise
+        finally:
+            timer.observe()
+            if result is None:
+                self._discard(destination)
+        CONVERSIONS.inc(status="succeeded")
+        DOCUMENT_BYTES.inc(file_path.stat().st_size, direction="input")
+        DOCUMENT_BYTES.inc(result.file_size, direction="output")
+        return result
+
+    def _convert(
+        self,
+        file_path: Path,
+        request: ConversionRequest,
+        report: Callable[[str], None],
+        source_digest: Optional[str],
+        timer: StageTimer,
+        destination: Path,
+        output_name: Optional[str],
+    ) -> ConversionResult:
+        started = time.monotonic()
+        streaming = request.streaming and not request.incremental
+        report("extracting")
+        markdown_text = ""
+        if not streaming:
+            with timer.stage("extraction"):
+                markdown_text = self.mineru_client.convert_to_markdown(
+                    file_path, digest=source_digest
+                )
         llm_client = self.llm_client
         if request.use_local_formatter:
-            llm_client = build_llm_client(use_local_formatter=True)
-
-        html = llm_client.enhance(
-            markdown_text,
-            metadata={
-                "title": request.title,
-                "author": request.author,
-                "language": request.language,
-                "description": request.description or "",
-            },
+            llm_client = self.local_formatter
+        BACKEND_SELECTIONS.inc(
+            component="enhancement",
+            backend="local" if isinstance(llm_client, LocalFormatterLLM) else "llm",
         )
-        if "<html" not in html.lower():
-            html = (
-                "<html><head><meta charset='utf-8'/></head>"
-                f"<body>{html}</body></html>"
+        deadline_client: Optional[DeadlineLLMClient] = None
+        if request.deadline_seconds and not isinstance(llm_client, LocalFormatterLLM):
+            # Extraction already spent part of the budget; keep a reserve for
+            # building the book after enhancement.
+            deadline_client = DeadlineLLMClient(
+                llm_client,
+                deadline_at=started
+                + request.deadline_seconds
+                - SETTINGS.deadline_reserve_seconds,
+                hedge_after=SETTINGS.llm_hedge_after_seconds,
             )
-        if not request.annotate:
-            html = self._strip_footnotes(html)
+            llm_client = deadline_client
+
+        report("enhancing")
+        llm_metadata = _llm_metadata(request)
+        metadata = _epub_metadata(request)
 
-        with tempfile.TemporaryDirectory() as tmpdir:
-            temp_epub_path = Path(tmpdir) / "book.epub"
-            metadata = EpubMetadata(
-                title=request.title,
-                author=request.author,
-                language=request.language or SETTINGS.default_language,
-                description=request.description,
+        enhanced: Optional[int] = None
+        reused: Optional[int] = None
+        if request.incremental:
+            chapters, enhanced, reused = self._incremental_chapters(
+                llm_client,
+                markdown_text,
+                llm_metadata,
+                request,
+                timer,
+                document_key(output_name or request.title),
+            )
+            report("building")
+            with timer.stage("writing"):
+                final_path = self._write_book(
+                    chapters, metadata, destination, file_path
+                )
+        elif streaming:
+            chapters = self._streamed_chapters(
+                llm_client,
+                file_path,
+                source_digest,
+                llm_metadata,
+                request,
+                report,
+                timer,
+            )
+            with timer.stage("writing"):
+                final_path = self._write_book(
+                    chapters, metadata, destination, file_path
+                )
+        elif self.config.stream_enhancement:
+            chapters = self._stream_chapters(
+                llm_client, markdown_text, llm_metadata, request, report, timer
+            )
+            with timer.stage("writing"):
+                final_path = self._write_book(
+                    chapters, metadata, destination, file_path
+                )
+        else:
+            with timer.stage("enhancement"):
+                html = llm_client.enhance(markdown_text, metadata=llm_metadata)
+            final_path = self._build_from_html(
+                html, request, destination, file_path, report, timer
             )
-            output_file = self.epub_builder.build(html, metadata, temp_epub_path)
-            final_path = self._finalize_output(output_file, request)
+        final_path, file_size = self._finalize(final_path, report, timer)
 
         return ConversionResult(
             title=request.title,
@@ -80,22 +275,369 @@ class ConversionPipeline:
             language=request.language,
             output_path=final_path,
             created_at=datetime.utcnow(),
-            file_size=final_path.stat().st_size,
+            file_size=file_size,
+            timings=dict(timer.timings),
+            enhanced_sections=enhanced,
+            reused_sections=reused,
+            degraded_sections=deadline_client.degraded if deadline_client else [],
+        )
+
+    def _build_from_html(
+        self,
+        html: HtmlSource,
+        request: ConversionRequest,
+        destination: Path,
+        source: Path,
+        report: Callable[[str], None],
+        timer: StageTimer,
+    ) -> Path:
+        # Parsed once here; footnote stripping, chapter splitting and
+        # XHTML emission all work on this tree.
+        with timer.stage("parsing"):
+            document = ensure_document(html)
+        if not request.annotate:
+            with timer.stage("footnotes"):
+                strip_footnotes(document)
+        report("building")
+        with timer.stage("splitting"):
+            chapters = list(chapters_from_sections([document]))
+        with timer.stage("writing"):
+            return self._write_book(
+                chapters, _epub_metadata(request), destination, source
+            )
+
+    def _finalize(
+        self, path: Path, report: Callable[[str], None], timer: StageTimer
+    ) -> Tuple[Path, int]:
+        """Move a written book into the output store; return its path and size.
+
+        Hashing and moving the book is timed as ``storing``; without an
+        output store the book is already in place.
+        """
+        if self.output_store is None:
+            return path, path.stat().st_size
+        report("storing")
+        with timer.stage("storing"):
+            stored = self.output_store.put(path)
+        return stored.path, stored.size
+
+    def _write_book(
+        self,
+        chapters: Iterable[Chapter],
+        metadata: EpubMetadata,
+        destination: Path,
+        source: Path,
+    ) -> Path:
+        # Images may live next to the source document (MinerU output) or in
+        # the media directory (extracted from DOCX); nothing else is embedded.
+        assert SETTINGS.media_dir is not None
+        options = ImageOptions()
+        if self.config.image_workers:
+            options.workers = self.config.image_workers
+        with ImageAssets(
+            base_dir=source.parent,
+            media_dir=SETTINGS.media_dir,
+            options=options,
+            executor=self.config.image_executor,
+        ) as assets:
+            return self.epub_builder.build_chapters(
+                chapters, metadata, destination, assets=assets
+            )
+
+    def _incremental_chapters(
+        self,
+        llm_client: BaseLLMClient,
+        markdown_text: str,
+        metadata: Dict[str, str],
+        request: ConversionRequest,
+        timer: StageTimer,
+        key: str,
+    ) -> Tuple[List[Chapter], int, int]:
+        """Rebuild chapters, re-enhancing only sections absent from the last build.
+
+        ``key`` identifies the document's previous build in the store.
+        Returns the chapters plus the number of enhanced and reused sections.
+        """
+        sections = split_chapters(markdown_text)
+        digests = [section_digest(section.text) for section in sections]
+        fingerprint = build_fingerprint(
+            llm_client.cache_identity(), metadata, request.annotate
+        )
+        with timer.stage("planning"):
+            rendered = self.incremental_store.load(key, fingerprint)
+        changed: Dict[str, int] = {}
+        for position, digest in enumerate(digests):
+            if digest not in rendered and digest not in changed:
+                changed[digest] = position
+
+        with timer.stage("enhancement"):
+            fragments = llm_client.enhance_sections(
+                [sections[position] for position in changed.values()], metadata
+            )
+        for digest, fragment in zip(changed, fragments):
+            with timer.stage("parsing"):
+                document = ensure_document(fragment)
+                # The EPUB navigation document replaces per-section TOCs.
+                strip_navigation(document)
+            if not request.annotate:
+                with timer.stage("footnotes"):
+                    strip_footnotes(document)
+            with timer.stage("splitting"):
+                rendered[digest] = list(chapters_from_sections([document]))
+        # Stand-ins rendered to meet a deadline must not be reused later.
+        transient = (
+            {digests[section.index] for section in llm_client.degraded}
+            if isinstance(llm_client, DeadlineLLMClient)
+            else set()
+        )
+        with timer.stage("planning"):
+            self.incremental_store.save(
+                key, fingerprint, digests, rendered, transient=transient
+            )
+
+        chapters: List[Chapter] = []
+        filenames = set()
+        for digest in digests:
+            for chapter in rendered[digest]:
+                if chapter.filename in filenames:
+                    # A section repeated verbatim still needs its own file.
+                    chapter = replace(
+                        chapter, filename=_sanitize_filename(chapter.title)
+                    )
+                filenames.add(chapter.filename)
+                chapters.append(chapter)
+        reused = len(digests) - len(changed)
+        INCREMENTAL_SECTIONS.inc(len(changed), outcome="enhanced")
+        INCREMENTAL_SECTIONS.inc(reused, outcome="reused")
+        return chapters, len(changed), reused
+
+    def _stream_chapters(
+        self,
+        llm_client: BaseLLMClient,
+        markdown_text: str,
+        metadata: Dict[str, str],
+        request: ConversionRequest,
+        report: Callable[[str], None],
+        timer: StageTimer,
+    ) -> Iterator[Chapter]:
+        # Each lazily pulled step is charged to its own stage, so streamed
+        # conversions report the same breakdown as buffered ones.
+        sections = timer.iterate(
+            llm_client.stream_sections(markdown_text, metadata), "enhancement"
+        )
+        documents = timer.iterate(map(ensure_document, sections), "parsing")
+        if not request.annotate:
+            documents = timer.iterate(
+                map(self._without_footnotes, documents), "footnotes"
+            )
+        chapters = timer.iterate(chapters_from_sections(documents), "splitting")
+        for count, chapter in enumerate(chapters, start=1):
+            report(f"building chapter {count}")
+            yield chapter
+
+    def _streamed_chapters(
+        self,
+        llm_client: BaseLLMClient,
+        file_path: Path,
+        source_digest: Optional[str],
+        metadata: Dict[str, str],
+        request: ConversionRequest,
+        report: Callable[[str], None],
+        timer: StageTimer,
+    ) -> Iterator[Chapter]:
+        """Extract, enhance and split the book as overlapping stages.
+
+        Extraction runs in a background thread and enhancement on up to
+        ``llm_max_concurrency`` chapters at once. Each stage hands its output
+        on through a buffer of ``stream_queue_size`` items and blocks when
+        that is full, so at most a few chapters are in memory at any time.
+        Chapters longer than ``stream_chapter_tokens`` are cut at page or
+        block boundaries, which bounds memory for books without headings.
+        """
+        size = self.config.stream_queue_size
+        blocks = self.mineru_client.iter_markdown(file_path, digest=source_digest)
+        sections = prefetch(
+            iter_chapters(blocks, self.config.stream_chapter_tokens),
+            size,
+            name="extraction",
         )
+        workers = (
+            1
+            if isinstance(llm_client, LocalFormatterLLM)
+            else SETTINGS.llm_max_concurrency
+        )
+
+        def enhance(section: MarkdownChunk) -> Tuple[MarkdownChunk, str]:
+            return section, llm_client.enhance_sections([section], metadata)[0]
+
+        fragments = prefetch(
+            ordered_map(enhance, sections, workers), size, name="enhancement"
+        )
+        # Extraction overlaps with enhancement; time spent waiting on either
+        # is charged to enhancement.
+        pieces = timer.iterate(fragments, "enhancement")
+        for count, (section, fragment) in enumerate(pieces, 1):
+            with timer.stage("parsing"):
+                document = ensure_document(fragment)
+                strip_navigation(document)
+            if not request.annotate:
+                with timer.stage("footnotes"):
+                    strip_footnotes(document)
+            # A piece cut from a long or untitled chapter has no <h1>.
+            title = section.title or (
+                f"Part {section.index + 1}" if section.index else "Introduction"
+            )
+            with timer.stage("splitting"):
+                chapters = list(chapters_from_sections([document], title))
+            report(f"building chapter {count}")
+            yield from chapters
 
     @staticmethod
-    def _strip_footnotes(html: str) -> str:
-        soup = BeautifulSoup(html, "html.parser")
-        for aside in soup.select("aside.footnote"):
-            aside.decompose()
-        for sup in soup.select("sup[id^='fnref']"):
-            sup.unwrap()
-        return str(soup)
-
-    def _finalize_output(self, temp_file: Path, request: ConversionRequest) -> Path:
-        safe_title = "-".join(part for part in request.title.split() if part)
-        output_filename = f"{safe_title or 'book'}.epub"
-        destination = self.config.output_dir / output_filename
+    def _without_footnotes(document: HtmlElement) -> HtmlElement:
+        strip_footnotes(document)
+        return document
+
+    def _output_path(
+        self, request: ConversionRequest, output_name: Optional[str] = None
+    ) -> Path:
+        filename = output_filename(output_name or request.title)
+        if self.output_store is not None:
+            return self.output_store.staging_path(filename)
+        destination = self.config.output_dir / filename
         destination.parent.mkdir(parents=True, exist_ok=True)
-        destination.write_bytes(temp_file.read_bytes())
         return destination
+
+    def _discard(self, destination: Path) -> None:
+        """Clean up after a conversion that failed before its book was stored."""
+        if self.output_store is not None:
+            self.output_store.discard(destination)
+
+
+class AsyncConversionPipeline:
+    """Asyncio conversion pipeline used by the web service.
+
+    Extraction and enhancement await :class:`AsyncMinerUClient` and an
+    :class:`AsyncLLMClient`, so a conversion waiting on MinerU or the LLM
+    holds no thread and one process can keep many of them in flight.
+    Parsing and writing the book are CPU-bound and run in a worker thread.
+
+    Incremental, streamed and deadline-bound conversions, and token
+    streaming (``LLM_STREAM``), are built around synchronous stages; those
+    requests run on ``pipeline`` in a worker thread.
+    """
+
+    def __init__(
+        self,
+        mineru_client: Optional[AsyncMinerUClient] = None,
+        llm_client: Optional[AsyncLLMClient] = None,
+        pipeline: Optional[ConversionPipeline] = None,
+    ) -> None:
+        self.pipeline = pipeline or ConversionPipeline()
+        self.mineru_client = mineru_client or AsyncMinerUClient(
+            self.pipeline.mineru_client
+        )
+        self.llm_client = llm_client or build_async_llm_client()
+        self._local_client = ThreadedLLMClient(self.pipeline.local_formatter)
+
+    async def warm(self) -> None:
+        """Open MinerU and LLM connections and start warm workers now."""
+        await asyncio.gather(self.mineru_client.warm(), self.llm_client.warm())
+
+    async def aclose(self) -> None:
+        await self.mineru_client.aclose()
+        await self.llm_client.aclose()
+
+    def _runs_synchronously(self, request: ConversionRequest) -> bool:
+        return bool(
+            request.incremental
+            or request.streaming
+            or request.deadline_seconds
+            or self.pipeline.config.stream_enhancement
+        )
+
+    async def convert(
+        self,
+        file_path: Path,
+        request: ConversionRequest,
+        progress: Optional[Callable[[str], None]] = None,
+        source_digest: Optional[str] = None,
+    ) -> ConversionResult:
+        """Convert ``file_path`` like :meth:`ConversionPipeline.convert` does."""
+        if self._runs_synchronously(request):
+            return await asyncio.to_thread(
+                self.pipeline.convert, file_path, request, progress, source_digest
+            )
+        report = progress or (lambda stage: None)
+        file_path = file_path.expanduser().resolve()
+        if not file_path.exists():
+            raise FileNotFoundError(file_path)
+
+        timer = StageTimer()
+        destination = self.pipeline._output_path(request)
+        result: Optional[ConversionResult] = None
+        try:
+            result = await self._convert(
+                file_path, request, report, source_digest, timer, destination
+            )
+        except Exception:
+            CONVERSIONS.inc(status="failed")
+            raise
+        finally:
+            timer.observe()
+            if result is None:
+                self.pipeline._discard(destination)
+        CONVERSIONS.inc(status="succeeded")
+        DOCUMENT_BYTES.inc(file_path.stat().st_size, direction="input")
+        DOCUMENT_BYTES.inc(result.file_size, direction="output")
+        return result
+
+    async def _convert(
+        self,
+        file_path: Path,
+        request: ConversionRequest,
+        report: Callable[[str], None],
+        source_digest: Optional[str],
+        timer: StageTimer,
+        destination: Path,
+    ) -> ConversionResult:
+        pipeline = self.pipeline
+        report("extracting")
+        with timer.stage("extraction"):
+            markdown_text = await self.mineru_client.convert_to_markdown(
+                file_path, digest=source_digest
+            )
+        llm_client = (
+            self._local_client if request.use_local_formatter else self.llm_client
+        )
+        local = isinstance(llm_client, ThreadedLLMClient) and llm_client.is_local
+        BACKEND_SELECTIONS.inc(
+            component="enhancement", backend="local" if local else "llm"
+        )
+
+        report("enhancing")
+        with timer.stage("enhancement"):
+            html = await llm_client.enhance(
+                markdown_text, metadata=_llm_metadata(request)
+            )
+        final_path = await asyncio.to_thread(
+            pipeline._build_from_html,
+            html,
+            request,
+            destination,
+            file_path,
+            report,
+            timer,
+        )
+        final_path, file_size = await asyncio.to_thread(
+            pipeline._finalize, final_path, report, timer
+        )
+
+        return ConversionResult(
+            title=request.title,
+            author=request.author,
+            language=request.language,
+            output_path=final_path,
+            created_at=datetime.utcnow(),
+            file_size=file_size,
+            timings=dict(timer.timings),
+        )
@@ -0,0 +1,154 @@
+"""Pipeline components shared by every request a service process handles."""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import time
+from concurrent.futures import Executor
+from typing import Dict, Optional
+
+from .assets import ImageOptions, discard_image_pool, shared_image_pool
+from .config import SETTINGS
+from .jobs import JobManager
+from .models import ConversionResult
+from .output_store import OutputStore
+from .pipeline import AsyncConversionPipeline, ConversionPipeline, PipelineConfig
+from .singleflight import SingleFlight
+
+# Imported lazily so the CLI starts quickly; a service loads them at startup
+# so its first request does not pay for the imports.
+PRELOADED_MODULES = (
+    "markdown",
+    "lxml.html",
+    "pdfminer.high_level",
+    "ai_doc_to_epub.docx_extractor",
+)
+
+# A slow or unreachable backend must not hold up startup for longer.
+WARMUP_TIMEOUT_SECONDS = 10.0
+
+
+def _preload() -> None:
+    for name in PRELOADED_MODULES:
+        importlib.import_module(name)
+
+
+class Services:
+    """Pipelines and clients created once per process by the app lifespan.
+
+    Requests and job workers share them instead of building their own: one
+    MinerU client with its connection pools and resolved CLI, one LLM client
+    per flavour, one local formatter, the output store and one image
+    encoding pool, so concurrent books share a bounded number of encoder
+    processes. All of them are safe to use concurrently. Each uvicorn
+    worker process runs the lifespan, and so builds its own instance after
+    the fork; nothing here is created at import time or shared between
+    processes.
+    """
+
+    def __init__(
+        self,
+        outputs: OutputStore,
+        pipeline: ConversionPipeline,
+        conversions: AsyncConversionPipeline,
+        jobs: JobManager,
+        image_pool: Optional[Executor] = None,
+    ) -> None:
+        self.outputs = outputs
+        self.pipeline = pipeline
+        self.conversions = conversions
+        self.jobs = jobs
+        self.image_pool = image_pool
+        # Identical uploads converted concurrently (client retries, several
+        # users sending the same file) share one pipeline run and its EPUB.
+        self.in_flight: SingleFlight[ConversionResult] = SingleFlight("convert")
+        self.draining = False
+        self._health_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls) -> "Services":
+        outputs = OutputStore.from_settings()
+        # Books encode on the process-wide image pool; held here to stop it
+        # on drain.
+        workers = ImageOptions().workers
+        images = shared_image_pool(workers) if workers > 1 else None
+        pipeline = ConversionPipeline(config=PipelineConfig(), output_store=outputs)
+        jobs = JobManager(
+            pipeline_factory=lambda: pipeline,
+            workers=SETTINGS.job_workers,
+            queue_size=SETTINGS.job_queue_size,
+            retention_seconds=SETTINGS.job_retention_seconds,
+        )
+        conversions = AsyncConversionPipeline(pipeline=pipeline)
+        return cls(outputs, pipeline, conversions, jobs, image_pool=images)
+
+    async def start(self) -> Dict[str, bool]:
+        """Start the job workers and replica health checks; warm up if enabled."""
+        self.jobs.start()
+        interval = SETTINGS.mineru_health_interval_seconds
+        if SETTINGS.has_mineru_remote and interval > 0:
+            self._health_task = asyncio.create_task(self._check_replicas(interval))
+        if not SETTINGS.service_warmup:
+            return {}
+        return await self.warm()
+
+    async def _check_replicas(self, interval: float) -> None:
+        """Probe MinerU replicas every ``interval`` seconds until cancelled.
+
+        Requests only eject a replica when they fail on it; the probe is
+        what re-admits one that has recovered, and ejects one that went
+        down between requests.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.wait_for(
+                    self.conversions.mineru_client.check_health(), interval
+                )
+            except Exception:  # a failed probe round must not stop the next
+                continue
+
+    async def warm(self) -> Dict[str, bool]:
+        """Load lazy imports and open connection pools before the first request.
+
+        Returns whether each step succeeded. A failed or timed-out step, such
+        as a replica that is still down, is not fatal: the first request
+        that needs it connects as usual.
+        """
+        steps = {
+            "imports": asyncio.to_thread(_preload),
+            "conversions": self.conversions.warm(),
+        }
+        results = await asyncio.gather(
+            *(
+                asyncio.wait_for(step, WARMUP_TIMEOUT_SECONDS)
+                for step in steps.values()
+            ),
+            return_exceptions=True,
+        )
+        return {
+            name: not isinstance(result, Exception)
+            for name, result in zip(steps, results)
+        }
+
+    async def drain(self, grace_seconds: float) -> None:
+        """Let running conversions and jobs finish, then close clients.
+
+        Runs from the lifespan shutdown, after uvicorn has stopped accepting
+        connections; ``POST /drain`` is what turns new requests away earlier.
+        Queued jobs that have not started fail instead of running, and
+        conversions still running after ``grace_seconds`` are abandoned.
+        """
+        self.draining = True
+        if self._health_task is not None:
+            self._health_task.cancel()
+        deadline = time.monotonic() + grace_seconds
+        await self.in_flight.wait(grace_seconds)
+        await asyncio.to_thread(
+            self.jobs.shutdown, True, max(deadline - time.monotonic(), 0.0)
+        )
+        await self.conversions.aclose()
+        self.pipeline.close()
+        if self.image_pool is not None:
+            discard_image_pool(self.image_pool)
@@ -0,0 +1,125 @@
+"""Coalesce identical conversions that are in flight at the same time."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Generic, Optional, Set, Tuple, TypeVar
+
+from .metrics import COALESCED_CONVERSIONS
+from .models import ConversionRequest
+
+T = TypeVar("T")
+
+
+def conversion_key(digest: str, request: ConversionRequest) -> str:
+    """Identify a conversion by source digest plus its normalised options.
+
+    Surrounding whitespace and the case of the language tag do not change
+    the book, so they do not split otherwise identical requests.
+    """
+    options = request.model_dump(mode="json")
+    for name, value in options.items():
+        if isinstance(value, str):
+            options[name] = " ".join(value.split())
+    options["language"] = options["language"].lower()
+    payload = json.dumps({"digest": digest, "options": options}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight(Generic[T]):
+    """Run one call per key at a time and share its outcome with every caller.
+
+    The first caller for a key starts the function; callers arriving while
+    it runs get the same future, and with it the same result or exception,
+    instead of starting their own. Once it finishes the key is forgotten, so
+    later calls run afresh. ``name`` labels the coalesced-calls counter.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        # Strong references keep running tasks from being garbage collected.
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                COALESCED_CONVERSIONS.inc(endpoint=self.name)
+                return future, False
+            future = Future()
+            future.set_running_or_notify_cancel()
+            self._calls[key] = future
+            return future, True
+
+    def _run(self, key: str, future: Future, func: Callable[[], T]) -> None:
+        try:
+            result = func()
+        except BaseException as exc:
+            self._forget(key)
+            future.set_exception(exc)
+        else:
+            self._forget(key)
+            future.set_result(result)
+
+    async def _run_async(
+        self, key: str, future: Future, func: Callable[[], Awaitable[T]]
+    ) -> None:
+        try:
+            result = await func()
+        except BaseException as exc:
+            self._forget(key)
+            future.set_exception(exc)
+        else:
+            self._forget(key)
+            future.set_result(result)
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def start(self, key: str, func: Callable[[], T]) -> Tuple[Future, bool]:
+        """Join the call for ``key``, running ``func`` in a new thread if none.
+
+        Returns the call's future and whether it was already running. The
+        future cannot be cancelled, so a caller that stops waiting (for
+        example a disconnected client) leaves the result to the others.
+        """
+        future, leader = self._join(key)
+        if leader:
+            threading.Thread(
+                target=self._run,
+                args=(key, future, func),
+                name=f"{self.name}-single-flight",
+                daemon=True,
+            ).start()
+        return future, not leader
+
+    def start_async(
+        self, key: str, func: Callable[[], Awaitable[T]]
+    ) -> Tuple[Future, bool]:
+        """Like :meth:`start`, but run ``func`` as a task on the running loop."""
+        future, leader = self._join(key)
+        if leader:
+            task = asyncio.get_running_loop().create_task(
+                self._run_async(key, future, func)
+            )
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return future, not leader
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for calls started by :meth:`start_async`; whether all finished."""
+        if not self._tasks:
+            return True
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        return not pending
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,100 @@
+"""Building blocks for the streaming conversion mode.
+
+Each stage of a streamed conversion is a generator. :func:`prefetch` runs a
+stage in a background thread and :func:`ordered_map` runs one concurrently;
+both hand results over through bounded buffers, so a fast stage blocks as
+soon as it is ``maxsize`` items ahead of the next one instead of holding
+the whole book in memory.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+def prefetch(items: Iterable[T], maxsize: int, name: str = "prefetch") -> Iterator[T]:
+    """Produce ``items`` in a background thread, at most ``maxsize`` ahead.
+
+    Exceptions raised by the producer are re-raised in the consumer. If the
+    consumer stops early the producer is told to stop at its next item.
+    """
+    buffer: "queue.Queue[object]" = queue.Queue(maxsize=max(1, maxsize))
+    stopped = threading.Event()
+
+    def offer(item: object) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not offer(item):
+                    return
+        except BaseException as exc:  # handed to the consumer
+            offer(_Failure(exc))
+        else:
+            offer(_DONE)
+        finally:
+            close = getattr(items, "close", None)
+            if stopped.is_set() and close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, name=name, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item  # type: ignore[misc]
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def ordered_map(
+    func: Callable[[T], R], items: Iterable[T], workers: int
+) -> Iterator[R]:
+    """Yield ``func(item)`` in input order with at most ``workers`` calls running.
+
+    Unlike :meth:`ThreadPoolExecutor.map` the input is consumed lazily: the
+    next item is only pulled once the oldest result has been handed on.
+    """
+    workers = max(1, workers)
+    if workers == 1:
+        for item in items:
+            yield func(item)
+        return
+    pending: Deque[Future] = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stream") as pool:
+        try:
+            for item in items:
+                pending.append(pool.submit(func, item))
+                if len(pending) >= workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
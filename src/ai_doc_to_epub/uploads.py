@@ -0,0 +1,212 @@
+"""Receive ``multipart/form-data`` uploads straight from the request stream."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterable, BinaryIO, Collection, Dict, Optional
+
+try:
+    from python_multipart.exceptions import MultipartParseError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # pragma: no cover - python-multipart < 0.0.13
+    from multipart.exceptions import MultipartParseError
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Room for the text fields and part headers around the file in a request.
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadRejected(Exception):
+    """The request body is not an acceptable upload; carries an HTTP status."""
+
+    def __init__(self, status_code: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class SpooledUpload:
+    path: Path
+    size: int
+    digest: str
+    filename: str
+    fields: Dict[str, str] = field(default_factory=dict)
+
+
+class _FormReceiver:
+    """Parser callbacks: text fields go to memory, the file part to disk.
+
+    The callbacks run on the event loop, so file data is only buffered here;
+    :func:`receive_upload` writes it out with :meth:`flush` in a thread.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        file_field: str,
+        suffixes: Collection[str],
+        max_bytes: int,
+    ) -> None:
+        self.directory = directory
+        self.file_field = file_field
+        self.suffixes = suffixes
+        self.max_bytes = max_bytes
+        self.fields: Dict[str, str] = {}
+        self.path: Optional[Path] = None
+        self.filename = ""
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self._form_bytes = 0
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+        self._headers: Dict[bytes, bytes] = {}
+        self._name = ""
+        self._value = bytearray()
+        self._handle: Optional[BinaryIO] = None
+        self._in_file = False
+        self.pending = bytearray()
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self._part_begin,
+            "on_header_field": self._header_field_data,
+            "on_header_value": self._header_value_data,
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+            "on_part_data": self._part_data,
+            "on_part_end": self._part_end,
+        }
+
+    def _part_begin(self) -> None:
+        self._headers = {}
+        self._value = bytearray()
+
+    def _header_field_data(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _header_value_data(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _header_end(self) -> None:
+        self._headers[bytes(self._header_field).lower()] = bytes(self._header_value)
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+
+    def _headers_finished(self) -> None:
+        _, options = parse_options_header(
+            self._headers.get(b"content-disposition", b"")
+        )
+        self._name = options.get(b"name", b"").decode("utf-8", "replace")
+        if self._name != self.file_field:
+            return
+        if self.path is not None:
+            raise UploadRejected(400, "Only one file may be uploaded.")
+        self.filename = options.get(b"filename", b"").decode("utf-8", "replace")
+        suffix = Path(self.filename).suffix.lower()
+        if suffix not in self.suffixes:
+            raise UploadRejected(400, "Only PDF and Word documents are supported.")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(suffix=suffix, dir=self.directory)
+        self.path = Path(temp_name)
+        self._handle = os.fdopen(fd, "wb")
+        self._in_file = True
+
+    def _part_data(self, data: bytes, start: int, end: int) -> None:
+        chunk = data[start:end]
+        if not self._in_file:
+            self._form_bytes += len(chunk)
+            if self._form_bytes > FORM_OVERHEAD_BYTES:
+                raise UploadRejected(413, "Form fields are too large.")
+            self._value += chunk
+            return
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadRejected(
+                413, f"Upload exceeds the {self.max_bytes} byte limit."
+            )
+        self.digest.update(chunk)
+        self.pending += chunk
+
+    def _part_end(self) -> None:
+        if self._in_file:
+            self._in_file = False
+        elif self._name:
+            self.fields[self._name] = self._value.decode("utf-8", "replace")
+
+    def flush(self) -> None:
+        """Write buffered file data to disk; blocking, so run it in a thread."""
+        if self._handle is not None and self.pending:
+            self._handle.write(self.pending)
+        self.pending = bytearray()
+
+    def close(self) -> None:
+        self.flush()
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def discard(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        if self.path is not None:
+            self.path.unlink(missing_ok=True)
+
+
+async def receive_upload(
+    headers: Dict[str, str],
+    body: AsyncIterable[bytes],
+    directory: Path,
+    max_bytes: int,
+    suffixes: Collection[str],
+    file_field: str = "file",
+    chunk_size: int = 1024 * 1024,
+) -> SpooledUpload:
+    """Parse a multipart body as it arrives, writing the file part to disk.
+
+    The file is hashed as it arrives and the request is rejected as soon as
+    the upload passes ``max_bytes``, or up front when its ``Content-Length``
+    already does. File data is written in ``chunk_size`` blocks from a worker
+    thread, so writes do not stall the event loop; nothing is buffered
+    beyond one block and the (small) text fields.
+    """
+    content_type, options = parse_options_header(headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadRejected(400, "Expected a multipart/form-data upload.")
+    length = headers.get("content-length")
+    if length and length.isdigit():
+        if int(length) > max_bytes + FORM_OVERHEAD_BYTES:
+            raise UploadRejected(413, f"Upload exceeds the {max_bytes} byte limit.")
+
+    receiver = _FormReceiver(directory, file_field, suffixes, max_bytes)
+    parser = MultipartParser(boundary, receiver.callbacks())
+    try:
+        async for chunk in body:
+            parser.write(chunk)
+            if len(receiver.pending) >= chunk_size:
+                await asyncio.to_thread(receiver.flush)
+        parser.finalize()
+        if receiver.path is None:
+            raise UploadRejected(422, f"Missing the '{file_field}' upload.")
+        await asyncio.to_thread(receiver.close)
+    except MultipartParseError as exc:
+        receiver.discard()
+        raise UploadRejected(400, "Malformed multipart body.") from exc
+    except BaseException:
+        receiver.discard()
+        raise
+    return SpooledUpload(
+        path=receiver.path,
+        size=receiver.size,
+        digest=receiver.digest.hexdigest(),
+        filename=receiver.filename,
+        fields=receiver.fields,
+    )
+
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from ai_doc_to_epub import services as services_module
+from ai_doc_to_epub.app import app
+from ai_doc_to_epub.config import SETTINGS
+from ai_doc_to_epub.models import ConversionResult
+from ai_doc_to_epub.output_store import OutputStore
+from ai_doc_to_epub.uploads import UploadRejected, receive_upload
+
+
+def test_upload_is_streamed_hashed_and_size_limited(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(SETTINGS, "workspace_dir", tmp_path)
+    monkeypatch.setattr(SETTINGS, "upload_max_bytes", 1000)
+    monkeypatch.setattr(SETTINGS, "upload_chunk_size", 64)
+    payload = b"%PDF-1.4 " + b"x" * 500
+
+    with TestClient(app) as client:
+        response = client.post(
+            "/jobs", files={"file": ("book.pdf", payload)}, data={"title": "Book"}
+        )
+        assert response.status_code == 202
+        job = app.state.services.jobs.get(response.json()["id"])
+        assert job.digest == hashlib.sha256(payload).hexdigest()
+
+        response = client.post(
+            "/jobs", files={"file": ("big.pdf", b"x" * 1001)}, data={"title": "Big"}
+        )
+        assert response.status_code == 413
+
+        # Refused from Content-Length alone, before the body is read.
+        response = client.post(
+            "/jobs",
+            files={"file": ("huge.pdf", b"x" * 100_000)},
+            data={"title": "Huge"},
+        )
+        assert response.status_code == 413
+
+        response = client.post(
+            "/jobs",
+            files={"file": ("book.pdf", payload)},
+            data={"title": "Book", "deadline_seconds": "-1"},
+        )
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"] == ["body", "deadline_seconds"]
+
+        response = client.post(
+            "/jobs", files={"file": ("notes.txt", b"text")}, data={"title": "Notes"}
+        )
+        assert response.status_code == 400
+
+    assert not any((tmp_path / "uploads").iterdir())
+
+
+class StoringPipeline:
+    """Stands in for the pipeline: stores a fixed EPUB after ``delay`` seconds."""
+
+    calls: List[Path] = []
+    instances = 0
+    delay = 0.0
+    content = b"PK epub " * 64
+
+    def __init__(self, output_store: OutputStore, config=None) -> None:
+        type(self).instances += 1
+        self.output_store = output_store
+
+    def close(self) -> None:
+        pass
+
+    def convert(self, path, request, progress=None, source_digest=None):
+        self.calls.append(path)
+        time.sleep(self.delay)
+        staged = self.output_store.staging_path("book.epub")
+        staged.write_bytes(self.content)
+        stored = self.output_store.put(staged)
+        return ConversionResult(
+            title=request.title,
+            author=request.author,
+            language=request.language,
+            output_path=stored.path,
+            created_at=datetime.utcnow(),
+            file_size=stored.size,
+        )
+
+
+class AsyncStoringPipeline:
+    def __init__(self, pipeline: StoringPipeline) -> None:
+        self.pipeline = pipeline
+
+    async def warm(self) -> None:
+        pass
+
+    async def convert(self, *args, **kwargs):
+        return await asyncio.to_thread(self.pipeline.convert, *args, **kwargs)
+
+    async def aclose(self) -> None:
+        pass
+
+
+def use_storing_pipeline(monkeypatch) -> None:
+    monkeypatch.setattr(StoringPipeline, "calls", [])
+    monkeypatch.setattr(StoringPipeline, "instances", 0)
+    monkeypatch.setattr(services_module, "ConversionPipeline", StoringPipeline)
+    monkeypatch.setattr(
+        services_module, "AsyncConversionPipeline", AsyncStoringPipeline
+    )
+
+
+def test_identical_concurrent_uploads_share_one_conversion(
+    tmp_path: Path, monkeypatch
+) -> None:
+    monkeypatch.setattr(SETTINGS, "workspace_dir", tmp_path)
+    monkeypatch.setattr(SETTINGS, "output_store_dir", tmp_path / "outputs")
+    monkeypatch.setattr(StoringPipeline, "delay", 0.3)
+    use_storing_pipeline(monkeypatch)
+
+    async def upload_twice():
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app), httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            return await asyncio.gather(
+                *(
+                    client.post(
+                        "/convert",
+                        files={"file": ("book.pdf", b"%PDF-1.4 same")},
+                        data={"title": "Book"},
+                    )
+                    for _ in range(2)
+                )
+            )
+
+    responses = asyncio.run(upload_twice())
+
+    assert [response.content for response in responses] == [
+        StoringPipeline.content
+    ] * 2
+    assert len(StoringPipeline.calls) == 1
+    assert not any((tmp_path / "uploads").glob("*.pdf"))
+
+
+def test_job_results_revalidate_and_resume_with_etags_and_ranges(
+    tmp_path: Path, monkeypatch
+) -> None:
+    monkeypatch.setattr(SETTINGS, "workspace_dir", tmp_path)
+    monkeypatch.setattr(SETTINGS, "output_store_dir", tmp_path / "outputs")
+    use_storing_pipeline(monkeypatch)
+    content = StoringPipeline.content
+
+    with TestClient(app) as client:
+        job_id = client.post(
+            "/jobs", files={"file": ("a.pdf", b"%PDF")}, data={"title": "My Book"}
+        ).json()["id"]
+        while client.get(f"/jobs/{job_id}").json()["state"] != "succeeded":
+            time.sleep(0.01)
+        url = f"/jobs/{job_id}/result"
+
+        full = client.get(url)
+        etag = full.headers["etag"]
+        assert full.content == content
+        assert etag == f'"{hashlib.sha256(content).hexdigest()}"'
+        assert full.headers["accept-ranges"] == "bytes"
+        assert 'filename="My-Book.epub"' in full.headers["content-disposition"]
+
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+        part = client.get(url, headers={"Range": "bytes=10-19"})
+        assert part.status_code == 206 and part.content == content[10:20]
+        assert part.headers["content-range"] == f"bytes 10-19/{len(content)}"
+        tail = client.get(url, headers={"Range": "bytes=-5", "If-Range": etag})
+        assert tail.status_code == 206 and tail.content == content[-5:]
+        stale = client.get(url, headers={"Range": "bytes=0-3", "If-Range": '"old"'})
+        assert stale.status_code == 200 and stale.content == content
+
+        beyond = client.get(url, headers={"Range": f"bytes={len(content)}-"})
+        assert beyond.status_code == 416
+        assert beyond.headers["content-range"] == f"bytes */{len(content)}"
+
+        head = client.head(url)
+        assert head.status_code == 200 and head.content == b""
+        assert head.headers["etag"] == etag
+        assert head.headers["content-length"] == str(len(content))
+        assert client.head(url, headers={"If-None-Match": etag}).status_code == 304
+
+        # Conditionals are for fetching a stored result, not for conversions.
+        converted = client.post(
+            "/convert",
+            files={"file": ("a.pdf", b"%PDF")},
+            data={"title": "My Book"},
+            headers={"If-None-Match": etag, "Range": "bytes=0-3"},
+        )
+        assert converted.status_code == 200 and converted.content == content
+
+
+def test_requests_share_one_pipeline_and_draining_refuses_work(
+    tmp_path: Path, monkeypatch
+) -> None:
+    monkeypatch.setattr(SETTINGS, "workspace_dir", tmp_path)
+    monkeypatch.setattr(SETTINGS, "output_store_dir", tmp_path / "outputs")
+    use_storing_pipeline(monkeypatch)
+
+    monkeypatch.setattr(SETTINGS, "drain_token", "secret")
+
+    with TestClient(app) as client:
+        for title in ("One", "Two"):
+            response = client.post(
+                "/convert", files={"file": ("a.pdf", b"%PDF")}, data={"title": title}
+            )
+            assert response.status_code == 200
+        assert client.get("/health").json() == {"status": "ok"}
+
+        assert client.post("/drain").status_code == 401
+        drained = client.post("/drain", headers={"Authorization": "Bearer secret"})
+        assert drained.status_code == 202
+        assert client.get("/health").status_code == 503
+        refused = client.post(
+            "/jobs", files={"file": ("a.pdf", b"%PDF")}, data={"title": "Three"}
+        )
+        assert refused.status_code == 503 and "retry-after" in refused.headers
+
+    assert StoringPipeline.instances == 1 and len(StoringPipeline.calls) == 2
+
+
+def test_oversized_upload_is_refused_before_the_body_ends(tmp_path: Path) -> None:
+    sent: List[int] = []
+
+    async def body():
+        yield (
+            b"--b\r\nContent-Disposition: form-data; name=\"file\"; "
+            b"filename=\"a.pdf\"\r\n\r\n"
+        )
+        for index in range(100):
+            sent.append(index)
+            yield b"x" * 100
+        yield b"\r\n--b--\r\n"
+
+    headers = {"content-type": "multipart/form-data; boundary=b"}
+    with pytest.raises(UploadRejected) as raised:
+        asyncio.run(receive_upload(headers, body(), tmp_path, 1000, {".pdf"}))
+
+    assert raised.value.status_code == 413
+    assert len(sent) == 11
+    assert not any(tmp_path.iterdir())
+
+
+def test_upload_is_written_in_blocks_off_the_event_loop(
+    tmp_path: Path, monkeypatch
+) -> None:
+    writes: List[int] = []
+    to_thread = asyncio.to_thread
+
+    async def recording_to_thread(function, *args):
+        writes.append(len(function.__self__.pending))
+        return await to_thread(function, *args)
+
+    async def body():
+        yield (
+            b"--b\r\nContent-Disposition: form-data; name=\"file\"; "
+            b"filename=\"a.pdf\"\r\n\r\n"
+        )
+        for _ in range(10):
+            yield b"x" * 100
+        yield b"\r\n--b--\r\n"
+
+    monkeypatch.setattr(asyncio, "to_thread", recording_to_thread)
+    headers = {"content-type": "multipart/form-data; boundary=b"}
+    upload = asyncio.run(
+        receive_upload(headers, body(), tmp_path, 10_000, {".pdf"}, chunk_size=300)
+    )
+
+    assert upload.path.read_bytes() == b"x" * 1000
+    assert sum(writes) == 1000 and len(writes) <= 4
+    assert all(size >= 300 for size in writes[:-1])
+
+
+def test_replica_health_is_probed_periodically() -> None:
+    probes: List[int] = []
+
+    class Replicas:
+        async def check_health(self):
+            probes.append(1)
+            if len(probes) == 1:
+                raise httpx.ConnectError("refused")
+            return {"http://mineru": True}
+
+    conversions = SimpleNamespace(mineru_client=Replicas())
+    services = services_module.Services(None, None, conversions, None)
+
+    async def run() -> None:
+        task = asyncio.create_task(services._check_replicas(0.01))
+        await asyncio.sleep(0.1)
+        task.cancel()
+
+    asyncio.run(run())
+
+    # A failed round does not stop the probes.
+    assert len(probes) >= 3
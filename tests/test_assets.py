@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import base64
+import io
+import os
+import random
+import time
+import zipfile
+from pathlib import Path
+
+import pytest
+from docx import Document
+
+from ai_doc_to_epub.assets import (
+    ImageAssets,
+    ImageOptions,
+    discard_image_pool,
+    evict_media,
+    image_pool,
+    shared_image_pool,
+    store_media,
+)
+from ai_doc_to_epub.config import SETTINGS
+from ai_doc_to_epub.mineru_client import MinerUClient
+from ai_doc_to_epub.models import ConversionRequest
+from ai_doc_to_epub.pipeline import ConversionPipeline, PipelineConfig
+
+# 1x1 transparent PNG.
+PIXEL = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA"
+    "60e6kgAAAABJRU5ErkJggg=="
+)
+
+
+def test_rewrite_dedupes_images_and_drops_files_outside_the_roots(
+    tmp_path: Path,
+) -> None:
+    document_dir = tmp_path / "doc"
+    (document_dir / "figures").mkdir(parents=True)
+    (document_dir / "figures" / "a.png").write_bytes(PIXEL)
+    (document_dir / "figures" / "b.png").write_bytes(PIXEL)
+    (tmp_path / "secret.png").write_bytes(PIXEL)
+    data_uri = "data:image/png;base64," + base64.b64encode(PIXEL).decode()
+
+    assets = ImageAssets(base_dir=document_dir, options=ImageOptions(workers=1))
+    content = assets.rewrite(
+        "<p><img src='figures/a.png' alt='A'/><img src=\"figures/b.png\"/>"
+        f"<img src='{data_uri}'/><img src='../secret.png'/>"
+        "<img src='https://example.com/remote.png'/></p>"
+    )
+
+    assert assets.count == 1 and assets.dropped == 1
+    (href, data, media_type), = assets.items()
+    assert content.count(f"../{href}") == 3
+    assert "secret" not in content and "https://example.com/remote.png" in content
+    assert media_type == "image/png" and data == PIXEL
+
+
+def test_large_images_are_downscaled_in_worker_processes(tmp_path: Path) -> None:
+    image_module = pytest.importorskip("PIL.Image")
+    rng = random.Random(0)
+    image = image_module.frombytes(
+        "RGB", (1200, 900), bytes(rng.getrandbits(8) for _ in range(1200 * 900 * 3))
+    )
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=95)
+    (tmp_path / "photo.jpg").write_bytes(buffer.getvalue())
+
+    options = ImageOptions(max_dimension=400, quality=70, workers=2)
+    with ImageAssets(base_dir=tmp_path, options=options) as assets:
+        assets.rewrite("<img src='photo.jpg'/>")
+        (_, data, media_type), = assets.items()
+
+    assert media_type == "image/jpeg"
+    assert len(data) < len(buffer.getvalue())
+    assert max(image_module.open(io.BytesIO(data)).size) == 400
+
+
+def test_encoded_images_are_handed_on_with_bounded_encodes_in_flight(
+    tmp_path: Path,
+) -> None:
+    for index in range(12):
+        (tmp_path / f"{index}.png").write_bytes(PIXEL + bytes([index]))
+    written = []
+
+    options = ImageOptions(workers=2)
+    with ImageAssets(base_dir=tmp_path, options=options) as assets:
+        assets.write_to(lambda href, data, media_type: written.append(href))
+        for index in range(12):
+            assets.rewrite(f"<img src='{index}.png'/>")
+            assert len(assets._pending) <= 4
+        assert len(written) >= 8
+        remaining = [href for href, _, _ in assets.items()]
+
+    assert assets.count == 12
+    assert sorted(written + remaining) == sorted(set(written + remaining))
+    assert len(written + remaining) == 12
+
+
+def test_books_share_the_service_image_pool(tmp_path: Path) -> None:
+    (tmp_path / "pixel.png").write_bytes(PIXEL)
+    pool = image_pool(2)
+    try:
+        for _ in range(2):
+            with ImageAssets(base_dir=tmp_path, executor=pool) as assets:
+                assets.rewrite("<img src='pixel.png'/>")
+                (_, data, _), = assets.items()
+            assert data == PIXEL
+        # Closing a book leaves the shared pool running.
+        assert pool.submit(len, b"abc").result() == 3
+    finally:
+        pool.shutdown()
+
+
+def test_books_without_an_executor_share_one_process_wide_pool(
+    tmp_path: Path,
+) -> None:
+    (tmp_path / "pixel.png").write_bytes(PIXEL)
+    options = ImageOptions(workers=2)
+    pool = shared_image_pool(2)
+    try:
+        for _ in range(2):
+            with ImageAssets(base_dir=tmp_path, options=options) as assets:
+                assets.rewrite("<img src='pixel.png'/>")
+                (_, data, _), = assets.items()
+            assert data == PIXEL
+            assert shared_image_pool(2) is pool
+
+        # A broken pool is replaced by the next book instead of failing it.
+        pool.shutdown()
+        pool._broken = "worker died"
+        with ImageAssets(base_dir=tmp_path, options=options) as assets:
+            assets.rewrite("<img src='pixel.png'/>")
+            (_, data, _), = assets.items()
+        assert data == PIXEL and shared_image_pool(2) is not pool
+    finally:
+        discard_image_pool(shared_image_pool(2))
+
+
+def test_media_directory_evicts_old_and_least_recently_used_images(
+    tmp_path: Path,
+) -> None:
+    media = tmp_path / "media"
+    paths = [store_media(PIXEL + bytes([index]), media) for index in range(4)]
+    for age, path in zip((100, 40, 30, 20), paths):
+        stamp = time.time() - age
+        os.utime(path, (stamp, stamp))
+    # Storing an image again counts as a use.
+    assert store_media(PIXEL + bytes([1]), media) == paths[1]
+
+    removed = evict_media(media, max_bytes=2 * (len(PIXEL) + 1), max_age_seconds=60)
+
+    assert removed == 2
+    assert sorted(media.iterdir()) == sorted([paths[1], paths[3]])
+
+
+def test_docx_pictures_are_packaged_into_the_epub(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(SETTINGS, "media_dir", tmp_path / "media")
+    (tmp_path / "pixel.png").write_bytes(PIXEL)
+    source = tmp_path / "figures.docx"
+    document = Document()
+    document.add_heading("Figures", level=1)
+    document.add_paragraph("Before the picture.")
+    document.add_picture(str(tmp_path / "pixel.png"))
+    document.add_picture(str(tmp_path / "pixel.png"))
+    document.save(str(source))
+
+    pipeline = ConversionPipeline(
+        mineru_client=MinerUClient(cache=None),
+        config=PipelineConfig(output_dir=tmp_path / "out", image_workers=1),
+    )
+    pipeline.mineru_client.http_pool = None
+    pipeline.mineru_client.worker_pool = None
+    pipeline.mineru_client.binary_path = None
+    result = pipeline.convert(
+        source, ConversionRequest(title="Figures", use_local_formatter=True)
+    )
+
+    with zipfile.ZipFile(result.output_path) as archive:
+        names = archive.namelist()
+        images = [name for name in names if name.startswith("EPUB/images/")]
+        package = archive.read("EPUB/content.opf").decode("utf-8")
+        chapters = "".join(
+            archive.read(name).decode("utf-8")
+            for name in names
+            if name.startswith("EPUB/text/")
+        )
+        stored = archive.getinfo(images[0]).compress_type
+
+    assert len(images) == 1 and stored == zipfile.ZIP_STORED
+    href = images[0].removeprefix("EPUB/")
+    assert f"href='{href}' media-type='image/png'" in package
+    assert chapters.count(f"../{href}") == 2
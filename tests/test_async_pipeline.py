@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+import zipfile
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List
+
+import httpx
+import pytest
+from docx import Document
+from lxml.html import tostring
+
+from ai_doc_to_epub.cache import LLMResponseCache
+from ai_doc_to_epub.config import SETTINGS
+from ai_doc_to_epub.llm_client import (
+    AsyncOpenAICompatibleLLM,
+    CachedLLMClient,
+    LocalFormatterLLM,
+    OpenAICompatibleLLM,
+    ThreadedLLMClient,
+)
+from ai_doc_to_epub.mineru_client import (
+    AsyncMinerUClient,
+    AsyncMinerUHttpPool,
+    MinerUClient,
+)
+from ai_doc_to_epub.models import ConversionRequest
+from ai_doc_to_epub.output_store import OutputStore
+from ai_doc_to_epub.pipeline import (
+    AsyncConversionPipeline,
+    ConversionPipeline,
+    PipelineConfig,
+)
+
+
+def test_async_pool_and_cli_backends(tmp_path: Path) -> None:
+    source = tmp_path / "doc.pdf"
+    source.write_bytes(b"%PDF-1.4")
+    hosts: List[str] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        hosts.append(request.url.host)
+        if request.url.host == "bad":
+            return httpx.Response(503)
+        return httpx.Response(200, json={"markdown": "# Remote"})
+
+    pool = AsyncMinerUHttpPool(
+        ["http://bad", "http://good"],
+        backoff_seconds=0,
+        transport=httpx.MockTransport(handler),
+    )
+    assert asyncio.run(pool.convert(source)) == "# Remote"
+    assert hosts == ["bad", "good"]
+
+    binary = tmp_path / "mineru"
+    binary.write_text(
+        f"#!{sys.executable}\n"
+        "import json, sys\n"
+        "output = sys.argv[sys.argv.index('--output') + 1]\n"
+        "json.dump({'markdown': '# From CLI'}, open(output, 'w'))\n"
+    )
+    binary.chmod(0o755)
+    sync_client = MinerUClient(binary_path=binary, cache=None)
+    sync_client.worker_pool = None
+    client = AsyncMinerUClient(sync_client)
+
+    assert asyncio.run(client.convert_to_markdown(source)) == "# From CLI"
+
+
+class FakeCompletions:
+    def __init__(self) -> None:
+        self.active = 0
+        self.peak = 0
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        text = kwargs["messages"][-1]["content"]
+        title = text.split("# ", 1)[1].split("\n", 1)[0]
+        message = SimpleNamespace(content=f"<h1>{title}</h1>")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def test_async_llm_overlaps_chunks_and_shares_the_response_cache(
+    tmp_path: Path,
+) -> None:
+    config = OpenAICompatibleLLM(
+        api_key="key",
+        base_url="http://llm.invalid/v1",
+        model="model",
+        chunk_tokens=50,
+        max_concurrency=2,
+    )
+    cache = LLMResponseCache(tmp_path / "llm.sqlite3", 1_000_000, 3600)
+    client = AsyncOpenAICompatibleLLM(config, cache=cache)
+    completions = FakeCompletions()
+    client._client = SimpleNamespace(  # type: ignore[assignment]
+        chat=SimpleNamespace(completions=completions)
+    )
+    markdown = "\n\n".join(f"# Part {i}\n\n" + "word " * 40 for i in range(4))
+
+    html = tostring(
+        asyncio.run(client.enhance(markdown, {"title": "Book"})), encoding="unicode"
+    )
+
+    assert completions.calls == 4 and completions.peak == 2
+    assert [f"Part {i}" in html for i in range(4)] == [True] * 4
+    # The synchronous client finds every chunk in the shared cache.
+    config._client = None  # type: ignore[assignment]
+    cached = CachedLLMClient(inner=config, cache=cache)
+    stitched = cached.enhance(markdown, {"title": "Book"})
+    assert tostring(stitched, encoding="unicode") == html
+
+
+def test_async_pipeline_runs_conversions_concurrently(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(SETTINGS, "media_dir", tmp_path / "media")
+    sources = []
+    for book in range(3):
+        source = tmp_path / f"book-{book}.docx"
+        document = Document()
+        for chapter in range(3):
+            document.add_heading(f"Book {book} chapter {chapter}", level=1)
+            document.add_paragraph("Body text.")
+        document.save(str(source))
+        sources.append(source)
+
+    mineru = MinerUClient(cache=None)
+    mineru.http_pool = mineru.worker_pool = mineru.binary_path = None
+    pipeline = AsyncConversionPipeline(
+        mineru_client=AsyncMinerUClient(mineru),
+        llm_client=ThreadedLLMClient(LocalFormatterLLM()),
+        pipeline=ConversionPipeline(
+            mineru_client=mineru,
+            llm_client=LocalFormatterLLM(),
+            config=PipelineConfig(output_dir=tmp_path / "out"),
+            output_store=OutputStore(tmp_path / "outputs", 10**9, 3600),
+        ),
+    )
+
+    async def convert_all():
+        try:
+            return await asyncio.gather(
+                *(
+                    pipeline.convert(source, ConversionRequest(title=source.stem))
+                    for source in sources
+                )
+            )
+        finally:
+            await pipeline.aclose()
+
+    results = asyncio.run(convert_all())
+
+    for book, result in enumerate(results):
+        assert result.timings["extraction"] > 0
+        with zipfile.ZipFile(result.output_path) as archive:
+            nav = archive.read("EPUB/nav.xhtml").decode("utf-8")
+        assert f"Book {book} chapter 2" in nav
+
+
+def test_async_llm_cancels_remaining_chunks_after_a_failure() -> None:
+    config = OpenAICompatibleLLM(
+        api_key="key", base_url="http://llm.invalid/v1", model="model", chunk_tokens=50
+    )
+    client = AsyncOpenAICompatibleLLM(config)
+    cancelled: List[str] = []
+
+    async def create(**kwargs):
+        text = kwargs["messages"][-1]["content"]
+        if "# Part 0" in text:
+            raise RuntimeError("upstream failed")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(text)
+            raise
+
+    client._client = SimpleNamespace(  # type: ignore[assignment]
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+    markdown = "\n\n".join(f"# Part {i}\n\n" + "word " * 40 for i in range(4))
+
+    async def enhance() -> None:
+        with pytest.raises(RuntimeError, match="upstream failed"):
+            await client.enhance(markdown, {"title": "Book"})
+        await asyncio.sleep(0)
+
+    asyncio.run(enhance())
+    assert len(cancelled) == 3
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from docx import Document
+
+from ai_doc_to_epub.batch import (
+    BatchManifest,
+    discover_inputs,
+    output_names,
+    run_batch,
+)
+from ai_doc_to_epub.config import SETTINGS
+from ai_doc_to_epub.incremental import document_key
+
+
+def create_docx(path: Path, heading: str) -> None:
+    doc = Document()
+    doc.add_heading(heading, level=1)
+    doc.add_paragraph("Body text for the batch run.")
+    doc.save(path)
+
+
+def test_batch_converts_directory_and_resumes(tmp_path: Path) -> None:
+    source_dir = tmp_path / "library"
+    (source_dir / "nested").mkdir(parents=True)
+    create_docx(source_dir / "first.docx", "First")
+    create_docx(source_dir / "nested" / "second.docx", "Second")
+    (source_dir / "broken.docx").write_bytes(b"not a zip")
+    (source_dir / "notes.txt").write_text("ignored")
+
+    inputs = discover_inputs(str(source_dir))
+    assert [path.name for path in inputs] == [
+        "broken.docx",
+        "first.docx",
+        "second.docx",
+    ]
+
+    output_dir = tmp_path / "out"
+    manifest_path = output_dir / "batch.jsonl"
+    fields = {"use_local_formatter": True}
+    summary = run_batch(
+        inputs, output_dir, BatchManifest(manifest_path), fields, workers=2,
+        use_threads=True,
+    )
+    assert (summary.succeeded, summary.failed, summary.skipped) == (2, 1, 0)
+    assert (output_dir / "first.epub").exists()
+    records = [json.loads(line) for line in manifest_path.read_text().splitlines()]
+    assert {record["status"] for record in records} == {"ok", "failed"}
+
+    # A second run only retries the failure; edited files are picked up again.
+    create_docx(source_dir / "first.docx", "First, revised")
+    resumed = run_batch(
+        inputs, output_dir, BatchManifest(manifest_path), fields, use_threads=True
+    )
+    assert (resumed.succeeded, resumed.failed, resumed.skipped) == (1, 1, 1)
+
+
+def test_files_sharing_a_stem_get_distinct_outputs(tmp_path: Path) -> None:
+    source_dir = tmp_path / "library"
+    for part in ("a", "b"):
+        (source_dir / part).mkdir(parents=True)
+        create_docx(source_dir / part / "intro.docx", f"Intro {part}")
+    create_docx(source_dir / "preface.docx", "Preface")
+    inputs = discover_inputs(str(source_dir))
+
+    names = output_names(inputs)
+    assert names[source_dir.resolve() / "preface.docx"] == "preface"
+    assert len(set(names.values())) == 3
+    assert names == output_names(inputs)
+
+    output_dir = tmp_path / "out"
+    summary = run_batch(
+        inputs,
+        output_dir,
+        BatchManifest(output_dir / "batch.jsonl"),
+        {"use_local_formatter": True},
+        workers=2,
+        use_threads=True,
+    )
+
+    assert summary.succeeded == 3
+    assert len(list(output_dir.glob("intro-*.epub"))) == 2
+
+
+def test_incremental_builds_are_keyed_by_output_name(
+    tmp_path: Path, monkeypatch
+) -> None:
+    monkeypatch.setattr(SETTINGS, "incremental_dir", tmp_path / "incremental")
+    source_dir = tmp_path / "library"
+    for part in ("a", "b"):
+        (source_dir / part).mkdir(parents=True)
+        create_docx(source_dir / part / "report.docx", f"Report {part}")
+    inputs = discover_inputs(str(source_dir))
+    progress = []
+
+    summary = run_batch(
+        inputs,
+        tmp_path / "out",
+        BatchManifest(tmp_path / "out" / "batch.jsonl"),
+        {"use_local_formatter": True, "incremental": True},
+        use_threads=True,
+        on_record=lambda record, running: progress.append(running.files_per_second),
+    )
+
+    assert summary.succeeded == 2
+    assert len(progress) == 2 and all(rate > 0 for rate in progress)
+    keys = {document_key(name) for name in output_names(inputs).values()}
+    stored = {path.name for path in (tmp_path / "incremental").iterdir()}
+    assert keys <= stored and document_key("report") not in stored
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def run_benchmarks(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-m", "benchmarks.run", "--profiles", "small", *args],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+
+
+def test_benchmark_report_and_baseline_comparison(tmp_path: Path) -> None:
+    report_path = tmp_path / "report.json"
+    only = "--only=extract_docx,split_chapters,pipeline_pdf"
+    completed = run_benchmarks(only, "--repeat=1", f"--output={report_path}")
+    assert completed.returncode == 0, completed.stderr
+
+    report = json.loads(report_path.read_text())
+    results = {item["benchmark"]: item for item in report["results"]}
+    assert set(results) == {"extract_docx", "split_chapters", "pipeline_pdf"}
+    assert results["pipeline_pdf"]["pages_per_second"] > 0
+    assert all(item["peak_memory_bytes"] > 0 for item in results.values())
+
+    # A baseline that was impossibly fast flags every benchmark as regressed.
+    for item in report["results"]:
+        item["seconds_median"] /= 1000
+    baseline_path = tmp_path / "baseline.json"
+    baseline_path.write_text(json.dumps(report))
+    completed = run_benchmarks(only, "--repeat=1", f"--baseline={baseline_path}")
+    assert completed.returncode == 1
+    assert "REGRESSION" in completed.stderr
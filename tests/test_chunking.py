@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict
+
+from lxml.html import tostring
+
+from ai_doc_to_epub.chunking import (
+    HtmlSectionAssembler,
+    MarkdownChunk,
+    namespace_fragment,
+    split_markdown,
+    stitch_html_fragments,
+)
+from ai_doc_to_epub.llm_client import ChunkedLLMClient
+
+
+def build_markdown(sections: int) -> str:
+    parts = []
+    for index in range(sections):
+        parts.append(f"# Chapter {index}\n\n" + "Lorem ipsum dolor sit amet. " * 40)
+    parts.append("See the note.[^a]")
+    parts.append("[^a]: The footnote body.")
+    return "\n\n".join(parts)
+
+
+def test_split_markdown_respects_heading_boundaries() -> None:
+    chunks = split_markdown(build_markdown(6), max_tokens=400)
+
+    assert len(chunks) > 1
+    assert all(chunk.total == len(chunks) for chunk in chunks)
+    for chunk in chunks:
+        assert chunk.text.startswith("# Chapter")
+    assert "[^a]: The footnote body." in chunks[-1].text
+    assert sum(chunk.text.count("[^a]:") for chunk in chunks) == 1
+
+
+def test_stitch_builds_single_toc_and_unique_ids() -> None:
+    fragment = (
+        "<nav><ol><li>local toc</li></ol></nav><h1>Title {n}</h1>"
+        "<p>Text<sup id='fnref-1'><a href='#fn-1'>1</a></sup></p>"
+        "<aside class='footnote' id='fn-1'>Note</aside>"
+    )
+    html = tostring(
+        stitch_html_fragments([fragment.format(n=1), fragment.format(n=2)]),
+        encoding="unicode",
+    )
+
+    assert html.count("<nav") == 1
+    assert "local toc" not in html
+    assert "id=\"fn-1-c0\"" in html and "id=\"fn-1-c1\"" in html
+    assert "href=\"#fn-1-c1\"" in html
+    assert "Title 2" in html.split("</nav>")[0]
+
+
+class SlowChunkClient(ChunkedLLMClient):
+    chunk_tokens = 400
+    max_concurrency = 4
+
+    def __init__(self) -> None:
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def enhance_chunk(self, chunk: MarkdownChunk, metadata: Dict[str, str]) -> str:
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05 * (chunk.total - chunk.index))
+        with self._lock:
+            self.active -= 1
+        return f"<h1>Part {chunk.index}</h1>"
+
+
+def test_chunked_client_runs_concurrently_and_keeps_order() -> None:
+    client = SlowChunkClient()
+    html = tostring(client.enhance(build_markdown(6), metadata={}), encoding="unicode")
+
+    assert client.peak > 1
+    positions = [html.index(f"Part {index}</h1>") for index in range(3)]
+    assert positions == sorted(positions)
+
+
+def test_streamed_chunks_join_the_open_section_without_reparsing() -> None:
+    assembler = HtmlSectionAssembler()
+    sections = assembler.feed("<h1>One</h1><p>first")
+    sections += assembler.feed_tree(
+        namespace_fragment("<p id='x'><a href='#x'>more</a></p><h1>Two</h1>", "c1")
+    )
+    sections += assembler.close()
+
+    assert len(sections) == 2
+    assert sections[0].startswith("<h1>One</h1>") and 'id="x-c1"' in sections[0]
+    assert 'href="#x-c1"' in sections[0] and sections[1] == "<h1>Two</h1>"
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from lxml.html import tostring
+from markdown import markdown
+
+from ai_doc_to_epub.chunking import MarkdownChunk, split_chapters
+from ai_doc_to_epub.deadline import DeadlineLLMClient, LatencyEstimator
+from ai_doc_to_epub.incremental import IncrementalStore
+from ai_doc_to_epub.llm_client import ChunkedLLMClient
+from ai_doc_to_epub.models import ConversionRequest
+from ai_doc_to_epub.pipeline import ConversionPipeline, PipelineConfig
+
+BOOK = "# Fast\n\nQuick chapter.\n\n# Slow\n\nSluggish chapter.\n\n# Also fast\n\nDone."
+
+
+class DelayedClient(ChunkedLLMClient):
+    """Answers after ``delays[title]`` seconds; list values apply per call."""
+
+    max_concurrency = 4
+
+    def __init__(self, delays: Dict[str, object]) -> None:
+        self.delays = delays
+        self.calls: List[str] = []
+        self._lock = threading.Lock()
+
+    def enhance_chunk(self, chunk: MarkdownChunk, metadata: Dict[str, str]) -> str:
+        with self._lock:
+            attempt = self.calls.count(chunk.title or "")
+            self.calls.append(chunk.title or "")
+        delay = self.delays.get(chunk.title or "", 0.0)
+        if isinstance(delay, list):
+            delay = delay[min(attempt, len(delay) - 1)]
+        time.sleep(delay)
+        return "<!-- llm -->" + markdown(chunk.text)
+
+
+def test_late_sections_fall_back_to_local_formatter() -> None:
+    client = DeadlineLLMClient(
+        DelayedClient({"Slow": 2.0}),
+        deadline_at=time.monotonic() + 0.3,
+        estimator=LatencyEstimator(),
+    )
+    started = time.monotonic()
+    fragments = client.enhance_sections(split_chapters(BOOK), {})
+
+    assert time.monotonic() - started < 1.0
+    assert ["llm" in fragment for fragment in fragments] == [True, False, True]
+    assert "Sluggish chapter." in fragments[1]
+    assert [(s.index, s.title, s.reason) for s in client.degraded] == [
+        (1, "Slow", "deadline")
+    ]
+
+
+def test_hedged_request_wins_when_first_attempt_stalls() -> None:
+    inner = DelayedClient({"Slow": [2.0, 0.0]})
+    client = DeadlineLLMClient(
+        inner,
+        deadline_at=time.monotonic() + 5.0,
+        hedge_after=0.1,
+        estimator=LatencyEstimator(),
+    )
+    started = time.monotonic()
+    html = tostring(client.enhance(BOOK, {}), encoding="unicode")
+
+    # The hedge's answer ends the wait; the stalled attempt is abandoned.
+    assert time.monotonic() - started < 0.5
+    assert client.degraded == []
+    assert inner.calls.count("Slow") == 2
+    assert html.count("Sluggish chapter.") == 1
+
+
+def test_predicted_misses_skip_the_llm_except_for_one_probe() -> None:
+    estimator = LatencyEstimator()
+    estimator.observe(tokens=1, seconds=60.0)
+    inner = DelayedClient({})
+    client = DeadlineLLMClient(
+        inner,
+        deadline_at=time.monotonic() + 5.0,
+        max_concurrency=1,
+        estimator=estimator,
+    )
+    client.enhance(BOOK, {})
+
+    assert inner.calls == ["Fast"]
+    assert [section.reason for section in client.degraded] == ["predicted"] * 2
+    # The probe's quick answer pulled the shared estimate down.
+    assert estimator.predict(1) < 60.0
+
+
+def test_latency_estimate_expires() -> None:
+    now = [0.0]
+    estimator = LatencyEstimator(max_age=60.0, clock=lambda: now[0])
+    estimator.observe(tokens=10, seconds=5.0)
+    assert estimator.predict(20) == 10.0
+
+    now[0] = 61.0
+    assert estimator.predict(20) is None
+
+
+def test_pipeline_reports_and_does_not_persist_degraded_sections(
+    tmp_path: Path,
+) -> None:
+    source = tmp_path / "report.pdf"
+    source.write_bytes(b"%PDF-1.4")
+    inner = DelayedClient({"Slow": 2.0})
+    pipeline = ConversionPipeline(
+        llm_client=inner,
+        config=PipelineConfig(output_dir=tmp_path / "out"),
+        incremental_store=IncrementalStore(tmp_path / "incremental"),
+    )
+    pipeline.mineru_client.convert_to_markdown = (  # type: ignore[method-assign]
+        lambda path, digest=None: BOOK
+    )
+    request = ConversionRequest(title="Report", incremental=True, deadline_seconds=1.5)
+
+    result = pipeline.convert(source, request)
+    assert [section.title for section in result.degraded_sections] == ["Slow"]
+    assert result.output_path.exists()
+
+    inner.delays = {}
+    again = pipeline.convert(source, request)
+    assert again.degraded_sections == []
+    assert again.enhanced_sections == 1 and again.reused_sections == 2
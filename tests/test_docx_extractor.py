@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import base64
+import zipfile
+from pathlib import Path
+
+from docx import Document
+
+from ai_doc_to_epub.docx_extractor import extract_docx_markdown
+
+PIXEL = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA"
+    "60e6kgAAAABJRU5ErkJggg=="
+)
+
+
+def test_docx_structure_survives_extraction(tmp_path: Path) -> None:
+    (tmp_path / "pixel.png").write_bytes(PIXEL)
+    source = tmp_path / "book.docx"
+    document = Document()
+    document.add_heading("The Book", level=0)
+    document.add_heading("Chapter One", level=1)
+    paragraph = document.add_paragraph("Plain ")
+    paragraph.add_run("bold").bold = True
+    paragraph.add_run(" and 1*2 [x]")
+    document.add_paragraph("- not a list item")
+    document.add_heading("Section", level=2)
+    document.add_paragraph("first", style="List Bullet")
+    document.add_paragraph("second", style="List Number")
+    table = document.add_table(rows=2, cols=2)
+    table.cell(0, 0).text, table.cell(0, 1).text = "Name", "Value"
+    table.cell(1, 0).text, table.cell(1, 1).text = "a|b", "1"
+    document.add_picture(str(tmp_path / "pixel.png"))
+    document.save(str(source))
+
+    markdown = extract_docx_markdown(source, media_dir=tmp_path / "media")
+    blocks = markdown.split("\n\n")
+
+    assert blocks[:3] == [
+        "# The Book",
+        "# Chapter One",
+        "Plain **bold** and 1\\*2 \\[x\\]",
+    ]
+    assert "\\- not a list item" in blocks
+    assert "## Section" in blocks
+    assert "- first" in blocks and "1. second" in blocks
+    assert "| Name | Value |\n| --- | --- |\n| a\\|b | 1 |" in blocks
+    (image,) = [block for block in blocks if block.startswith("![](file://")]
+    assert image.endswith(".png)")
+    assert len(list((tmp_path / "media").iterdir())) == 1
+
+
+def test_footnote_definitions_close_the_chapter_that_cites_them(
+    tmp_path: Path,
+) -> None:
+    plain = tmp_path / "plain.docx"
+    document = Document()
+    document.add_heading("One", level=1)
+    document.add_paragraph("NOTE-A")
+    document.add_heading("Two", level=1)
+    document.add_paragraph("NOTE-B")
+    document.save(str(plain))
+
+    namespace = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+    reference = '</w:t></w:r><w:r><w:footnoteReference w:id="{}"/></w:r><w:r><w:t>'
+    footnotes = (
+        f"<w:footnotes {namespace}>"
+        + "".join(
+            f'<w:footnote w:id="{label}"><w:p><w:r><w:t>Note {label}</w:t></w:r>'
+            "</w:p></w:footnote>"
+            for label in (1, 2)
+        )
+        + "</w:footnotes>"
+    )
+    source = tmp_path / "notes.docx"
+    with zipfile.ZipFile(plain) as original, zipfile.ZipFile(source, "w") as copy:
+        for item in original.infolist():
+            data = original.read(item)
+            if item.filename == "word/document.xml":
+                text = data.decode("utf-8")
+                text = text.replace("NOTE-A", "Cited" + reference.format(1))
+                text = text.replace("NOTE-B", "Again" + reference.format(2))
+                data = text.encode("utf-8")
+            copy.writestr(item, data)
+        copy.writestr("word/footnotes.xml", footnotes)
+
+    assert extract_docx_markdown(source).split("\n\n") == [
+        "# One",
+        "Cited[^1]",
+        "[^1]: Note 1",
+        "# Two",
+        "Again[^2]",
+        "[^2]: Note 2",
+    ]
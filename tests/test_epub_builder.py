@@ -1,8 +1,14 @@
 from __future__ import annotations
 
+import zipfile
 from pathlib import Path
 
-from ai_doc_to_epub.epub_builder import EpubBuilder, EpubMetadata
+from ai_doc_to_epub.epub_builder import (
+    EpubBuilder,
+    EpubMetadata,
+    _split_html_into_chapters,
+)
+from ai_doc_to_epub.html_document import parse_html, strip_footnotes
 
 
 def test_epub_builder_creates_file(tmp_path: Path) -> None:
@@ -23,3 +29,42 @@ def test_epub_builder_creates_file(tmp_path: Path) -> None:
     assert result.exists()
     assert result.suffix == ".epub"
     assert result.stat().st_size > 0
+
+
+def test_chapters_are_split_from_one_parsed_tree() -> None:
+    document = parse_html(
+        "<p>Preface<br></p><h1>First</h1><p>One<sup id='fnref-1'>1</sup></p>"
+        "<aside class='footnote'>Note</aside><h1>Second &amp; last</h1><p>Two</p>"
+    )
+    strip_footnotes(document)
+
+    chapters = _split_html_into_chapters(document)
+
+    assert [chapter.title for chapter in chapters] == [
+        "Introduction",
+        "First",
+        "Second & last",
+    ]
+    assert chapters[0].content == "<p>Preface<br/></p>"
+    assert chapters[1].content == "<h1>First</h1><p>One1</p>"
+
+
+def test_epub_container_layout(tmp_path: Path) -> None:
+    builder = EpubBuilder()
+    metadata = EpubMetadata(title="Fish & Chips", author="Tester", language="en")
+
+    result = builder.build(
+        "<h1>One</h1><p>a</p><h1>Two</h1><p>b</p>", metadata, tmp_path / "book"
+    )
+
+    with zipfile.ZipFile(result) as archive:
+        names = archive.namelist()
+        first = archive.infolist()[0]
+        opf = archive.read("EPUB/content.opf").decode("utf-8")
+        nav = archive.read("EPUB/nav.xhtml").decode("utf-8")
+    assert first.filename == "mimetype"
+    assert first.compress_type == zipfile.ZIP_STORED
+    assert names[-1] == "EPUB/content.opf"
+    assert "Fish &amp; Chips" in opf
+    assert nav.index(">One<") < nav.index(">Two<")
+    assert [path.name for path in tmp_path.iterdir()] == ["book.epub"]
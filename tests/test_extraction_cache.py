@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from ai_doc_to_epub.cache import ExtractionCache
+from ai_doc_to_epub.metrics import CACHE_EVENTS
+from ai_doc_to_epub.mineru_client import MinerUClient
+
+
+def test_cache_round_trip_and_lru_eviction(tmp_path: Path) -> None:
+    cache = ExtractionCache(tmp_path / "cache", max_bytes=250)
+    events = ("hits", "misses", "evictions")
+    exported = {
+        event: CACHE_EVENTS.value(cache="extraction", event=event) for event in events
+    }
+
+    assert cache.get("aaa", "fallback:1") is None
+    cache.put("aaa", "fallback:1", "a" * 100)
+    cache.put("bbb", "fallback:1", "b" * 100)
+    assert cache.get("aaa", "fallback:1") == "a" * 100
+    assert cache.get("aaa", "http:other") is None
+
+    oldest = cache._path_for("bbb", "fallback:1")
+    os.utime(oldest, (1, 1))
+    cache.put("ccc", "fallback:1", "c" * 100)
+
+    assert cache.get("bbb", "fallback:1") is None
+    assert cache.get("aaa", "fallback:1") == "a" * 100
+    assert cache.stats.evictions == 1
+    assert cache.stats.hits == 2
+    assert cache.stats.misses == 3
+    for event in events:
+        exported[event] += getattr(cache.stats, event)
+        assert CACHE_EVENTS.value(cache="extraction", event=event) == exported[event]
+
+
+def test_writes_within_budget_do_not_rescan_the_cache(
+    tmp_path: Path, monkeypatch
+) -> None:
+    cache = ExtractionCache(tmp_path / "cache", max_bytes=1000)
+    cache.put("aaa", "fallback:1", "a" * 100)
+    scans = []
+    monkeypatch.setattr(cache, "evict", lambda: scans.append(1) or 0)
+    for digest in ("bbb", "ccc", "ddd"):
+        cache.put(digest, "fallback:1", "x" * 100)
+    assert scans == []
+    cache.put("eee", "fallback:1", "x" * 700)
+    assert scans == [1]
+
+
+def test_repeat_conversion_skips_extraction(tmp_path: Path, monkeypatch) -> None:
+    source = tmp_path / "sample.pdf"
+    source.write_bytes(b"%PDF-1.4 fake")
+    client = MinerUClient(cache=ExtractionCache(tmp_path / "cache", max_bytes=10_000))
+    client.api_url = None
+    client.binary_path = None
+    calls = []
+
+    def fake_extract(path: Path) -> str:
+        calls.append(path)
+        return "# Title\n\nBody"
+
+    monkeypatch.setattr(client, "_fallback_extract", fake_extract)
+
+    assert client.convert_to_markdown(source) == "# Title\n\nBody"
+    assert client.convert_to_markdown(source) == "# Title\n\nBody"
+    assert len(calls) == 1
+    assert client.cache is not None and client.cache.stats.hits == 1
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+
+HEAVY_MODULES = ("openai", "httpx", "pdfminer", "docx", "bs4", "markdown", "lxml")
+
+
+def test_cli_import_skips_heavy_dependencies() -> None:
+    # What keeps the CLI fast to start; wall-clock import time is too noisy
+    # on shared CI machines to assert on.
+    script = (
+        "import sys, ai_doc_to_epub.cli; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    process = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert process.stdout.strip() == ""
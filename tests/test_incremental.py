@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Dict, List
+
+from markdown import markdown
+
+from ai_doc_to_epub.chunking import MarkdownChunk, split_chapters
+from ai_doc_to_epub.epub_builder import Chapter
+from ai_doc_to_epub.incremental import IncrementalStore
+from ai_doc_to_epub.llm_client import ChunkedLLMClient
+from ai_doc_to_epub.models import ConversionRequest
+from ai_doc_to_epub.pipeline import ConversionPipeline, PipelineConfig
+
+
+class RecordingClient(ChunkedLLMClient):
+    max_concurrency = 2
+
+    def __init__(self) -> None:
+        self.seen: List[str] = []
+
+    def enhance_chunk(self, chunk: MarkdownChunk, metadata: Dict[str, str]) -> str:
+        self.seen.append(chunk.title or "")
+        return markdown(chunk.text, extensions=["footnotes"])
+
+
+def book(chapters: List[str]) -> str:
+    return "\n\n".join(
+        f"# Chapter {index}\n\n{body}" for index, body in enumerate(chapters, start=1)
+    )
+
+
+def test_split_chapters_keeps_footnotes_with_their_chapter() -> None:
+    text = "Preface.\n\n# One\n\nA[^a].\n\n## Sub\n\nB.\n\n# Two\n\nC.\n\n[^a]: Note."
+    chapters = split_chapters(text)
+
+    assert [chapter.title for chapter in chapters] == [None, "One", "Two"]
+    assert "## Sub" in chapters[1].text and "[^a]: Note." in chapters[1].text
+    assert "[^a]:" not in chapters[2].text
+
+
+def test_incremental_rebuild_only_enhances_changed_chapters(tmp_path: Path) -> None:
+    source = tmp_path / "manual.pdf"
+    source.write_bytes(b"%PDF-1.4")
+    client = RecordingClient()
+    pipeline = ConversionPipeline(
+        llm_client=client,
+        config=PipelineConfig(output_dir=tmp_path / "out"),
+        incremental_store=IncrementalStore(tmp_path / "incremental"),
+    )
+    revisions = [
+        book(["Alpha.", "Beta[^1].\n\n[^1]: Footnote.", "Gamma."]),
+        book(["Alpha.", "Beta revised[^1].\n\n[^1]: Footnote.", "Gamma."]),
+    ]
+    request = ConversionRequest(title="Manual", incremental=True)
+    results = []
+    for text in revisions:
+        pipeline.mineru_client.convert_to_markdown = (  # type: ignore[method-assign]
+            lambda path, digest=None, text=text: text
+        )
+        client.seen.clear()
+        results.append(pipeline.convert(source, request))
+
+    first, second = results
+    assert (first.enhanced_sections, first.reused_sections) == (3, 0)
+    assert (second.enhanced_sections, second.reused_sections) == (1, 2)
+    assert client.seen == ["Chapter 2"]
+
+    with zipfile.ZipFile(second.output_path) as archive:
+        names = [name for name in archive.namelist() if "/text/" in name]
+        contents = [archive.read(name).decode("utf-8") for name in names]
+    assert len(names) == 3
+    assert "Beta revised" in contents[1] and "Footnote." in contents[1]
+    assert "Alpha." in contents[0] and "Gamma." in contents[2]
+
+    # Options that change the rendering invalidate everything.
+    rebuilt = pipeline.convert(
+        source, ConversionRequest(title="Manual", incremental=True, annotate=False)
+    )
+    assert rebuilt.enhanced_sections == 3
+
+
+def test_store_evicts_idle_documents_and_serialises_saves(tmp_path: Path) -> None:
+    store = IncrementalStore(tmp_path, max_bytes=10**9, max_age_seconds=3600)
+    chapter = Chapter(title="One", filename="one.xhtml", content="<p>1</p>")
+    barrier = threading.Barrier(8)
+
+    def build(digest: str) -> None:
+        barrier.wait()
+        store.save("book", "fp", [digest], {digest: [chapter]})
+
+    threads = [
+        threading.Thread(target=build, args=(f"d{index}",)) for index in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Whichever build saved last, its manifest and sections agree.
+    assert len(store.load("book", "fp")) == 1
+
+    store.save("idle", "fp", ["d"], {"d": [chapter]})
+    manifest = tmp_path / "idle" / "manifest.json"
+    os.utime(manifest, (time.time() - 7200, time.time() - 7200))
+    assert store.evict() == 1
+    assert not (tmp_path / "idle").exists() and (tmp_path / "book").exists()
+
+    store.max_bytes = 0
+    assert store.evict(keep="book") == 0
+    assert store.evict() == 1 and store.load("book", "fp") == {}
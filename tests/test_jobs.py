@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from ai_doc_to_epub.jobs import FAILED, SUCCEEDED, JobManager, QueueFullError
+from ai_doc_to_epub.models import ConversionRequest, ConversionResult
+
+
+class FakePipeline:
+    def __init__(self, gate: threading.Event) -> None:
+        self.gate = gate
+
+    def convert(
+        self,
+        file_path: Path,
+        request: ConversionRequest,
+        progress=None,
+        source_digest=None,
+    ):
+        progress("extracting")
+        self.gate.wait(timeout=5)
+        if request.title == "broken":
+            raise RuntimeError("boom")
+        return ConversionResult(
+            title=request.title,
+            author=request.author,
+            language=request.language,
+            output_path=file_path.with_suffix(".epub"),
+            created_at=datetime.utcnow(),
+            file_size=1,
+        )
+
+
+def wait_for(job, timeout: float = 5.0) -> None:
+    deadline = datetime.utcnow().timestamp() + timeout
+    while not job.finished and datetime.utcnow().timestamp() < deadline:
+        threading.Event().wait(0.01)
+
+
+def test_job_manager_runs_jobs_and_applies_backpressure(tmp_path: Path) -> None:
+    gate = threading.Event()
+    manager = JobManager(lambda: FakePipeline(gate), workers=1, queue_size=1)
+    manager.start()
+    try:
+        inputs = [tmp_path / f"in-{index}.pdf" for index in range(3)]
+        for path in inputs:
+            path.write_bytes(b"data")
+
+        running = manager.submit(inputs[0], ConversionRequest(title="ok"))
+        while running.stage is None:
+            threading.Event().wait(0.01)
+        queued = manager.submit(inputs[1], ConversionRequest(title="broken"))
+        with pytest.raises(QueueFullError):
+            manager.submit(inputs[2], ConversionRequest(title="rejected"))
+
+        gate.set()
+        wait_for(running)
+        wait_for(queued)
+        assert running.state == SUCCEEDED and running.result is not None
+        assert queued.state == FAILED and queued.error == "boom"
+        assert manager.get(running.id) is running
+        assert not inputs[0].exists()
+    finally:
+        manager.shutdown()
+
+
+def test_identical_submissions_attach_to_the_running_job(tmp_path: Path) -> None:
+    gate = threading.Event()
+    manager = JobManager(lambda: FakePipeline(gate), workers=1, queue_size=4)
+    manager.start()
+    try:
+        first_upload = tmp_path / "first.pdf"
+        retry_upload = tmp_path / "retry.pdf"
+        for path in (first_upload, retry_upload):
+            path.write_bytes(b"data")
+
+        first = manager.submit(first_upload, ConversionRequest(title="ok"), "abc")
+        retry = manager.submit(retry_upload, ConversionRequest(title="ok"), "abc")
+        other = manager.submit(
+            tmp_path / "other.pdf", ConversionRequest(title="other"), "abc"
+        )
+
+        assert retry is first and other is not first
+        assert not retry_upload.exists()
+        gate.set()
+        wait_for(first)
+        wait_for(other)
+        assert first.state == SUCCEEDED
+
+        again = manager.submit(
+            tmp_path / "again.pdf", ConversionRequest(title="ok"), "abc"
+        )
+        assert again is not first
+        wait_for(again)
+    finally:
+        manager.shutdown()
+
+
+def test_jobs_fail_when_the_pipeline_cannot_be_built(tmp_path: Path) -> None:
+    gate = threading.Event()
+    gate.set()
+    attempts = []
+
+    def factory() -> FakePipeline:
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("MinerU is misconfigured")
+        return FakePipeline(gate)
+
+    manager = JobManager(factory, workers=1)
+    manager.start()
+    try:
+        first = manager.submit(tmp_path / "a.pdf", ConversionRequest(title="a"))
+        wait_for(first)
+        second = manager.submit(tmp_path / "b.pdf", ConversionRequest(title="b"))
+        wait_for(second)
+    finally:
+        manager.shutdown()
+
+    assert first.state == FAILED and first.error == "MinerU is misconfigured"
+    # The worker survived and built the pipeline for the next job.
+    assert second.state == SUCCEEDED and len(attempts) == 2
+
+
+def test_shutdown_fails_queued_jobs_instead_of_running_them(tmp_path: Path) -> None:
+    gate = threading.Event()
+    manager = JobManager(lambda: FakePipeline(gate), workers=1, queue_size=1)
+    manager.start()
+    running = manager.submit(tmp_path / "a.pdf", ConversionRequest(title="a"))
+    while running.stage is None:
+        threading.Event().wait(0.01)
+    queued = manager.submit(tmp_path / "b.pdf", ConversionRequest(title="b"))
+
+    # The queue is full; shutdown must not block on it.
+    stopper = threading.Thread(target=manager.shutdown, args=(True, 5.0))
+    stopper.start()
+    while not queued.finished:
+        threading.Event().wait(0.01)
+    assert queued.state == FAILED and queued.error == JobManager.SHUTDOWN_ERROR
+    with pytest.raises(QueueFullError):
+        manager.submit(tmp_path / "c.pdf", ConversionRequest(title="c"))
+
+    gate.set()
+    stopper.join(5.0)
+    assert not stopper.is_alive()
+    assert running.state == SUCCEEDED
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from lxml.html import tostring
+
+from ai_doc_to_epub.cache import LLMResponseCache
+from ai_doc_to_epub.chunking import MarkdownChunk
+from ai_doc_to_epub.llm_client import CachedLLMClient, ChunkedLLMClient
+from ai_doc_to_epub.metrics import CACHE_EVENTS
+
+
+class RecordingChunkClient(ChunkedLLMClient):
+    chunk_tokens = 50
+    max_concurrency = 2
+
+    def __init__(self) -> None:
+        self.calls: List[str] = []
+
+    def enhance_chunk(self, chunk: MarkdownChunk, metadata: Dict[str, str]) -> str:
+        self.calls.append(chunk.text)
+        return f"<h1>{chunk.title}</h1>"
+
+
+def markdown(*bodies: str) -> str:
+    return "\n\n".join(f"# Section {i}\n\n{body}" for i, body in enumerate(bodies))
+
+
+def test_cached_client_only_recomputes_changed_chunks(tmp_path: Path) -> None:
+    inner = RecordingChunkClient()
+    client = CachedLLMClient(
+        inner=inner,
+        cache=LLMResponseCache(tmp_path / "llm.sqlite3", 1_000_000, 3600),
+    )
+    metadata = {"title": "Book"}
+    first = tostring(client.enhance(markdown("alpha " * 40, "beta " * 40), metadata))
+    assert len(inner.calls) == 2
+
+    again = client.enhance(markdown("alpha " * 40, "beta " * 40), metadata)
+    assert tostring(again) == first
+    assert len(inner.calls) == 2
+
+    client.enhance(markdown("alpha " * 40, "gamma " * 40), metadata)
+    assert len(inner.calls) == 3
+
+    client.enhance(markdown("alpha " * 40, "beta " * 40), {"title": "Other"})
+    assert len(inner.calls) == 5
+
+
+def test_response_cache_ttl_and_size_eviction(tmp_path: Path) -> None:
+    cache = LLMResponseCache(tmp_path / "llm.sqlite3", max_bytes=150, ttl_seconds=60)
+    evictions = CACHE_EVENTS.value(cache="llm", event="evictions")
+    cache.put("a", "x" * 100)
+    time.sleep(0.01)
+    cache.put("b", "y" * 100)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "y" * 100
+
+    cache.ttl_seconds = 0
+    assert cache.get("b") is None
+    assert cache.stats.evictions == 1
+    assert CACHE_EVENTS.value(cache="llm", event="evictions") == evictions + 1
+
+
+def test_response_cache_writes_within_budget_skip_eviction(
+    tmp_path: Path, monkeypatch
+) -> None:
+    cache = LLMResponseCache(tmp_path / "llm.sqlite3", max_bytes=1000, ttl_seconds=60)
+    cache.put("a", "x" * 100)
+    passes = []
+    monkeypatch.setattr(cache, "evict", lambda: passes.append(1) or 0)
+    for key in "bcd":
+        cache.put(key, "y" * 100)
+    assert passes == []
+
+    cache.put("e", "z" * 700)
+    assert passes == [1]
+
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, List
+
+import pytest
+
+from ai_doc_to_epub.chunking import MarkdownChunk
+from ai_doc_to_epub.llm_router import (
+    EndpointConfig,
+    RoutedEndpoint,
+    RoutingLLMClient,
+    TokenBucket,
+)
+from ai_doc_to_epub.metrics import (
+    LLM_ENDPOINT_BUDGET_USED,
+    LLM_ENDPOINT_COOLDOWN,
+    REGISTRY,
+)
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after: str) -> None:
+        super().__init__("rate limited")
+        self.response = SimpleNamespace(headers={"retry-after": retry_after})
+
+
+class FakeEndpointClient:
+    def __init__(self, name: str, failures: List[Exception] = (), delay: float = 0):
+        self.name = name
+        self.failures = list(failures)
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def complete_chunk(self, chunk: MarkdownChunk, metadata: Dict[str, str]):
+        if self.failures:
+            raise self.failures.pop(0)
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+        return f"<p>{self.name}:{chunk.index}</p>", usage
+
+
+def endpoint(name: str, client: FakeEndpointClient, **limits) -> RoutedEndpoint:
+    config = EndpointConfig(name=name, base_url=f"http://{name}", model="m", **limits)
+    return RoutedEndpoint(config, client)
+
+
+def chunk(index: int = 0) -> MarkdownChunk:
+    return MarkdownChunk(index=index, text="# Heading\n\nBody.", total=2)
+
+
+def test_token_bucket_refills_continuously() -> None:
+    now = [0.0]
+    bucket = TokenBucket(60, period=60, clock=lambda: now[0])
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    now[0] += 30
+    assert bucket.wait_time(30) == 0
+    bucket.take(30)
+    bucket.give(10)  # the request turned out cheaper than reserved
+    assert bucket.utilization() == pytest.approx(50 / 60)
+
+
+def test_429_cools_endpoint_down_and_reroutes() -> None:
+    throttled = FakeEndpointClient("a", failures=[RateLimited("30")])
+    spare = FakeEndpointClient("b")
+    router = RoutingLLMClient(
+        [endpoint("a", throttled, weight=2), endpoint("b", spare)]
+    )
+
+    assert router.enhance_chunk(chunk(), {}) == "<p>b:0</p>"
+    assert router.enhance_chunk(chunk(1), {}) == "<p>b:1</p>"
+
+    usage = router.utilization()
+    assert usage["a"]["throttled"] == 1
+    assert 25 < usage["a"]["cooldown_seconds"] <= 30
+    assert usage["b"]["completed"] == 2 and usage["b"]["tokens"] == 30
+
+    exported = REGISTRY.render()
+    cooldown = LLM_ENDPOINT_COOLDOWN.value(endpoint="a")
+    assert 25 < cooldown <= 30
+    assert 'atoe_llm_endpoint_cooldown_seconds{endpoint="a"}' in exported
+
+
+def test_request_quota_spills_over_to_other_endpoints() -> None:
+    limited = FakeEndpointClient("a")
+    unlimited = FakeEndpointClient("b")
+    router = RoutingLLMClient(
+        [
+            endpoint("a", limited, weight=5, requests_per_minute=2),
+            endpoint("b", unlimited),
+        ]
+    )
+
+    served = [router.enhance_chunk(chunk(index), {}) for index in range(5)]
+
+    assert [html.split(":")[0] for html in served] == ["<p>a", "<p>a"] + ["<p>b"] * 3
+    assert router.utilization()["a"]["request_budget_used"] == pytest.approx(1, 0.01)
+    REGISTRY.render()
+    assert LLM_ENDPOINT_BUDGET_USED.value(
+        endpoint="a", budget="requests"
+    ) == pytest.approx(1, 0.01)
+
+
+def test_least_loaded_dispatch_uses_every_endpoints_concurrency() -> None:
+    clients = [FakeEndpointClient(name, delay=0.05) for name in ("a", "b")]
+    router = RoutingLLMClient(
+        [endpoint(c.name, c, max_concurrency=2) for c in clients],
+        chunk_tokens=0,
+    )
+    assert router.max_concurrency == 4
+
+    results = router.map_chunks(
+        [chunk(index) for index in range(8)],
+        lambda item: router.enhance_chunk(item, {}),
+    )
+
+    assert [html.split(":")[1] for html in results] == [f"{i}</p>" for i in range(8)]
+    assert all(client.peak == 2 for client in clients)
+    served = router.utilization()
+    assert served["a"]["completed"] + served["b"]["completed"] == 8
+    assert served["a"]["in_flight"] == served["b"]["in_flight"] == 0
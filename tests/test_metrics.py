@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+from docx import Document
+from fastapi.testclient import TestClient
+from openai import BadRequestError
+
+from ai_doc_to_epub.app import app
+from ai_doc_to_epub.chunking import MarkdownChunk
+from ai_doc_to_epub.llm_client import OpenAICompatibleLLM
+from ai_doc_to_epub.metrics import (
+    LLM_TOKENS,
+    STAGE_SECONDS,
+    MetricsRegistry,
+    StageTimer,
+    record_token_usage,
+)
+from ai_doc_to_epub.models import ConversionRequest
+from ai_doc_to_epub.pipeline import ConversionPipeline
+
+
+def test_stage_timer_charges_nested_time_exclusively() -> None:
+    timer = StageTimer()
+
+    def slow_items():
+        for item in range(2):
+            time.sleep(0.02)
+            yield item
+
+    with timer.stage("writing"):
+        consumed = list(timer.iterate(slow_items(), "enhancement"))
+        time.sleep(0.01)
+
+    assert consumed == [0, 1]
+    assert timer.timings["enhancement"] >= 0.04
+    assert 0.01 <= timer.timings["writing"] < 0.04
+
+
+def test_registry_renders_prometheus_text() -> None:
+    registry = MetricsRegistry()
+    counter = registry.counter("demo_total", "Demo counter.", ("kind",))
+    histogram = registry.histogram("demo_seconds", "Demo histogram.", buckets=(1, 5))
+    counter.inc(kind='a"b')
+    histogram.observe(0.5)
+    histogram.observe(3)
+
+    text = registry.render()
+    assert "# TYPE demo_total counter" in text
+    assert 'demo_total{kind="a\\"b"} 1' in text
+    assert 'demo_seconds_bucket{le="1"} 1' in text
+    assert 'demo_seconds_bucket{le="+Inf"} 2' in text
+    assert "demo_seconds_count 2" in text
+
+
+def test_record_token_usage_reads_completion_usage() -> None:
+    before = LLM_TOKENS.value(model="demo", kind="completion")
+    record_token_usage("demo", SimpleNamespace(prompt_tokens=10, completion_tokens=7))
+    assert LLM_TOKENS.value(model="demo", kind="completion") == before + 7
+
+
+def test_streams_retry_without_usage_when_the_server_rejects_it() -> None:
+    calls = []
+
+    def create(**kwargs):
+        calls.append("stream_options" in kwargs)
+        if "stream_options" in kwargs:
+            response = httpx.Response(
+                400, request=httpx.Request("POST", "http://llm.invalid")
+            )
+            raise BadRequestError("unknown field", response=response, body=None)
+        delta = SimpleNamespace(content="<p>ok</p>")
+        return iter([SimpleNamespace(choices=[SimpleNamespace(delta=delta)])])
+
+    llm = OpenAICompatibleLLM(api_key="key", base_url="http://llm.invalid", model="m")
+    llm._client = SimpleNamespace(  # type: ignore[assignment]
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+    chunk = MarkdownChunk(text="# A", index=0, total=1)
+
+    assert list(llm.stream_chunk(chunk, {})) == ["<p>ok</p>"]
+    assert list(llm.stream_chunk(chunk, {})) == ["<p>ok</p>"]
+    assert calls == [True, False, False]
+
+
+def test_pipeline_reports_stage_timings_and_metrics(tmp_path: Path) -> None:
+    source = tmp_path / "sample.docx"
+    doc = Document()
+    doc.add_heading("Timed", level=1)
+    doc.add_paragraph("Body.")
+    doc.save(source)
+    before = STAGE_SECONDS.count(stage="writing")
+
+    result = ConversionPipeline().convert(
+        source,
+        ConversionRequest(title="Timed", use_local_formatter=True, annotate=False),
+    )
+
+    assert {"extraction", "enhancement", "footnotes", "splitting", "writing"} <= set(
+        result.timings
+    )
+    assert STAGE_SECONDS.count(stage="writing") == before + 1
+
+    with TestClient(app) as client:
+        response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'atoe_stage_duration_seconds_count{stage="writing"}' in response.text
+    assert 'atoe_backend_selections_total{component="enhancement",backend="local"}' in (
+        response.text
+    )
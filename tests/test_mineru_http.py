@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import httpx
+import pytest
+
+from ai_doc_to_epub.cache import ExtractionCache
+from ai_doc_to_epub.mineru_client import MinerUClient, MinerUError, MinerUHttpPool
+
+
+def test_pool_retries_failed_replica_on_another(tmp_path: Path) -> None:
+    source = tmp_path / "doc.pdf"
+    source.write_bytes(b"%PDF-1.4")
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.host)
+        if request.url.host == "bad":
+            return httpx.Response(503, text="overloaded")
+        return httpx.Response(200, json={"markdown": "# Done"})
+
+    pool = MinerUHttpPool(
+        ["http://bad", "http://good"],
+        backoff_seconds=0,
+        transport=httpx.MockTransport(handler),
+    )
+
+    assert pool.convert(source) == "# Done"
+    assert pool.convert(source) == "# Done"
+    assert calls == ["bad", "good", "good"]
+    assert pool.endpoints[0].failures == 1
+
+
+def test_replica_returning_html_counts_as_a_failed_attempt(tmp_path: Path) -> None:
+    source = tmp_path / "doc.pdf"
+    source.write_bytes(b"%PDF-1.4")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "proxy":
+            return httpx.Response(200, text="<html><body>Gateway</body></html>")
+        if request.url.host == "odd":
+            return httpx.Response(200, json=["not", "an", "object"])
+        return httpx.Response(200, json={"markdown": "# Done"})
+
+    pool = MinerUHttpPool(
+        ["http://proxy", "http://odd", "http://good"],
+        backoff_seconds=0,
+        transport=httpx.MockTransport(handler),
+    )
+
+    assert pool.convert(source) == "# Done"
+    assert [endpoint.failures for endpoint in pool.endpoints] == [1, 1, 0]
+
+    pool.max_attempts = 2
+    pool.endpoints[2].ejected_until = float("inf")
+    with pytest.raises(MinerUError, match="not JSON"):
+        pool.convert(source)
+
+
+def test_least_outstanding_replica_is_chosen() -> None:
+    pool = MinerUHttpPool(["http://a", "http://b", "http://c"])
+    pool.endpoints[0].outstanding = 2
+    pool.endpoints[1].outstanding = 1
+    pool.endpoints[2].outstanding = 3
+
+    assert pool._acquire(set()).url == "http://b"
+    assert pool._acquire({"http://b"}).url == "http://a"
+
+
+def test_client_fails_over_to_local_extraction(tmp_path: Path, monkeypatch) -> None:
+    source = tmp_path / "doc.pdf"
+    source.write_bytes(b"%PDF-1.4")
+    status = [502]
+    pool = MinerUHttpPool(
+        ["http://down"],
+        max_attempts=2,
+        backoff_seconds=0,
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(status[0], json={"markdown": "remote"})
+        ),
+    )
+    client = MinerUClient(
+        http_pool=pool, cache=ExtractionCache(tmp_path / "cache", 10_000)
+    )
+    client.binary_path = client.worker_pool = None
+    local_runs = []
+
+    def fallback(path: Path) -> str:
+        local_runs.append(path)
+        return "local text"
+
+    monkeypatch.setattr(client, "_fallback_extract", fallback)
+
+    assert client.convert_to_markdown(source) == "local text"
+    # While MinerU stays down the fallback's cached output is reused...
+    assert client.convert_to_markdown(source) == "local text"
+    assert len(local_runs) == 1
+
+    # ...but once it is back, its output replaces the fallback's.
+    status[0] = 200
+    assert pool.check_health() == {"http://down": True}
+    assert client.convert_to_markdown(source) == "remote"
+    assert client.convert_to_markdown(source) == "remote"
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+from ai_doc_to_epub.config import SETTINGS
+from ai_doc_to_epub.mineru_client import MinerUClient
+from ai_doc_to_epub.mineru_worker import (
+    MinerUWorkerError,
+    MinerUWorkerPool,
+    mineru_convert,
+)
+
+FAKE_CONVERTER = '''
+import os
+from pathlib import Path
+
+def convert(path):
+    name = Path(path).stem
+    if name == "crash":
+        os._exit(3)
+    if name == "broken":
+        raise ValueError("unreadable")
+    print("noise from the converter")
+    return f"# {name}\\n\\npid {os.getpid()}"
+'''
+
+
+@pytest.fixture
+def command(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> list:
+    (tmp_path / "fake_mineru.py").write_text(FAKE_CONVERTER, encoding="utf-8")
+    monkeypatch.setenv("PYTHONPATH", str(tmp_path))
+    return [
+        sys.executable,
+        "-m",
+        "ai_doc_to_epub.mineru_worker",
+        "--converter",
+        "fake_mineru:convert",
+    ]
+
+
+def pid_of(markdown: str) -> str:
+    return markdown.rsplit(" ", 1)[1]
+
+
+def test_workers_stay_warm_and_are_recycled(command: list, tmp_path: Path) -> None:
+    pool = MinerUWorkerPool(command, size=1, max_jobs=2)
+    try:
+        first = pool.convert(tmp_path / "a.pdf")
+        second = pool.convert(tmp_path / "b.pdf")
+        third = pool.convert(tmp_path / "c.pdf")
+    finally:
+        pool.close()
+
+    assert first.startswith("# a")
+    assert pid_of(first) == pid_of(second) != pid_of(third)
+    assert pool.recycled == 1
+
+
+def test_failures_are_reported_and_crashed_workers_replaced(
+    command: list, tmp_path: Path
+) -> None:
+    pool = MinerUWorkerPool(command, size=1)
+    try:
+        before = pool.convert(tmp_path / "a.pdf")
+        with pytest.raises(MinerUWorkerError, match="unreadable"):
+            pool.convert(tmp_path / "broken.pdf")
+        assert pid_of(pool.convert(tmp_path / "b.pdf")) == pid_of(before)
+
+        with pytest.raises(MinerUWorkerError, match="exited"):
+            pool.convert(tmp_path / "crash.pdf")
+        assert pid_of(pool.convert(tmp_path / "c.pdf")) != pid_of(before)
+        assert pool.check_health() == [True]
+    finally:
+        pool.close()
+
+
+def test_malformed_replies_kill_the_worker(tmp_path: Path) -> None:
+    # A worker whose stdout carries something other than the protocol.
+    script = (
+        "import json, sys; "
+        "print(json.dumps({'event': 'ready', 'pid': 0}), flush=True); "
+        "sys.stdin.readline(); "
+        "print('<html>not the protocol</html>', flush=True); "
+        "sys.stdin.readline()"
+    )
+    pool = MinerUWorkerPool([sys.executable, "-c", script], size=1)
+    try:
+        with pytest.raises(MinerUWorkerError, match="malformed"):
+            pool.convert(tmp_path / "a.pdf")
+        assert pool.recycled == 1
+        assert pool.check_health() == []
+    finally:
+        pool.close()
+
+
+def test_client_prefers_worker_pool(command: list, tmp_path: Path) -> None:
+    source = tmp_path / "report.pdf"
+    source.write_bytes(b"%PDF-1.4")
+    pool = MinerUWorkerPool(command, size=1)
+    client = MinerUClient(worker_pool=pool, cache=None)
+    client.http_pool = None
+    client.binary_path = None
+    try:
+        assert client.backend_identity().startswith("worker:")
+        assert client.convert_to_markdown(source).startswith("# report")
+    finally:
+        pool.close()
+
+
+def test_mineru_converter_uses_the_configured_ocr_language(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    calls = []
+
+    def do_parse(output_dir, names, documents, langs):
+        calls.append(langs)
+        Path(output_dir, f"{names[0]}.md").write_text("# Parsed", encoding="utf-8")
+
+    fake = types.ModuleType("mineru.cli.common")
+    fake.do_parse = do_parse  # type: ignore[attr-defined]
+    fake.read_fn = lambda path: b""  # type: ignore[attr-defined]
+    for name in ("mineru", "mineru.cli"):
+        monkeypatch.setitem(sys.modules, name, types.ModuleType(name))
+    monkeypatch.setitem(sys.modules, "mineru.cli.common", fake)
+    monkeypatch.setattr(SETTINGS, "mineru_lang", "en")
+
+    assert mineru_convert(str(tmp_path / "scan.pdf")) == "# Parsed"
+    assert mineru_convert(str(tmp_path / "scan.pdf"), lang="japan") == "# Parsed"
+    assert calls == [["en"], ["japan"]]
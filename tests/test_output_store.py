@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+from ai_doc_to_epub.models import ConversionRequest
+from ai_doc_to_epub.output_store import OutputStore, RangeNotSatisfiable, parse_range
+from ai_doc_to_epub.pipeline import ConversionPipeline, PipelineConfig
+
+
+def stage(store: OutputStore, content: bytes) -> Path:
+    path = store.staging_path("Same-Title.epub")
+    path.write_bytes(content)
+    return path
+
+
+def test_books_are_stored_by_content_and_evicted_by_age_then_size(
+    tmp_path: Path,
+) -> None:
+    store = OutputStore(tmp_path, max_bytes=250, max_age_seconds=3600)
+    first, second = stage(store, b"a" * 100), stage(store, b"b" * 100)
+    assert first != second
+
+    a = store.put(first)
+    b = store.put(second)
+    again = store.put(stage(store, b"a" * 100))
+    assert again.path == a.path and a.path != b.path
+    assert a.path.name == f"{a.digest}.epub" and a.etag == f'"{a.digest}"'
+    assert list((tmp_path / "staging").iterdir()) == []
+
+    past = time.time() - 7200
+    os.utime(b.path, (past, past))
+    c = store.put(stage(store, b"c" * 100))
+    assert store.get(b.digest) is None
+    assert store.get(a.digest) is not None
+
+    os.utime(a.path, (time.time() - 60,) * 2)
+    store.put(stage(store, b"d" * 100))
+    # 300 bytes over a 250 byte budget: the least recently used book goes.
+    assert store.get(a.digest) is None and store.get(c.digest) is not None
+    assert store.get("../../etc/passwd") is None
+
+
+def test_puts_within_budget_only_rescan_the_store_periodically(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    store = OutputStore(tmp_path, max_bytes=10**9, max_age_seconds=3600)
+    old = store.put(stage(store, b"a" * 100))
+    past = time.time() - 7200
+    os.utime(old.path, (past, past))
+    scans = []
+    monkeypatch.setattr(store, "evict", lambda keep=None: scans.append(keep) or 0)
+
+    for content in (b"b", b"c", b"d"):
+        store.put(stage(store, content * 100))
+
+    assert scans == [] and old.path.exists()
+    store._next_sweep = 0.0
+    store.put(stage(store, b"e" * 100))
+    assert len(scans) == 1
+
+
+def test_failed_conversions_leave_no_staging_directory(tmp_path: Path) -> None:
+    source = tmp_path / "broken.pdf"
+    source.write_bytes(b"%PDF-1.4")
+    store = OutputStore(tmp_path / "outputs", max_bytes=10**9, max_age_seconds=3600)
+    pipeline = ConversionPipeline(
+        config=PipelineConfig(output_dir=tmp_path / "out"), output_store=store
+    )
+
+    def fail(path: Path, digest: Optional[str] = None) -> str:
+        raise RuntimeError("extraction failed")
+
+    pipeline.mineru_client.convert_to_markdown = fail  # type: ignore[method-assign]
+    with pytest.raises(RuntimeError):
+        pipeline.convert(source, ConversionRequest(title="Broken"))
+
+    assert list(store.staging_root.iterdir()) == []
+
+
+def test_parse_range_follows_rfc_9110() -> None:
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=95-200", 100) == (95, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=-500", 100) == (0, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("items=0-1", 100) is None
+    assert parse_range("bytes=9-1", 100) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=100-", 100)
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=-0", 100)
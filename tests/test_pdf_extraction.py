@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List
+
+from ai_doc_to_epub.cache import ExtractionCache
+from ai_doc_to_epub.chunking import estimate_tokens, iter_chapters
+from ai_doc_to_epub.mineru_client import MinerUClient, shared_pdf_pool
+
+
+def write_text_pdf(path: Path, pages: List[str]) -> None:
+    """Write a minimal, valid PDF with one line of Helvetica text per page."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{kids}] /Count {count} >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = objects[1].format(kids=" ".join(kids), count=len(pages))
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode("latin-1")
+    output += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref}\n%%EOF\n"
+    ).encode("latin-1")
+    path.write_bytes(bytes(output))
+
+
+def test_parallel_extraction_keeps_page_order(tmp_path: Path) -> None:
+    source = tmp_path / "book.pdf"
+    write_text_pdf(source, [f"Page text {index}" for index in range(1, 8)])
+
+    serial_client = MinerUClient(pdf_workers=0, pdf_pages_per_chunk=3)
+    parallel_client = MinerUClient(
+        pdf_workers=3, pdf_pages_per_chunk=2, pdf_parallel_min_pages=4
+    )
+    assert serial_client.pdf_workers == 1
+
+    serial = serial_client._extract_pdf(source)
+    parallel = parallel_client._extract_pdf(source)
+    # Later documents reuse the pool the first one started.
+    pool = shared_pdf_pool(3)
+    assert parallel_client._extract_pdf(source) == parallel
+    assert shared_pdf_pool(3) is pool
+
+    assert serial == parallel
+    assert parallel.startswith("<!-- page 1 -->\n\nPage text 1")
+    positions = [parallel.index(f"<!-- page {n} -->") for n in range(1, 8)]
+    assert positions == sorted(positions)
+    assert "Page text 7" in parallel
+
+
+def test_streamed_pdf_without_headings_arrives_in_bounded_chapters(
+    tmp_path: Path,
+) -> None:
+    source = tmp_path / "scan.pdf"
+    write_text_pdf(source, [f"Page text {index} " * 6 for index in range(1, 13)])
+    client = MinerUClient(cache=None, pdf_workers=1)
+    client.http_pool = client.worker_pool = client.binary_path = None
+    client.cache = ExtractionCache(tmp_path / "cache", 10**9)
+
+    # The second pass is served whole from the extraction cache.
+    for _ in range(2):
+        chunks = list(iter_chapters(client.iter_markdown(source), max_tokens=40))
+
+        assert len(chunks) > 3
+        assert all(estimate_tokens(chunk.text) < 80 for chunk in chunks)
+        assert [chunk.index for chunk in chunks] == list(range(len(chunks)))
+        text = "\n".join(chunk.text for chunk in chunks)
+        assert "Page text 1 " in text and "Page text 12 " in text
+    assert client.cache.stats.hits == 1
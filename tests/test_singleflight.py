@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import pytest
+
+from ai_doc_to_epub.models import ConversionRequest
+from ai_doc_to_epub.singleflight import SingleFlight, conversion_key
+
+
+def test_concurrent_calls_share_one_run_and_its_outcome() -> None:
+    flight: SingleFlight[str] = SingleFlight("test")
+    gate = threading.Event()
+    runs = []
+
+    def convert() -> str:
+        runs.append(1)
+        gate.wait(timeout=5)
+        return "book.epub"
+
+    first, first_shared = flight.start("key", convert)
+    second, second_shared = flight.start("key", convert)
+    other, _ = flight.start("other", lambda: "other.epub")
+    gate.set()
+
+    assert second is first and (first_shared, second_shared) == (False, True)
+    assert first.result(timeout=5) == "book.epub" and len(runs) == 1
+    assert other.result(timeout=5) == "other.epub"
+    assert not first.cancel() and len(flight) == 0
+
+    failed, _ = flight.start("key", lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        failed.result(timeout=5)
+    again, shared = flight.start("key", convert)
+    assert not shared and again.result(timeout=5) == "book.epub"
+
+
+def test_conversion_key_ignores_cosmetic_differences() -> None:
+    base = conversion_key("abc", ConversionRequest(title="The  Book", language="EN"))
+
+    assert base == conversion_key("abc", ConversionRequest(title=" The Book "))
+    assert base != conversion_key("abd", ConversionRequest(title="The Book"))
+    assert base != conversion_key(
+        "abc", ConversionRequest(title="The Book", annotate=False)
+    )
+
+
+def test_async_calls_share_one_task() -> None:
+    flight: SingleFlight[str] = SingleFlight("test")
+    runs = []
+
+    async def convert() -> str:
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return "book.epub"
+
+    async def main():
+        first, _ = flight.start_async("key", convert)
+        second, shared = flight.start_async("key", convert)
+        waiter = asyncio.wrap_future(second)
+        waiter.cancel()
+        return shared, await asyncio.wrap_future(first)
+
+    assert asyncio.run(main()) == (True, "book.epub")
+    assert len(runs) == 1 and len(flight) == 0
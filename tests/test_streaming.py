@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import pytest
+from docx import Document
+
+from ai_doc_to_epub.chunking import MarkdownChunk, iter_html_sections
+from ai_doc_to_epub.config import SETTINGS
+from ai_doc_to_epub.llm_client import ChunkedLLMClient, LocalFormatterLLM
+from ai_doc_to_epub.mineru_client import MinerUClient
+from ai_doc_to_epub.models import ConversionRequest
+from ai_doc_to_epub.pipeline import ConversionPipeline, PipelineConfig
+from ai_doc_to_epub.streaming import ordered_map, prefetch
+
+
+def test_sections_close_at_each_h1_across_token_boundaries() -> None:
+    html = "<html><head><title>t</title></head><body><p>intro</p><h1>A</h1><p>a</p><h1>B</h1></body></html>"
+    tokens = [html[index : index + 2] for index in range(0, len(html), 2)]
+
+    assert list(iter_html_sections(tokens)) == [
+        "<p>intro</p>",
+        "<h1>A</h1><p>a</p>",
+        "<h1>B</h1>",
+    ]
+
+
+def test_sections_only_close_at_top_level_h1() -> None:
+    html = (
+        "```html\n<!DOCTYPE html><html><head><title>t</title></head><body>"
+        "<!-- <h1>not a heading</h1> --><h1 class='c'>A</h1>"
+        "<div><h1>Nested</h1></div><![CDATA[<h1>]]>text"
+        "<h1>B</h1><p>b &amp; more</p></body></html>\n```"
+    )
+    tokens = [html[index : index + 3] for index in range(0, len(html), 3)]
+
+    assert list(iter_html_sections(tokens)) == [
+        "<!-- <h1>not a heading</h1> -->",
+        # HTML has no CDATA sections; like browsers, lxml reads a comment.
+        "<h1 class=\"c\">A</h1><div><h1>Nested</h1></div>"
+        "<!--[CDATA[<h1-->]]&gt;text",
+        "<h1>B</h1><p>b &amp; more</p>",
+    ]
+
+
+class GatedStreamClient(ChunkedLLMClient):
+    chunk_tokens = 20
+    max_concurrency = 2
+
+    def __init__(self) -> None:
+        self.release = threading.Event()
+
+    def enhance_chunk(self, chunk: MarkdownChunk, metadata: Dict[str, str]) -> str:
+        self.release.wait(timeout=5)
+        return f"<h1>Chapter {chunk.index}</h1><p id='fn'>later</p>"
+
+    def stream_chunk(self, chunk: MarkdownChunk, metadata: Dict[str, str]) -> Iterator[str]:
+        yield "<h1>Chapter 0</h1><p>first"
+        yield "</p><h1>Chapter 0b</h1>"
+
+
+def test_first_chapter_is_yielded_before_later_chunks_finish() -> None:
+    client = GatedStreamClient()
+    markdown = "\n\n".join(f"# Chapter {index}\n\n" + "text " * 20 for index in range(3))
+    sections = client.stream_sections(markdown, metadata={})
+
+    assert next(sections) == "<h1>Chapter 0</h1><p>first</p>"
+    client.release.set()
+    rest = list(sections)
+    assert rest[0] == "<h1>Chapter 0b</h1>"
+    assert rest[1] == '<h1>Chapter 1</h1><p id="fn-c1">later</p>'
+    assert rest[-1].startswith("<h1>Chapter 2</h1>")
+
+
+def test_pipeline_streaming_mode_builds_chapters(tmp_path: Path) -> None:
+    source = tmp_path / "sample.pdf"
+    source.write_bytes(b"%PDF-1.4")
+    pipeline = ConversionPipeline(
+        llm_client=LocalFormatterLLM(),
+        config=PipelineConfig(output_dir=tmp_path / "out", stream_enhancement=True),
+    )
+    pipeline.mineru_client.convert_to_markdown = (  # type: ignore[method-assign]
+        lambda path, digest=None: "# One\n\nFirst.\n\n# Two\n\nSecond."
+    )
+    stages = []
+
+    result = pipeline.convert(
+        source, ConversionRequest(title="Streamed"), progress=stages.append
+    )
+
+    assert "building chapter 3" in stages
+    with zipfile.ZipFile(result.output_path) as archive:
+        chapters = [name for name in archive.namelist() if "/text/" in name]
+    assert len(chapters) == 3
+
+
+def test_prefetch_stays_a_bounded_distance_ahead_of_the_consumer() -> None:
+    produced = []
+
+    def pages() -> Iterator[int]:
+        for number in range(100):
+            produced.append(number)
+            yield number
+
+    items = prefetch(pages(), maxsize=3)
+    assert next(items) == 0
+    time.sleep(0.2)
+    # One item handed over, three buffered and one waiting to be put.
+    assert len(produced) <= 5
+    assert list(ordered_map(lambda item: item * 2, items, workers=3))[:2] == [2, 4]
+
+
+def test_streamed_conversion_writes_the_same_chapters(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(SETTINGS, "media_dir", tmp_path / "media")
+    source = tmp_path / "long.docx"
+    document = Document()
+    for chapter in range(12):
+        document.add_heading(f"Chapter {chapter}", level=1)
+        document.add_paragraph(f"Body of chapter {chapter}.")
+    document.save(str(source))
+
+    mineru = MinerUClient(cache=None)
+    mineru.http_pool = mineru.worker_pool = mineru.binary_path = None
+    pipeline = ConversionPipeline(
+        mineru_client=mineru,
+        llm_client=LocalFormatterLLM(),
+        config=PipelineConfig(output_dir=tmp_path / "out", stream_queue_size=2),
+    )
+    # Streaming must not fall back to materialising the whole Markdown.
+    mineru.convert_to_markdown = None  # type: ignore[assignment]
+    stages: List[str] = []
+    result = pipeline.convert(
+        source,
+        ConversionRequest(title="Long", streaming=True),
+        progress=stages.append,
+    )
+
+    assert "building chapter 12" in stages
+    with zipfile.ZipFile(result.output_path) as archive:
+        nav = archive.read("EPUB/nav.xhtml").decode("utf-8")
+    assert [f"Chapter {chapter}" in nav for chapter in range(12)] == [True] * 12